@@ -0,0 +1,40 @@
+"""Broadcasts
+
+Revision ID: 002
+Revises: 001
+Create Date: 2025-02-03 10:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'broadcasts',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('created_by', sa.BigInteger(), nullable=False),
+        sa.Column('from_chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('last_user_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_sent', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_failed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_blocked', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_index('idx_broadcasts_status', 'broadcasts', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_table('broadcasts')
@@ -0,0 +1,124 @@
+"""Partition user_interactions by month
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-02-17 09:30:00.000000
+
+"""
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+# Keep in sync with bot.services.partition_manager
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(month: date) -> None:
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS user_interactions_y{month.year}m{month.month:02d} "
+        f"PARTITION OF user_interactions "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite keeps a plain table, only the index layout changes
+        op.drop_index('idx_interactions_user_id', table_name='user_interactions')
+        op.drop_index('idx_interactions_created_at', table_name='user_interactions')
+        op.drop_index('idx_interactions_type', table_name='user_interactions')
+        op.create_index('idx_interactions_user_created', 'user_interactions', ['user_id', 'created_at'])
+        return
+
+    op.execute("ALTER TABLE user_interactions RENAME TO user_interactions_legacy")
+    op.execute("ALTER SEQUENCE user_interactions_id_seq RENAME TO user_interactions_legacy_id_seq")
+    op.drop_index('idx_interactions_user_id', table_name='user_interactions_legacy')
+    op.drop_index('idx_interactions_created_at', table_name='user_interactions_legacy')
+    op.drop_index('idx_interactions_type', table_name='user_interactions_legacy')
+
+    # Partition key must be part of the primary key
+    op.execute("""
+        CREATE TABLE user_interactions (
+            id BIGSERIAL NOT NULL,
+            user_id BIGINT NOT NULL REFERENCES users (telegram_id) ON DELETE CASCADE,
+            interaction_type VARCHAR(50) NOT NULL,
+            content TEXT,
+            metadata TEXT DEFAULT '{}',
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Two indexes instead of three: per-user history, and a tiny BRIN for time ranges
+    op.create_index('idx_interactions_user_created', 'user_interactions', ['user_id', 'created_at'])
+    op.create_index(
+        'idx_interactions_created_brin', 'user_interactions', ['created_at'], postgresql_using='brin'
+    )
+
+    oldest = op.get_bind().execute(
+        sa.text("SELECT min(created_at) FROM user_interactions_legacy")
+    ).scalar()
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    month = (oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else current)
+    while month <= _add_months(current, PARTITIONS_AHEAD):
+        _create_partition(month)
+        month = _add_months(month, 1)
+
+    op.execute("""
+        INSERT INTO user_interactions (id, user_id, interaction_type, content, metadata, created_at)
+        SELECT id, user_id, interaction_type, content, metadata, coalesce(created_at, now())
+        FROM user_interactions_legacy
+    """)
+    op.execute(
+        "SELECT setval('user_interactions_id_seq', "
+        "coalesce((SELECT max(id) FROM user_interactions), 0) + 1, false)"
+    )
+    op.drop_table('user_interactions_legacy')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index('idx_interactions_user_created', table_name='user_interactions')
+        op.create_index('idx_interactions_user_id', 'user_interactions', ['user_id'])
+        op.create_index('idx_interactions_created_at', 'user_interactions', ['created_at'])
+        op.create_index('idx_interactions_type', 'user_interactions', ['interaction_type'])
+        return
+
+    op.execute("ALTER TABLE user_interactions RENAME TO user_interactions_partitioned")
+    op.execute("ALTER SEQUENCE user_interactions_id_seq RENAME TO user_interactions_partitioned_id_seq")
+    op.create_table(
+        'user_interactions',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.BigInteger(), sa.ForeignKey('users.telegram_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('interaction_type', sa.String(50), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('metadata', sa.Text(), default='{}'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.execute("""
+        INSERT INTO user_interactions (id, user_id, interaction_type, content, metadata, created_at)
+        SELECT id, user_id, interaction_type, content, metadata, created_at
+        FROM user_interactions_partitioned
+    """)
+    op.execute(
+        "SELECT setval('user_interactions_id_seq', "
+        "coalesce((SELECT max(id) FROM user_interactions), 0) + 1, false)"
+    )
+    # Dropping the parent drops every partition with it
+    op.execute("DROP TABLE user_interactions_partitioned")
+
+    op.create_index('idx_interactions_user_id', 'user_interactions', ['user_id'])
+    op.create_index('idx_interactions_created_at', 'user_interactions', ['created_at'])
+    op.create_index('idx_interactions_type', 'user_interactions', ['interaction_type'])
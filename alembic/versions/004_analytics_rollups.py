@@ -0,0 +1,36 @@
+"""Analytics rollups
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-03-04 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_stats',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('new_users', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('active_users_hll', sa.LargeBinary(), nullable=True),
+    )
+
+    op.create_table(
+        'daily_interaction_counts',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('interaction_type', sa.String(50), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_interaction_counts')
+    op.drop_table('daily_stats')
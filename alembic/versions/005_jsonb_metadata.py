@@ -0,0 +1,110 @@
+"""JSONB metadata columns
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-03-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs that hold JSON documents
+JSON_COLUMNS = [
+    ('users', 'metadata'),
+    ('channels', 'metadata'),
+    ('user_sessions', 'session_data'),
+    ('user_interactions', 'metadata'),
+]
+
+# Rows per UPDATE; each batch commits on its own so locks are held briefly
+BATCH_SIZE = 10_000
+
+
+def _convert(table: str, column: str, new_type: str, value: str) -> None:
+    """
+    Rewrite `column` as `new_type` without a table rewrite under ACCESS EXCLUSIVE
+
+    A shadow column is added (instant), filled in id ranges that commit one
+    by one, then swapped in with a short lock. The bot only writes these
+    columns on INSERT, so rows added during the backfill are caught up
+    under that lock. `value` is the SQL for the new value, {column} is the old one.
+    """
+    shadow = f'{column}_new'
+    value = value.format(column=column)
+    bind = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        op.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {shadow} {new_type}')
+
+        low, high = bind.execute(sa.text(f'SELECT min(id), max(id) FROM {table}')).one()
+        if low is not None:
+            for start in range(low, high + 1, BATCH_SIZE):
+                bind.execute(sa.text(
+                    f'UPDATE {table} SET {shadow} = {value} '
+                    f'WHERE id >= :start AND id < :end AND {shadow} IS NULL'
+                ), {'start': start, 'end': start + BATCH_SIZE})
+
+    # Alembic's transaction: catch up, then swap (DROP / RENAME only touch the catalog)
+    op.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+    op.execute(f'UPDATE {table} SET {shadow} = {value} WHERE {shadow} IS NULL')
+    op.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+    op.execute(f'ALTER TABLE {table} RENAME COLUMN {shadow} TO {column}')
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT '{{}}'")
+
+
+def _partitions(table: str) -> list:
+    return list(op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {'table': table}).scalars())
+
+
+def _create_gin_indexes() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_metadata_gin '
+            'ON users USING gin (metadata jsonb_path_ops)'
+        )
+
+        # CONCURRENTLY is not allowed on a partitioned table: build an invalid
+        # parent index, build each partition's concurrently and attach it
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS idx_interactions_metadata_gin '
+            'ON ONLY user_interactions USING gin (metadata jsonb_path_ops)'
+        )
+        for partition in _partitions('user_interactions'):
+            index = f'{partition}_metadata_gin'
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} '
+                f'ON {partition} USING gin (metadata jsonb_path_ops)'
+            )
+            op.execute(f'ALTER INDEX idx_interactions_metadata_gin ATTACH PARTITION {index}')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite stores JSON as text already, only the mapped type changes
+        return
+
+    for table, column in JSON_COLUMNS:
+        _convert(table, column, 'jsonb', "coalesce(nullif({column}, ''), '{{}}')::jsonb")
+    _create_gin_indexes()
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        # Dropping the parent index drops the attached partition indexes
+        op.execute('DROP INDEX IF EXISTS idx_interactions_metadata_gin')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_users_metadata_gin')
+
+    for table, column in JSON_COLUMNS:
+        _convert(table, column, 'text', "coalesce({column}::text, '{{}}')")
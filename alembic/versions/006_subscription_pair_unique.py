@@ -0,0 +1,60 @@
+"""One user_subscriptions row per (user, channel)
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-03-25 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+INDEX = 'uq_user_subscriptions_user_channel'
+
+# Keep the most recently checked row of every pair
+DEDUPLICATE = """
+    DELETE FROM user_subscriptions WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, channel_id
+                ORDER BY checked_at IS NULL, checked_at DESC, id DESC
+            ) AS position
+            FROM user_subscriptions
+        ) ranked
+        WHERE position > 1
+    )
+"""
+
+
+def upgrade() -> None:
+    op.execute(DEDUPLICATE)
+
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index(INDEX, 'user_subscriptions', ['user_id', 'channel_id'], unique=True)
+        op.drop_index('idx_subscriptions_user_id', table_name='user_subscriptions')
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} '
+            'ON user_subscriptions (user_id, channel_id)'
+        )
+        # The pair index starts with user_id, the single column one is redundant
+        # (ix_ is its name in databases made by create_all)
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_subscriptions_user_id')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_user_subscriptions_user_id')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index('idx_subscriptions_user_id', 'user_subscriptions', ['user_id'])
+        op.drop_index(INDEX, table_name='user_subscriptions')
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_user_id ON user_subscriptions (user_id)')
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX}')
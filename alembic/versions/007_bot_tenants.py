@@ -0,0 +1,167 @@
+"""bot_id tenant key: several bots share one database
+
+Existing rows belong to the bot of BOT_TOKEN. On PostgreSQL adding the
+column with a constant default is a catalog change (no table rewrite);
+the unique indexes are built concurrently and the foreign keys are added
+NOT VALID and validated afterwards, except on the partitioned
+user_interactions where PostgreSQL checks them right away.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-04-08 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from bot.database.tenancy import default_bot_id
+
+# revision identifiers
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+TENANT_TABLES = ('users', 'user_interactions', 'user_sessions', 'channels', 'user_subscriptions', 'broadcasts')
+ROLLUP_KEYS = {
+    'daily_stats': ['day'],
+    'daily_interaction_counts': ['day', 'interaction_type'],
+}
+# (table, column, ON DELETE) -> users (bot_id, telegram_id)
+USER_KEYS = (
+    ('user_interactions', 'user_id', 'CASCADE'),
+    ('user_sessions', 'user_id', 'CASCADE'),
+    ('user_subscriptions', 'user_id', 'CASCADE'),
+    ('channels', 'added_by', None),
+)
+
+
+def _fk_name(table: str, column: str) -> str:
+    # PostgreSQL's own name, the same one create_all ends up with
+    return f'{table}_bot_id_{column}_fkey'
+
+
+def upgrade() -> None:
+    bot_id = default_bot_id()
+    if op.get_bind().dialect.name != 'postgresql':
+        _upgrade_sqlite(bot_id)
+        return
+
+    for table in TENANT_TABLES + tuple(ROLLUP_KEYS):
+        op.execute(f'ALTER TABLE {table} ADD COLUMN bot_id BIGINT NOT NULL DEFAULT {bot_id}')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN bot_id DROP DEFAULT')
+    for table, columns in ROLLUP_KEYS.items():
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_pkey')
+        op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (bot_id, {", ".join(columns)})')
+
+    with op.get_context().autocommit_block():
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_users_bot_telegram ON users (bot_id, telegram_id)')
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_channels_bot_channel ON channels (bot_id, channel_id)')
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_bot_id ON users (bot_id, id)')
+
+    # Migrations named the single-column keys *_key / idx_*, create_all ix_*;
+    # CASCADE takes the foreign keys to users.telegram_id with them
+    op.execute('ALTER TABLE users DROP CONSTRAINT IF EXISTS users_telegram_id_key CASCADE')
+    op.execute('DROP INDEX IF EXISTS ix_users_telegram_id CASCADE')
+    op.execute('DROP INDEX IF EXISTS idx_users_telegram_id')
+    op.execute('ALTER TABLE channels DROP CONSTRAINT IF EXISTS channels_channel_id_key')
+    for table, column, _ in USER_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+
+    for table, column, on_delete in USER_KEYS:
+        not_valid = '' if table == 'user_interactions' else ' NOT VALID'
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {_fk_name(table, column)} '
+            f'FOREIGN KEY (bot_id, {column}) REFERENCES users (bot_id, telegram_id)'
+            f'{f" ON DELETE {on_delete}" if on_delete else ""}{not_valid}'
+        )
+    with op.get_context().autocommit_block():
+        for table, column, _ in USER_KEYS:
+            if table != 'user_interactions':
+                op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {_fk_name(table, column)}')
+
+
+# Unnamed SQLite constraints get these names inside batch operations
+SQLITE_NAMING = {
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def _upgrade_sqlite(bot_id: int) -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TENANT_TABLES + tuple(ROLLUP_KEYS):
+        op.add_column(table, sa.Column('bot_id', sa.BigInteger(), nullable=False, server_default=str(bot_id)))
+
+    # Single-column uniques: constraints from 001, unique indexes from create_all
+    for table, column in (('users', 'telegram_id'), ('channels', 'channel_id')):
+        if any(uq['column_names'] == [column] for uq in inspector.get_unique_constraints(table)):
+            with op.batch_alter_table(table, naming_convention=SQLITE_NAMING) as batch:
+                batch.drop_constraint(f'uq_{table}_{column}', type_='unique')
+        for index in inspector.get_indexes(table):
+            if index['column_names'] == [column]:
+                op.drop_index(index['name'], table_name=table)
+    op.create_index('uq_users_bot_telegram', 'users', ['bot_id', 'telegram_id'], unique=True)
+    op.create_index('uq_channels_bot_channel', 'channels', ['bot_id', 'channel_id'], unique=True)
+    op.create_index('idx_users_bot_id', 'users', ['bot_id', 'id'])
+
+    for table, column, on_delete in USER_KEYS:
+        with op.batch_alter_table(table, naming_convention=SQLITE_NAMING, recreate='always') as batch:
+            if any(fk['constrained_columns'] == [column] for fk in inspector.get_foreign_keys(table)):
+                batch.drop_constraint(f'fk_{table}_{column}_users', type_='foreignkey')
+            batch.create_foreign_key(
+                _fk_name(table, column), 'users', ['bot_id', column], ['bot_id', 'telegram_id'], ondelete=on_delete,
+            )
+    for table, columns in ROLLUP_KEYS.items():
+        with op.batch_alter_table(table, recreate='always') as batch:
+            batch.create_primary_key(f'{table}_pkey', ['bot_id'] + columns)
+
+
+def downgrade() -> None:
+    """Back to one bot: only works while the rows of a single bot are left"""
+    if op.get_bind().dialect.name != 'postgresql':
+        _downgrade_sqlite()
+        return
+
+    for table, column, _ in USER_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {_fk_name(table, column)}')
+    op.execute('ALTER TABLE users ADD CONSTRAINT users_telegram_id_key UNIQUE (telegram_id)')
+    op.execute('ALTER TABLE channels ADD CONSTRAINT channels_channel_id_key UNIQUE (channel_id)')
+    op.execute('DROP INDEX IF EXISTS uq_users_bot_telegram')
+    op.execute('DROP INDEX IF EXISTS uq_channels_bot_channel')
+    op.execute('DROP INDEX IF EXISTS idx_users_bot_id')
+    for table, column, on_delete in USER_KEYS:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES users (telegram_id)'
+            f'{f" ON DELETE {on_delete}" if on_delete else ""}'
+        )
+    for table, columns in ROLLUP_KEYS.items():
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_pkey')
+        op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({", ".join(columns)})')
+    for table in TENANT_TABLES + tuple(ROLLUP_KEYS):
+        op.execute(f'ALTER TABLE {table} DROP COLUMN bot_id')
+
+
+def _downgrade_sqlite() -> None:
+    # Users and channels first: the restored foreign keys reference users.telegram_id
+    op.drop_index('uq_users_bot_telegram', table_name='users')
+    op.drop_index('idx_users_bot_id', table_name='users')
+    op.drop_index('uq_channels_bot_channel', table_name='channels')
+    for table, column in (('users', 'telegram_id'), ('channels', 'channel_id')):
+        with op.batch_alter_table(table, naming_convention=SQLITE_NAMING) as batch:
+            batch.create_unique_constraint(f'uq_{table}_{column}', [column])
+    op.create_index('idx_users_telegram_id', 'users', ['telegram_id'])
+
+    for table, column, on_delete in USER_KEYS:
+        with op.batch_alter_table(table, naming_convention=SQLITE_NAMING, recreate='always') as batch:
+            batch.drop_constraint(_fk_name(table, column), type_='foreignkey')
+            batch.create_foreign_key(
+                f'fk_{table}_{column}_users', 'users', [column], ['telegram_id'], ondelete=on_delete,
+            )
+    for table, columns in ROLLUP_KEYS.items():
+        with op.batch_alter_table(table, recreate='always') as batch:
+            batch.create_primary_key(f'{table}_pkey', columns)
+
+    for table in TENANT_TABLES + tuple(ROLLUP_KEYS):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('bot_id')
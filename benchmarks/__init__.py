@@ -0,0 +1,8 @@
+"""Benchmarks (run with `python -m benchmarks.<name>`)"""
+import os
+
+# Settings are required (read once, on first use), benchmarks never talk to real Telegram
+os.environ.setdefault("BOT_TOKEN", "42:benchmark")
+os.environ.setdefault("ADMIN_USER_ID", "1")
+os.environ.setdefault("USE_SQLITE", "True")
+os.environ.setdefault("DEBUG", "False")
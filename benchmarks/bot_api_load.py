@@ -0,0 +1,257 @@
+"""
+End-to-end load test: the real bot process against the mock Bot API
+
+    python -m benchmarks.bot_api_load --mode polling --rates 5,10,20,40,80
+    python -m benchmarks.bot_api_load --mode webhook --latency 0.1 --unpaced
+
+Starts benchmarks.mock_bot_api in this process and `python -m bot.main` as a
+subprocess pointed at it (TELEGRAM_API_URL, scratch SQLite database with
+--channels forced-subscription channels). Traffic ramps through --rates,
+--step-seconds at each rate; latency is from the update entering the mock's
+queue to the bot's reply arriving there.
+
+Per step: offered and achieved rate, p50/p99 latency, 429s handed out and
+updates never answered. The knee is the last step that still kept up
+(achieved >= 90% of offered and p99 under 3x the first step's); past it
+the bot queues instead of serving. By default the bot keeps its own
+outbound pacing and the mock enforces Telegram's limits, so the knee is
+where flood control bites; --unpaced lifts both to find the bot's own limit.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from benchmarks.fake_session import UpdateFactory
+from benchmarks.mock_bot_api import MockBotAPI
+
+USER_ID_BASE = 1_000_000
+KEEPS_UP = 0.9
+P99_GROWTH = 3.0
+
+
+class Step:
+    def __init__(self, rate: float, started: float, duration: float):
+        self.rate = rate
+        self.started = started
+        self.ended = started + duration
+        self.sent = 0
+        self.latencies: List[float] = []
+        self.flood_waits = 0
+
+
+class LoadDriver:
+    """Emits ramped traffic into the mock and matches replies to updates per chat"""
+
+    def __init__(self, api: MockBotAPI, users: int, text: str):
+        self.api = api
+        self.users = users
+        self.text = text
+        self.steps: List[Step] = []
+        self.replies_at: List[float] = []
+        self._pending: Dict[str, Deque[Tuple[float, Step]]] = defaultdict(deque)
+        self._factory = UpdateFactory()
+        self._floods = 0
+        api.on_call = self._on_call
+
+    def _on_call(self, method: str, params: Dict[str, Any]) -> None:
+        if method != "sendmessage":
+            return
+        # First reply per update, further messages to the same chat are extras
+        pending = self._pending.get(str(params.get("chat_id")))
+        if pending:
+            sent_at, step = pending.popleft()
+            now = time.perf_counter()
+            step.latencies.append(now - sent_at)
+            self.replies_at.append(now)
+
+    async def ramp(self, rates: List[float], step_seconds: float) -> None:
+        index = 0
+        for rate in rates:
+            step = Step(rate, time.perf_counter(), step_seconds)
+            self.steps.append(step)
+            floods_before = sum(self.api.flood_waits.values())
+            count = int(rate * step_seconds)
+            for position in range(count):
+                delay = step.started + position / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                user_id = USER_ID_BASE + index % self.users
+                index += 1
+                self._pending[str(user_id)].append((time.perf_counter(), step))
+                self.api.push_update(self._factory.message(user_id, self.text))
+                step.sent += 1
+            remaining = step.ended - time.perf_counter()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            step.flood_waits = sum(self.api.flood_waits.values()) - floods_before
+
+    async def drain(self, timeout: float) -> None:
+        deadline = time.perf_counter() + timeout
+        while any(self._pending.values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+
+    def report(self) -> List[Dict[str, Any]]:
+        rows = []
+        for step in self.steps:
+            served = sum(1 for at in self.replies_at if step.started <= at < step.ended)
+            latencies = sorted(step.latencies)
+            rows.append({
+                "offered": step.rate,
+                "achieved": round(served / (step.ended - step.started), 1),
+                "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 1) if latencies else None,
+                "unanswered": step.sent - len(latencies),
+                "429s": step.flood_waits,
+            })
+        return rows
+
+
+def find_knee(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Last step that kept up with the offered rate without latency blowing up"""
+    knee = None
+    base_p99 = rows[0]["p99_ms"] if rows and rows[0]["p99_ms"] else None
+    for row in rows:
+        kept_up = row["achieved"] >= KEEPS_UP * row["offered"] and not row["unanswered"]
+        bounded = base_p99 is not None and row["p99_ms"] is not None and row["p99_ms"] <= P99_GROWTH * base_p99
+        if not (kept_up and bounded):
+            break
+        knee = row
+    return knee
+
+
+async def prepare_database(path: str, channels: int) -> List[int]:
+    """Fresh schema with active channels, before the bot (DEBUG=False) starts"""
+    os.environ.update(USE_SQLITE="True", SQLITE_PATH=path)
+    from bot.database.models import Base, Channel
+    from bot.database.session import close_db, get_engine
+
+    channel_ids = [-1_000_000_000 - index for index in range(channels)]
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for channel_id in channel_ids:
+            await conn.execute(Channel.__table__.insert().values(
+                channel_id=channel_id, channel_username=f"load{-channel_id}", channel_title="Load", is_active=True,
+            ))
+    await close_db()
+    return channel_ids
+
+
+def bot_environment(args: argparse.Namespace, database: str) -> Dict[str, str]:
+    env = dict(
+        os.environ,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.port}",
+        RUN_MODE=args.mode,
+        USE_SQLITE="True",
+        SQLITE_PATH=database,
+        DEBUG="False",
+        METRICS_PORT="0",
+        WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port}",
+        WEBHOOK_HOST="127.0.0.1",
+        WEBHOOK_PORT=str(args.webhook_port),
+    )
+    if args.unpaced:
+        env.update(
+            OUTBOUND_GLOBAL_RATE="1000000",
+            OUTBOUND_GLOBAL_BURST="1000000",
+            OUTBOUND_PRIVATE_CHAT_RATE="1000000",
+            OUTBOUND_CHAT_BURST="1000000",
+            GET_CHAT_MEMBER_RATE="1000000",
+            GET_CHAT_MEMBER_BURST="1000000",
+        )
+    return env
+
+
+async def stop_process(process: asyncio.subprocess.Process, timeout: float = 30.0) -> None:
+    if process.returncode is not None:
+        return
+    process.send_signal(signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("polling", "webhook", "workers"), default="polling")
+    parser.add_argument("--rates", default="5,10,20,40,80,160", help="Offered updates/sec per step")
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--drain", type=float, default=10.0, help="Seconds to wait for late replies")
+    parser.add_argument("--users", type=int, default=100_000, help="Distinct senders, round-robin")
+    parser.add_argument("--text", default="hello", help="Message text (/start skips the subscription check)")
+    parser.add_argument("--channels", type=int, default=1, help="Forced-subscription channels")
+    parser.add_argument("--not-member", type=float, default=0.0, help="Share of users not in the channels")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock Bot API answer latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--unpaced", action="store_true", help="Lift outbound pacing in the bot and flood limits in the mock")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--webhook-port", type=int, default=8091)
+    args = parser.parse_args()
+    rates = [float(rate) for rate in args.rates.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="bot_api_load_")
+    database = os.path.join(workdir, "bot.db")
+    channel_ids = await prepare_database(database, args.channels)
+
+    api = MockBotAPI(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        send_rate=0.0 if args.unpaced else 30.0,
+        chat_rate=0.0 if args.unpaced else 1.0,
+    )
+    not_member = int(args.users * args.not_member)
+    for channel_id in channel_ids:
+        api.set_membership(channel_id, {USER_ID_BASE + index: "left" for index in range(not_member)})
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    log_path = os.path.join(workdir, "bot.log")
+    with open(log_path, "wb") as log:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "bot.main", env=bot_environment(args, database), stdout=log, stderr=log,
+        )
+        try:
+            await asyncio.wait_for(api.ready.wait(), 60)
+            print(f"bot up ({args.mode}), log: {log_path}", flush=True)
+            driver = LoadDriver(api, args.users, args.text)
+            await driver.ramp(rates, args.step_seconds)
+            await driver.drain(args.drain)
+        except asyncio.TimeoutError:
+            print(f"bot did not start, see {log_path}", file=sys.stderr)
+            return 1
+        finally:
+            await stop_process(process)
+            await runner.cleanup()
+
+    rows = driver.report()
+    print(f"\n{'offered':>8} {'achieved':>9} {'p50 ms':>9} {'p99 ms':>9} {'lost':>6} {'429s':>6}")
+    for row in rows:
+        print(
+            f"{row['offered']:>8} {row['achieved']:>9} {row['p50_ms'] or '-':>9} {row['p99_ms'] or '-':>9}"
+            f" {row['unanswered']:>6} {row['429s']:>6}"
+        )
+    knee = find_knee(rows)
+    if knee is None:
+        print("\nknee: below the first step")
+    elif knee is rows[-1]:
+        print(f"\nknee: above {knee['offered']}/s, add higher --rates")
+    else:
+        print(f"\nknee: ~{knee['offered']}/s (p99 {knee['p99_ms']}ms)")
+    print(f"api calls: {dict(api.calls)}, redelivered webhooks: {api.redelivered}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
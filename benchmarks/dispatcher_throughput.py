@@ -0,0 +1,306 @@
+"""
+Synthetic update streams through the real Dispatcher, middlewares and routers
+
+    python -m benchmarks.dispatcher_throughput --updates 2000
+    python -m benchmarks.dispatcher_throughput --postgres --compare benchmarks/results/dispatcher-postgresql.json
+
+Scenarios run one after another on a fresh schema:
+  new_user_start   /start from users the bot has never seen
+  returning_start  /start again from the same users
+  text             plain text (analytics + forced subscription check)
+  callback         callback queries (check_subscription button)
+
+The Bot API is the in-memory FakeTelegramSession and outbound pacing is
+lifted, so the numbers are the bot's own processing cost. The database is
+a scratch SQLite file, or with --postgres the POSTGRES_* server with
+database --postgres-db (created if missing, its tables are dropped).
+
+Per scenario: updates/sec, p50/p99 latency, SQL statements per update (on
+the update path and from the background analytics writer), transient
+memory per update and memory retained afterwards (tracemalloc, separate
+pass; aiogram's Update.event_type lru_cache alone keeps the last 128
+updates alive, so short passes overstate it). Results go to a JSON file;
+--compare prints the change against an earlier file and exits with 1 if
+something got worse than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from benchmarks.fake_session import FakeTelegramSession, UpdateFactory
+
+SCENARIOS = ("new_user_start", "returning_start", "text", "callback")
+# (key, True if higher is better)
+COMPARED = (
+    ("updates_per_sec", True),
+    ("p50_ms", False),
+    ("p99_ms", False),
+    ("queries_per_update", False),
+    ("background_queries_per_update", False),
+    ("alloc_peak_kb", False),
+    ("retained_bytes_per_update", False),
+)
+USER_ID_BASE = 1_000_000
+
+
+def configure_environment(args: argparse.Namespace) -> str:
+    """Settings are read once on first use, so this runs before any bot module is used"""
+    # Benchmark the bot, not Telegram's rate limits
+    os.environ.update(
+        OUTBOUND_GLOBAL_RATE="1000000",
+        OUTBOUND_GLOBAL_BURST="1000000",
+        OUTBOUND_PRIVATE_CHAT_RATE="1000000",
+        OUTBOUND_GROUP_CHAT_RATE="1000000",
+        OUTBOUND_CHAT_BURST="1000000",
+        GET_CHAT_MEMBER_RATE="1000000",
+        GET_CHAT_MEMBER_BURST="1000000",
+        # Any free port, the metrics middlewares stay on as in a monitored deployment
+        METRICS_ENABLED="True",
+        METRICS_PORT="0",
+        PROFILING_ENABLED="False",
+    )
+    if args.postgres:
+        os.environ["USE_SQLITE"] = "False"
+        os.environ["POSTGRES_DB"] = args.postgres_db
+        return "postgresql"
+
+    os.environ["USE_SQLITE"] = "True"
+    os.environ["SQLITE_PATH"] = os.path.join(tempfile.gettempdir(), "dispatcher_benchmark.db")
+    return "sqlite"
+
+
+async def ensure_postgres_database(name: str) -> None:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from bot.config.settings import settings
+
+    maintenance = create_async_engine(
+        settings.DATABASE_URL.rsplit("/", 1)[0] + "/postgres", isolation_level="AUTOCOMMIT"
+    )
+    async with maintenance.connect() as conn:
+        exists = await conn.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name})
+        if not exists:
+            await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    await maintenance.dispose()
+
+
+def build_updates(factory: UpdateFactory, scenario: str, users: range) -> List[Dict[str, Any]]:
+    if scenario in ("new_user_start", "returning_start"):
+        return [factory.message(user_id, "/start") for user_id in users]
+    if scenario == "text":
+        return [factory.message(user_id, f"hello {user_id}") for user_id in users]
+    return [factory.callback_query(user_id, "check_subscription") for user_id in users]
+
+
+class QueryCounter:
+    """SQL statements on the update path vs the analytics writer task"""
+
+    def __init__(self, engine):
+        self.foreground = 0
+        self.background = 0
+        from sqlalchemy import event
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args: Any) -> None:
+        task = asyncio.current_task()
+        if task is not None and task.get_name() == "analytics-writer":
+            self.background += 1
+        else:
+            self.foreground += 1
+
+    def reset(self) -> None:
+        self.foreground = self.background = 0
+
+
+async def drain_writer() -> None:
+    """Flush queued analytics so their statements count toward the scenario"""
+    from bot.services.analytics_writer import get_analytics_writer
+    writer = get_analytics_writer()
+    await writer.stop()
+    await writer.start()
+
+
+async def feed(dp, bot, updates: List[Dict[str, Any]], concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    queue = iter(updates)
+
+    async def worker() -> None:
+        for update in queue:
+            started = time.perf_counter()
+            await dp.feed_raw_update(bot, update)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def measure_memory(dp, bot, updates: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Sequential pass under tracemalloc: transient peak per update and what stays allocated"""
+    peaks = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for update in updates:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await dp.feed_raw_update(bot, update)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    await drain_writer()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {
+        "alloc_peak_kb": round(statistics.median(peaks) / 1024, 1),
+        "retained_bytes_per_update": round(retained / len(updates)),
+    }
+
+
+async def run(args: argparse.Namespace, database: str) -> Dict[str, Any]:
+    from bot.database.models import Base, Channel
+    from bot.database.session import close_db, get_engine
+    from bot.main import create_bot, create_dispatcher
+
+    # bot.main configures INFO logging, a log line per update would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if database == "postgresql":
+        await ensure_postgres_database(args.postgres_db)
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for index in range(args.channels):
+            await conn.execute(Channel.__table__.insert().values(
+                channel_id=-1_000_000_000 - index, channel_username=f"bench{index}", channel_title="Bench", is_active=True,
+            ))
+
+    session = FakeTelegramSession(latency=args.api_latency)
+    bot = create_bot(session=session)
+    dp = create_dispatcher()
+    counter = QueryCounter(engine)
+    factory = UpdateFactory()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    users = range(USER_ID_BASE, USER_ID_BASE + args.updates)
+    memory_users = range(USER_ID_BASE + args.updates, USER_ID_BASE + args.updates + args.memory_updates)
+    results: Dict[str, Any] = {}
+    try:
+        for scenario in SCENARIOS:
+            updates = build_updates(factory, scenario, users)
+            counter.reset()
+            started = time.perf_counter()
+            latencies = sorted(await feed(dp, bot, updates, args.concurrency))
+            elapsed = time.perf_counter() - started
+            await drain_writer()
+            foreground, background = counter.foreground, counter.background
+
+            # Memory pass: new users for the first scenario, the same kind of update otherwise
+            memory_updates = build_updates(factory, scenario, memory_users)
+            memory = await measure_memory(dp, bot, memory_updates)
+
+            results[scenario] = {
+                "updates": len(latencies),
+                "updates_per_sec": round(len(latencies) / elapsed, 1),
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 3),
+                "queries_per_update": round(foreground / len(latencies), 2),
+                "background_queries_per_update": round(background / len(latencies), 2),
+                **memory,
+            }
+            print(scenario, results[scenario], flush=True)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await close_db()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "database": database,
+            "updates": args.updates,
+            "concurrency": args.concurrency,
+            "channels": args.channels,
+            "api_latency": args.api_latency,
+            "api_calls": dict(session.calls),
+        },
+        "scenarios": results,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Print changes against a baseline, True if anything regressed beyond tolerance"""
+    regressed = False
+    print(f"\nvs {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp')})")
+    for scenario, values in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if not before:
+            continue
+        for key, higher_is_better in COMPARED:
+            old, new = before.get(key), values.get(key)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > tolerance:
+                flag = "  <-- regression"
+                regressed = True
+            print(f"  {scenario:16} {key:30} {old:>12} -> {new:>12} ({change:+.1%}){flag}")
+    return regressed
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000, help="Updates per scenario")
+    parser.add_argument("--memory-updates", type=int, default=200, help="Updates per scenario in the tracemalloc pass")
+    parser.add_argument("--concurrency", type=int, default=1, help="Updates processed at once")
+    parser.add_argument("--channels", type=int, default=1, help="Active forced-subscription channels")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Simulated Bot API latency (seconds)")
+    parser.add_argument("--postgres", action="store_true", help="Use the POSTGRES_* server instead of SQLite")
+    parser.add_argument("--postgres-db", default="telegram_bot_bench")
+    parser.add_argument("--output", default=None, help="Default: benchmarks/results/dispatcher-<database>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before flagging")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+
+    database = configure_environment(args)
+    result = await run(args, database)
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"dispatcher-{database}.json")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as stream:
+        json.dump(result, stream, indent=2)
+    print(f"results: {output}")
+
+    if baseline is not None and compare(result, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
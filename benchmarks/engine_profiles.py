@@ -0,0 +1,170 @@
+"""
+Engine profiles compared on the analytics write path
+
+    python -m benchmarks.engine_profiles --seconds 10
+    python -m benchmarks.engine_profiles --postgres --profiles default,safe,legacy
+
+For every profile in bot/database/profiles.py a fresh database (new SQLite
+file, or the dropped and recreated --postgres-db) gets the same mixed load
+for --seconds:
+  analytics   AnalyticsWriter flushing batches of interactions + rollups
+  register    --writers tasks committing one new user each (/start)
+  lookup      --readers tasks reading one user per session (update path)
+
+Reported per profile: analytics events written/sec, commits/sec and p99 of
+registrations, lookups/sec with p50/p99 (pre-ping shows up here), and
+errors such as "database is locked".
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+USER_ID_BASE = 1_000_000
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "per_sec": round(len(latencies) / seconds, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2) if latencies else None,
+            "errors": sum(self.errors.values()),
+        }
+
+
+async def prepare(engine, users: int) -> None:
+    from bot.database.models import Base, User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        rows = [{"telegram_id": USER_ID_BASE + index, "first_name": "Bench"} for index in range(users)]
+        await conn.execute(User.__table__.insert(), rows)
+
+
+async def run_profile(name: str, url: str, sqlite: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    from bot.database.profiles import ENGINE_PROFILES, apply_sqlite_pragmas, engine_options
+    from bot.database.repositories.user_repository import UserRepository
+    from bot.services.analytics_writer import AnalyticsWriter, InteractionEvent
+
+    profile = ENGINE_PROFILES[name]
+    engine = create_async_engine(url, **engine_options(profile, sqlite=sqlite))
+    if sqlite:
+        apply_sqlite_pragmas(engine, profile.sqlite_pragmas)
+    await prepare(engine, args.users)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+    writer = AnalyticsWriter(session_factory, batch_size=args.batch_size, flush_interval=0.05, overflow_policy="block")
+    await writer.start()
+    register, lookup = Recorder(), Recorder()
+    new_ids = itertools.count(USER_ID_BASE + args.users)
+    deadline = time.perf_counter() + args.seconds
+
+    async def produce() -> None:
+        for index in itertools.count():
+            if time.perf_counter() >= deadline:
+                return
+            await writer.submit(InteractionEvent(USER_ID_BASE + index % args.users, "message", "hello"))
+            if index % 100 == 0:
+                await asyncio.sleep(0)
+
+    async def timed(recorder: Recorder, operation) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_factory() as session:
+                    await operation(UserRepository(session))
+                    await session.commit()
+            except Exception as e:
+                recorder.errors[f"{type(e).__name__}: {str(e).splitlines()[0][:60]}"] += 1
+                continue
+            recorder.latencies.append(time.perf_counter() - started)
+
+    async def create_user(repository) -> None:
+        await repository.upsert(next(new_ids), first_name="New")
+
+    lookup_ids = itertools.cycle(range(USER_ID_BASE, USER_ID_BASE + args.users, 7))
+
+    async def read_user(repository) -> None:
+        await repository.get_by_telegram_id(next(lookup_ids))
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        produce(),
+        *(timed(register, create_user) for _ in range(args.writers)),
+        *(timed(lookup, read_user) for _ in range(args.readers)),
+    )
+    elapsed = time.perf_counter() - started
+    await writer.stop()
+    await engine.dispose()
+
+    errors = register.errors + lookup.errors
+    return {
+        "analytics_per_sec": round(writer.written / elapsed, 1),
+        "analytics_failed": writer.failed,
+        "register": register.summary(elapsed),
+        "lookup": lookup.summary(elapsed),
+        "error_kinds": dict(errors.most_common(3)),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default=None, help="Comma-separated, default: all")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per profile")
+    parser.add_argument("--users", type=int, default=20_000, help="Existing users")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent registrations")
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent lookups")
+    parser.add_argument("--batch-size", type=int, default=200, help="Analytics writer batch size")
+    parser.add_argument("--postgres", action="store_true", help="Use the POSTGRES_* server instead of SQLite")
+    parser.add_argument("--postgres-db", default="telegram_bot_bench")
+    args = parser.parse_args()
+
+    os.environ["USE_SQLITE"] = "False" if args.postgres else "True"
+    os.environ["METRICS_ENABLED"] = "False"
+    from bot.database.profiles import ENGINE_PROFILES
+
+    names = args.profiles.split(",") if args.profiles else list(ENGINE_PROFILES)
+    if args.postgres:
+        from bot.config.settings import settings
+        from benchmarks.dispatcher_throughput import ensure_postgres_database
+
+        await ensure_postgres_database(args.postgres_db)
+        url = settings.DATABASE_URL.rsplit("/", 1)[0] + f"/{args.postgres_db}"
+    workdir = tempfile.mkdtemp(prefix="engine_profiles_")
+
+    print(
+        f"{'profile':12} {'analytics/s':>12} {'register/s':>11} {'reg p99':>9}"
+        f" {'lookup/s':>9} {'look p50':>9} {'look p99':>9} {'errors':>7}"
+    )
+    for name in names:
+        if not args.postgres:
+            # WAL is a property of the file, every profile starts from a new one
+            url = f"sqlite+aiosqlite:///{os.path.join(workdir, f'{name}.db')}"
+        result = await run_profile(name, url, not args.postgres, args)
+        register, lookup = result["register"], result["lookup"]
+        print(
+            f"{name:12} {result['analytics_per_sec']:>12} {register['per_sec']:>11} {register['p99_ms'] or '-':>9}"
+            f" {lookup['per_sec']:>9} {lookup['p50_ms'] or '-':>9} {lookup['p99_ms'] or '-':>9}"
+            f" {register['errors'] + lookup['errors'] + result['analytics_failed']:>7}",
+            flush=True,
+        )
+        for kind, count in result["error_kinds"].items():
+            print(f"{'':12} {count} x {kind}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
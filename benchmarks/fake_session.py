@@ -0,0 +1,145 @@
+"""
+In-memory stand-in for the Telegram Bot API used by benchmarks:
+no network, configurable latency, scripted getUpdates
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter, deque
+from typing import Any, AsyncGenerator, Deque, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    EditMessageText,
+    GetChatMember,
+    GetMe,
+    GetUpdates,
+    Response,
+    SendMessage,
+    TelegramMethod,
+)
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeTelegramSession(BaseSession):
+    """aiogram session answering API calls from memory"""
+
+    def __init__(self, latency: float = 0.0, poll_latency: Optional[float] = None, member_status: str = "member"):
+        super().__init__()
+        self.latency = latency
+        self.poll_latency = latency if poll_latency is None else poll_latency
+        self.member_status = member_status
+        self.calls: Counter = Counter()
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self._arrived = asyncio.Event()
+        self._message_ids = itertools.count(1)
+
+    def push_update(self, update: Dict[str, Any]) -> None:
+        """Make update available to the next getUpdates call"""
+        self.pending.append(update)
+        self._arrived.set()
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+
+        if isinstance(method, GetUpdates):
+            result = await self._get_updates(method)
+        else:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            result = self._answer(method)
+
+        response = Response[method.__returning__].model_validate(  # type: ignore
+            {"ok": True, "result": result}, context={"bot": bot}
+        )
+        return response.result
+
+    async def _get_updates(self, method: GetUpdates) -> list:
+        if self.poll_latency:
+            await asyncio.sleep(self.poll_latency / 2)
+
+        if not self.pending:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), method.timeout or 0.01)
+            except asyncio.TimeoutError:
+                pass
+
+        while self.pending and method.offset and self.pending[0]["update_id"] < method.offset:
+            self.pending.popleft()
+
+        limit = method.limit or 100
+        batch = list(itertools.islice(self.pending, limit))
+        for _ in batch:
+            self.pending.popleft()
+
+        if self.poll_latency:
+            await asyncio.sleep(self.poll_latency / 2)
+        return batch
+
+    def _answer(self, method: TelegramMethod[Any]) -> Any:
+        if isinstance(method, GetMe):
+            return BOT_USER
+        if isinstance(method, GetChatMember):
+            return {
+                "status": self.member_status,
+                "user": {"id": method.user_id, "is_bot": False, "first_name": "User"},
+            }
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id or 0, "type": "private"},
+                "from": BOT_USER,
+                "text": method.text,
+            }
+        return True
+
+
+class UpdateFactory:
+    """Builds raw update dicts"""
+
+    def __init__(self, start_id: int = 1):
+        self._update_ids = itertools.count(start_id)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "uz"}
+
+    def message(self, user_id: int, text: str) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def callback_query(self, user_id: int, data: str) -> Dict[str, Any]:
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "prompt",
+                },
+            },
+        }
@@ -0,0 +1,129 @@
+"""
+Cold start cost: module imports of a fresh bot process
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --budget-ms 3000 --top 15
+
+Every run is a new interpreter with `-X importtime`, the same thing a
+container restart or a spawned worker pays before handling an update:
+  import      `import bot.main`, with BOT_TOKEN / ADMIN_USER_ID removed from
+              the environment, so reading settings at import time fails it
+  modules     every bot.* module, same environment: a singleton or filter
+              built from settings anywhere in the tree fails it
+  create_app  `create_app()`, everything imported before the first update
+
+Reported per target: median import time (sum of -X importtime self times)
+and process wall time, plus the top-level packages that cost the most.
+Exit code 1 when create_app is over --budget-ms, an import target fails,
+or an optional heavy module (pandas, pyarrow, matplotlib, plotly, openai)
+gets imported on the way to the first update; CI can run it as is.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+TARGETS = {
+    "import": "import bot.main",
+    "modules": (
+        "import importlib, pkgutil, bot\n"
+        "for module in pkgutil.walk_packages(bot.__path__, 'bot.'):\n"
+        "    importlib.import_module(module.name)"
+    ),
+    "create_app": "from bot.main import create_app; create_app()",
+}
+# Used by the admin reports only, they load on the first /report
+LAZY_MODULES = ("pandas", "pyarrow", "matplotlib", "plotly", "openai")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output: str) -> Dict[str, int]:
+    """Self time in microseconds per imported module"""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(1))
+    return modules
+
+
+def measure(code: str, env: Dict[str, str], cwd: str) -> Tuple[Dict[str, int], float]:
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env, cwd=cwd, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        error = "\n".join(line for line in process.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"{code!r} failed:\n{error[-2000:]}")
+    return parse_importtime(process.stderr), wall
+
+
+def run_target(name: str, runs: int) -> Dict[str, Any]:
+    # Outside the project, so a .env there cannot hide settings read at import time
+    cwd = tempfile.mkdtemp(prefix="import_time_")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    if name in ("import", "modules"):
+        env.pop("BOT_TOKEN", None)
+        env.pop("ADMIN_USER_ID", None)
+    code = TARGETS[name]
+
+    # First run writes the .pyc files, it is not a restart
+    measure(code, env, cwd)
+    samples = [measure(code, env, cwd) for _ in range(runs)]
+    totals = [sum(modules.values()) for modules, _ in samples]
+    median_run = samples[totals.index(sorted(totals)[len(totals) // 2])][0]
+
+    packages: Counter = Counter()
+    for module, self_us in median_run.items():
+        packages[module.split(".")[0]] += self_us
+    return {
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "wall_ms": round(statistics.median(wall for _, wall in samples) * 1000, 1),
+        "modules": len(median_run),
+        "packages": packages,
+        "lazy_imported": sorted(name for name in LAZY_MODULES if name in median_run),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target, the median is reported")
+    parser.add_argument("--budget-ms", type=float, default=4500.0, help="Limit for create_app import time")
+    parser.add_argument("--top", type=int, default=10, help="Most expensive top-level packages shown")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in TARGETS:
+        try:
+            results[name] = result = run_target(name, args.runs)
+        except RuntimeError as e:
+            failures.append(f"{name}: {e}")
+            continue
+        print(f"{name:11} imports {result['import_ms']:>8} ms   wall {result['wall_ms']:>8} ms   modules {result['modules']}")
+        for package, self_us in result["packages"].most_common(args.top):
+            print(f"{'':11} {package:24} {self_us / 1000:>8.1f} ms")
+        # "modules" loads the report module on purpose
+        if result["lazy_imported"] and name != "modules":
+            failures.append(f"{name}: imports {', '.join(result['lazy_imported'])}, which should load on first use")
+
+    app = results.get("create_app")
+    if app and app["import_ms"] > args.budget_ms:
+        failures.append(f"create_app: {app['import_ms']} ms of imports, budget {args.budget_ms} ms")
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Absolute cost of the Prometheus instrumentation
+
+    python -m benchmarks.metrics_overhead --updates 20000 --queries 20000
+
+Feeds updates through a dispatcher with three no-op middlewares and a no-op
+handler, with and without the metrics middlewares, and runs `SELECT 1` on an
+in-memory SQLite engine with and without the engine listeners. The
+difference is what instrumentation adds per update / per query; compare it
+with real update latency (bot_update_seconds) to get the overhead share.
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bot.middlewares.metrics import HandlerMetricsMiddleware, TimedMiddleware, UpdateMetricsMiddleware
+from bot.utils.metrics import instrument_engine
+
+
+class NoopMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        return await handler(event, data)
+
+
+async def handle(message) -> None:
+    return None
+
+
+def build_dispatcher(instrumented: bool) -> Dispatcher:
+    dp = Dispatcher()
+    wrap = TimedMiddleware if instrumented else (lambda middleware: middleware)
+    if instrumented:
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(wrap(NoopMiddleware()))
+    dp.message.middleware(wrap(NoopMiddleware()))
+    dp.message.middleware(wrap(NoopMiddleware()))
+    if instrumented:
+        dp.message.middleware(HandlerMetricsMiddleware())
+    dp.message.register(handle)
+    return dp
+
+
+async def updates_per_second(instrumented: bool, count: int) -> float:
+    bot = Bot("42:TEST")
+    dp = build_dispatcher(instrumented)
+    updates = [
+        Update.model_validate({
+            "update_id": i,
+            "message": {
+                "message_id": i, "date": 0, "text": "hello",
+                "chat": {"id": i, "type": "private"},
+                "from": {"id": i, "is_bot": False, "first_name": "U"},
+            },
+        }, context={"bot": bot})
+        for i in range(count)
+    ]
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return elapsed / count
+
+
+async def seconds_per_query(instrumented: bool, count: int) -> float:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    if instrumented:
+        instrument_engine(engine)
+    async with engine.connect() as conn:
+        started = time.perf_counter()
+        for _ in range(count):
+            await conn.execute(text("SELECT 1"))
+        elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return elapsed / count
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    # aiogram logs every handled update, that would dominate both runs
+    import logging
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    # Warm-up run so imports and caches do not count
+    await updates_per_second(True, 500)
+    await seconds_per_query(True, 500)
+
+    bare_update = await updates_per_second(False, args.updates)
+    timed_update = await updates_per_second(True, args.updates)
+    bare_query = await seconds_per_query(False, args.queries)
+    timed_query = await seconds_per_query(True, args.queries)
+
+    print({
+        "update_us": round(bare_update * 1e6, 1),
+        "update_instrumented_us": round(timed_update * 1e6, 1),
+        "added_per_update_us": round((timed_update - bare_update) * 1e6, 1),
+        "query_us": round(bare_query * 1e6, 1),
+        "query_instrumented_us": round(timed_query * 1e6, 1),
+        "added_per_query_us": round((timed_query - bare_query) * 1e6, 1),
+    })
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,350 @@
+"""
+Local stand-in for the Telegram Bot API, for end-to-end load tests
+
+    python -m benchmarks.mock_bot_api --port 8090 --rate 50 --latency 0.05
+    TELEGRAM_API_URL=http://127.0.0.1:8090 python -m bot.main
+
+Serves getUpdates from a scripted update stream, or delivers the stream to
+the bot's webhook once setWebhook was called (up to max_connections
+requests in flight, non-2xx answers are redelivered like Telegram does).
+sendMessage, getChatMember and the rest answer after a configurable
+latency; 429s come from random injection (`error_rate`) and from
+Telegram-like flood control on message methods (`send_rate` overall,
+`chat_rate` per chat). getChatMember reads per-channel membership tables.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fake_session import BOT_USER, UpdateFactory
+from bot.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Flood-controlled like sendMessage, everything else only gets random 429s
+MESSAGE_METHODS = {
+    "sendmessage", "editmessagetext", "sendphoto", "senddocument", "copymessage", "forwardmessage",
+}
+# Never fail these: they are the bot's plumbing, not its load
+CONTROL_METHODS = {"getupdates", "getme", "setwebhook", "deletewebhook", "getwebhookinfo"}
+
+
+def _chat_key(value: Any) -> str:
+    return str(value)
+
+
+class MockBotAPI:
+    """aiohttp application answering Bot API methods, with counters for the load driver"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        method_latency: Optional[Dict[str, float]] = None,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        send_rate: float = 0.0,
+        chat_rate: float = 0.0,
+        chat_burst: int = 3,
+        member_status: str = "member",
+    ):
+        self.latency = latency
+        self.method_latency = {name.lower(): value for name, value in (method_latency or {}).items()}
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.member_status = member_status
+        # channel -> {user_id: status}, channel -> status for users not in the table
+        self.membership: Dict[str, Dict[int, str]] = {}
+        self.channel_status: Dict[str, str] = {}
+
+        # Called with (method, params) after every answered call
+        self.on_call: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self.calls: Counter = Counter()
+        self.flood_waits: Counter = Counter()
+        self.redelivered = 0
+        self.ready = asyncio.Event()
+
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self._send_bucket = TokenBucket(send_rate, send_rate) if send_rate else None
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._message_ids = itertools.count(1)
+        self._webhook: Optional[Dict[str, Any]] = None
+        self._deliverers: List[asyncio.Task] = []
+        self._client: Optional[aiohttp.ClientSession] = None
+        self._scripts: List[asyncio.Task] = []
+
+    # Update stream
+
+    def push_update(self, update: Dict[str, Any]) -> None:
+        self.updates.put_nowait(update)
+
+    def feed(self, script: AsyncIterable[Dict[str, Any]]) -> asyncio.Task:
+        """Queue updates from an async generator as it yields them"""
+        async def run() -> None:
+            async for update in script:
+                self.push_update(update)
+
+        task = asyncio.create_task(run(), name="mock-bot-api-script")
+        self._scripts.append(task)
+        return task
+
+    def set_membership(self, channel: Any, statuses: Dict[int, str], default: Optional[str] = None) -> None:
+        self.membership[_chat_key(channel)] = statuses
+        if default is not None:
+            self.channel_status[_chat_key(channel)] = default
+
+    # aiohttp plumbing
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        for task in self._scripts:
+            task.cancel()
+        await self._stop_webhook()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params: Dict[str, Any] = dict(request.query)
+        if request.body_exists:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        self.calls[method] += 1
+
+        delay = self.method_latency.get(method, self.latency)
+        if delay and method != "getupdates":
+            await asyncio.sleep(delay)
+
+        if method not in CONTROL_METHODS:
+            flooded = self._flood_wait(method, params)
+            if flooded:
+                self.flood_waits[method] += 1
+                return _error(429, f"Too Many Requests: retry after {flooded}", retry_after=flooded)
+
+        handler = getattr(self, f"_method_{method}", None)
+        response = await handler(params) if handler is not None else _ok(True)
+        if self.on_call is not None and response.status == 200:
+            self.on_call(method, params)
+        return response
+
+    def _flood_wait(self, method: str, params: Dict[str, Any]) -> int:
+        """retry_after for a 429, 0 to let the call through"""
+        if self.error_rate and random.random() < self.error_rate:
+            return self.retry_after
+        if method not in MESSAGE_METHODS:
+            return 0
+        if self._send_bucket is not None and not self._send_bucket.try_acquire():
+            return self.retry_after
+        if self.chat_rate:
+            chat = _chat_key(params.get("chat_id"))
+            bucket = self._chat_buckets.get(chat)
+            if bucket is None:
+                bucket = self._chat_buckets[chat] = TokenBucket(self.chat_rate, self.chat_burst)
+            if not bucket.try_acquire():
+                return max(self.retry_after, math.ceil(1 / self.chat_rate))
+        return 0
+
+    # Methods
+
+    async def _method_getme(self, params: Dict[str, Any]) -> web.Response:
+        return _ok(BOT_USER)
+
+    async def _method_getupdates(self, params: Dict[str, Any]) -> web.Response:
+        if self._webhook is not None:
+            return _error(409, "Conflict: can't use getUpdates method while webhook is active")
+        self.ready.set()
+
+        # Half the round trip before the long poll, half after, like fake_session
+        delay = self.method_latency.get("getupdates", self.latency)
+        if delay:
+            await asyncio.sleep(delay / 2)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+
+        # Delivered updates count as confirmed, offset is not tracked
+        batch = []
+        if self.updates.empty() and timeout:
+            try:
+                batch.append(await asyncio.wait_for(self.updates.get(), timeout))
+            except asyncio.TimeoutError:
+                pass
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+
+        if delay:
+            await asyncio.sleep(delay / 2)
+        return _ok(batch)
+
+    async def _method_setwebhook(self, params: Dict[str, Any]) -> web.Response:
+        await self._stop_webhook()
+        self._webhook = {
+            "url": params["url"],
+            "secret_token": params.get("secret_token"),
+            "max_connections": int(params.get("max_connections") or 40),
+        }
+        self._client = aiohttp.ClientSession()
+        self._deliverers = [
+            asyncio.create_task(self._deliver(), name=f"mock-webhook-{index}")
+            for index in range(self._webhook["max_connections"])
+        ]
+        self.ready.set()
+        return _ok(True)
+
+    async def _method_deletewebhook(self, params: Dict[str, Any]) -> web.Response:
+        await self._stop_webhook()
+        return _ok(True)
+
+    async def _method_getwebhookinfo(self, params: Dict[str, Any]) -> web.Response:
+        return _ok({
+            "url": self._webhook["url"] if self._webhook else "",
+            "has_custom_certificate": False,
+            "pending_update_count": self.updates.qsize(),
+        })
+
+    async def _method_getchatmember(self, params: Dict[str, Any]) -> web.Response:
+        chat, user_id = _chat_key(params.get("chat_id")), int(params["user_id"])
+        status = self.membership.get(chat, {}).get(user_id) or self.channel_status.get(chat, self.member_status)
+        member: Dict[str, Any] = {"status": status, "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        if status == "restricted":
+            member.update(is_member=False, until_date=0)
+        return _ok(member)
+
+    async def _method_sendmessage(self, params: Dict[str, Any]) -> web.Response:
+        chat_id = int(params["chat_id"]) if str(params.get("chat_id", "")).lstrip("-").isdigit() else 0
+        return _ok({
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        })
+
+    _method_editmessagetext = _method_sendmessage
+
+    # Webhook delivery
+
+    async def _deliver(self) -> None:
+        """One Telegram connection: the next update goes out when the previous one was answered"""
+        headers = {}
+        if self._webhook["secret_token"]:
+            headers[SECRET_HEADER] = self._webhook["secret_token"]
+        while True:
+            update = await self.updates.get()
+            try:
+                async with self._client.post(self._webhook["url"], json=update, headers=headers) as response:
+                    delivered = response.status < 300
+            except aiohttp.ClientError:
+                delivered = False
+            if not delivered:
+                self.redelivered += 1
+                await asyncio.sleep(0.1)
+                self.updates.put_nowait(update)
+
+    async def _stop_webhook(self) -> None:
+        for task in self._deliverers:
+            task.cancel()
+        await asyncio.gather(*self._deliverers, return_exceptions=True)
+        self._deliverers = []
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._webhook = None
+
+
+def _ok(result: Any) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(status: int, description: str, **parameters: Any) -> web.Response:
+    body: Dict[str, Any] = {"ok": False, "error_code": status, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=status)
+
+
+async def scripted_messages(rate: float, users: int, texts: List[str], total: int = 0):
+    """Text messages from `users` round-robin at `rate` per second, endless if total is 0"""
+    factory = UpdateFactory()
+    started = time.perf_counter()
+    for index in itertools.count():
+        if total and index >= total:
+            return
+        delay = started + index / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield factory.message(1_000_000 + index % users, texts[index % len(texts)])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--rate", type=float, default=0.0, help="Scripted messages per second, 0 for none")
+    parser.add_argument("--updates", type=int, default=0, help="Stop the script after this many, 0 = endless")
+    parser.add_argument("--users", type=int, default=10_000, help="Distinct senders in the script")
+    parser.add_argument("--text", action="append", default=None, help="Message texts, repeatable")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every answer")
+    parser.add_argument("--method-latency", type=json.loads, default=None, help='JSON, e.g. {"getChatMember": 0.2}')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--send-rate", type=float, default=30.0, help="Message methods per second before 429, 0 = off")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="Messages per second to one chat, 0 = off")
+    parser.add_argument("--member-status", default="member", help="getChatMember status by default")
+    parser.add_argument("--channel", action="append", default=[], metavar="CHAT=STATUS",
+                        help="Default status for one channel, repeatable")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    api = MockBotAPI(
+        latency=args.latency,
+        method_latency=args.method_latency,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        send_rate=args.send_rate,
+        chat_rate=args.chat_rate,
+        member_status=args.member_status,
+    )
+    for item in args.channel:
+        chat, _, status = item.partition("=")
+        api.set_membership(chat, {}, default=status or "member")
+
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    logger.info("Mock Bot API on http://%s:%s", args.host, args.port)
+    if args.rate:
+        api.feed(scripted_messages(args.rate, args.users, args.text or ["hello"], args.updates))
+
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logger.info(
+                "calls %s, 429s %s, queued %s",
+                dict(api.calls), dict(api.flood_waits), api.updates.qsize(),
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,278 @@
+"""
+Memory and connections of N bots: one process per bot vs one multi-bot process
+
+    python -m benchmarks.multi_bot --counts 1,10,50
+    python -m benchmarks.multi_bot --counts 10 --layouts shared --updates-per-bot 100
+
+Every layout runs `python -m bot.main` against a fresh benchmarks.mock_bot_api
+(long polls of the previous layout's processes would take its updates) and
+the POSTGRES_* server (database --postgres-db, its tables are recreated):
+"separate" starts one process per token, "shared" one process with
+BOT_TOKEN + BOT_TOKENS. Once every token is polling, --updates-per-bot
+/start messages per bot are pushed and answered, then after --settle
+seconds the bot processes are measured:
+
+  rss_mb      resident memory of all bot processes together
+  db_conns    server connections to the database (pg_stat_activity)
+  api_conns   TCP connections open to the mock Bot API
+  startup_s   until the last token made its first getUpdates
+
+Separate processes stop being spawned when less than --min-free-mb of
+memory is left; the row then says how many were started.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import psutil
+from aiohttp import web
+
+from benchmarks.fake_session import UpdateFactory
+from benchmarks.mock_bot_api import MockBotAPI
+
+BOT_ID_BASE = 7_000_000_000
+USER_ID_BASE = 1_000_000
+
+
+def tokens_for(count: int) -> List[str]:
+    return [f"{BOT_ID_BASE + index}:multibot-benchmark" for index in range(count)]
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Settings of this process (schema setup); bot processes inherit them"""
+    os.environ.update(
+        BOT_TOKEN=tokens_for(1)[0],
+        ADMIN_USER_ID=os.environ.get("ADMIN_USER_ID", "1"),
+        USE_SQLITE="False",
+        POSTGRES_DB=args.postgres_db,
+        DEBUG="False",
+        # Would collide on one port with several processes
+        METRICS_ENABLED="False",
+        PROFILING_ENABLED="False",
+        RUN_MODE="polling",
+    )
+
+
+async def prepare_database(name: str) -> None:
+    """Create the database if missing and a fresh schema, before any bot starts"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from bot.config.settings import settings
+    from bot.database.models import Base
+    from bot.database.session import close_db, get_engine
+
+    maintenance = create_async_engine(
+        settings.DATABASE_URL.rsplit("/", 1)[0] + "/postgres", isolation_level="AUTOCOMMIT"
+    )
+    async with maintenance.connect() as conn:
+        exists = await conn.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name})
+        if not exists:
+            await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    await maintenance.dispose()
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await close_db()
+
+
+async def database_connections(name: str) -> int:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from bot.config.settings import settings
+
+    engine = create_async_engine(settings.DATABASE_URL.rsplit("/", 1)[0] + "/postgres")
+    try:
+        async with engine.connect() as conn:
+            return await conn.scalar(
+                text("SELECT count(*) FROM pg_stat_activity WHERE datname = :name AND backend_type = 'client backend'"),
+                {"name": name},
+            )
+    finally:
+        await engine.dispose()
+
+
+def api_connections(pids: List[int], port: int) -> int:
+    count = 0
+    for pid in pids:
+        try:
+            connections = psutil.Process(pid).net_connections(kind="tcp")
+        except psutil.NoSuchProcess:
+            continue
+        count += sum(1 for c in connections if c.raddr and c.raddr.port == port and c.status == psutil.CONN_ESTABLISHED)
+    return count
+
+
+def resident_mb(pids: List[int]) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            total += psutil.Process(pid).memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return round(total / 2 ** 20, 1)
+
+
+async def stop_processes(processes: List[asyncio.subprocess.Process], timeout: float = 30.0) -> None:
+    for process in processes:
+        if process.returncode is None:
+            process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+class PollTracker:
+    """aiohttp middleware remembering which tokens have called getUpdates"""
+
+    def __init__(self):
+        self.polling: Set[str] = set()
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.match_info.get("method", "").lower() == "getupdates":
+            self.polling.add(request.match_info["token"])
+        return await handler(request)
+
+    async def wait_for(self, tokens: List[str], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.polling.issuperset(tokens):
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.2)
+        return True
+
+
+async def run_layout(
+    args: argparse.Namespace,
+    port: int,
+    factory: UpdateFactory,
+    layout: str,
+    count: int,
+    workdir: str,
+) -> Tuple[Dict[str, Any], web.AppRunner]:
+    """Measure one layout, returns the row and the mock's runner (cleaned up at the end)"""
+    api = MockBotAPI()
+    tracker = PollTracker()
+    app = api.create_app()
+    app.middlewares.append(tracker.middleware)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    tokens = tokens_for(count)
+    environment = dict(os.environ, TELEGRAM_API_URL=f"http://127.0.0.1:{port}")
+    if layout == "shared":
+        groups = [tokens]
+    else:
+        groups = [[token] for token in tokens]
+
+    processes: List[asyncio.subprocess.Process] = []
+    started = time.monotonic()
+    log_path = os.path.join(workdir, f"{layout}-{count}.log")
+    with open(log_path, "wb") as log:
+        try:
+            for group in groups:
+                if psutil.virtual_memory().available < args.min_free_mb * 2 ** 20:
+                    break
+                processes.append(await asyncio.create_subprocess_exec(
+                    sys.executable, "-m", "bot.main",
+                    env=dict(environment, BOT_TOKEN=group[0], BOT_TOKENS=",".join(group[1:])),
+                    stdout=log, stderr=log,
+                ))
+                if layout == "separate":
+                    # One CPU is shared by every starting interpreter, wait for this one
+                    await tracker.wait_for(group, args.start_timeout)
+
+            hosted = [token for group in groups[:len(processes)] for token in group]
+            up = await tracker.wait_for(hosted, args.start_timeout)
+            startup = time.monotonic() - started
+
+            replies_before = api.calls["sendmessage"]
+            expected = len(hosted) * args.updates_per_bot if up else 0
+            for index in range(expected):
+                api.push_update(factory.message(USER_ID_BASE + index, "/start"))
+            deadline = time.monotonic() + args.start_timeout
+            while api.calls["sendmessage"] - replies_before < expected and time.monotonic() < deadline:
+                await asyncio.sleep(0.2)
+            replies = api.calls["sendmessage"] - replies_before
+
+            await asyncio.sleep(args.settle)
+            pids = [process.pid for process in processes]
+            row = {
+                "bots": count,
+                "layout": layout,
+                "processes": len(processes),
+                "bots_up": len(tracker.polling & set(hosted)),
+                "rss_mb": resident_mb(pids),
+                "db_conns": await database_connections(args.postgres_db),
+                "api_conns": api_connections(pids, port),
+                "startup_s": round(startup, 1),
+                "replies": f"{replies}/{expected}",
+            }
+        finally:
+            await stop_processes(processes)
+
+    with open(log_path, "rb") as log:
+        content = log.read()
+    row["db_errors"] = content.count(b"TooManyConnectionsError") + content.count(b"too many clients")
+    row["rss_per_bot_mb"] = round(row["rss_mb"] / max(1, row["bots_up"]), 1)
+    return row, runner
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="1,10,50", help="Numbers of bots")
+    parser.add_argument("--layouts", default="separate,shared", help="'separate', 'shared' or both")
+    parser.add_argument("--updates-per-bot", type=int, default=20)
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds after the last reply before measuring")
+    parser.add_argument("--start-timeout", type=float, default=120.0)
+    parser.add_argument("--min-free-mb", type=int, default=600, help="Stop spawning processes below this free memory")
+    parser.add_argument("--postgres-db", default="telegram_bot_multibot")
+    parser.add_argument("--port", type=int, default=8092, help="First mock port, every layout takes the next one")
+    parser.add_argument("--output", default=None, help="Write the rows as JSON")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    await prepare_database(args.postgres_db)
+
+    workdir = tempfile.mkdtemp(prefix="multi_bot_")
+    factory = UpdateFactory()
+    runs = [
+        (int(count), layout)
+        for count in args.counts.split(",")
+        for layout in args.layouts.split(",")
+    ]
+    rows = []
+    runners: List[web.AppRunner] = []
+    try:
+        for index, (count, layout) in enumerate(runs):
+            row, runner = await run_layout(args, args.port + index, factory, layout, count, workdir)
+            runners.append(runner)
+            print(row, flush=True)
+            rows.append(row)
+    finally:
+        await asyncio.gather(*(runner.cleanup() for runner in runners))
+
+    columns = ("bots", "layout", "processes", "rss_mb", "rss_per_bot_mb", "db_conns", "api_conns", "startup_s", "replies", "db_errors")
+    print("\n" + " ".join(f"{name:>14}" for name in columns))
+    for row in rows:
+        print(" ".join(f"{row[name]!s:>14}" for name in columns))
+    print(f"logs: {workdir}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(rows, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
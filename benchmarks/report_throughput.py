@@ -0,0 +1,110 @@
+"""
+Report engine throughput and memory on a synthetic dataset
+
+    python -m benchmarks.report_throughput --users 50000 --interactions 2000000
+    python -m benchmarks.report_throughput --database-url postgresql+asyncpg://... --interactions 10000000
+
+Seeds a scratch database (a temporary SQLite file by default; a given
+--database-url gets its tables dropped and recreated), then runs the report
+engine and prints interactions/sec and peak RSS. Peak RSS should stay flat
+as --interactions grows.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.database.models import Base, User, UserInteraction
+from bot.services.report_service import ReportEngine
+
+SEED_BATCH = 50_000
+TYPES = np.array(["message", "command", "callback"])
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(engine, users: int, interactions: int, days: int) -> None:
+    rng = np.random.default_rng(42)
+    now = np.datetime64("now", "s")
+    signed_up = now - rng.integers(0, days * 86400, size=users).astype("timedelta64[s]")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for start in range(0, users, SEED_BATCH):
+            await conn.execute(insert(User), [
+                {"telegram_id": start + i + 1, "created_at": signed_up[start + i].astype(object)}
+                for i in range(min(SEED_BATCH, users - start))
+            ])
+
+    for start in range(0, interactions, SEED_BATCH):
+        size = min(SEED_BATCH, interactions - start)
+        user_index = rng.zipf(1.3, size=size) % users
+        # Activity decays after sign-up
+        age = rng.exponential(14 * 86400, size=size).astype("timedelta64[s]")
+        stamps = np.minimum(signed_up[user_index] + age, now)
+        types = TYPES[rng.integers(0, len(TYPES), size=size)]
+        async with engine.begin() as conn:
+            await conn.execute(insert(UserInteraction), [
+                {
+                    "user_id": int(user_index[i]) + 1,
+                    "interaction_type": str(types[i]),
+                    "content": "/start" if types[i] == "command" and i % 4 == 0 else "hello",
+                    "created_at": stamps[i].astype(object),
+                }
+                for i in range(size)
+            ])
+        print(f"seeded {start + size}/{interactions}", end="\r", flush=True)
+    print()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--interactions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--period", default="week", choices=["day", "week", "month"])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse data from a previous run")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "report_benchmark.db")
+    engine = create_async_engine(args.database_url or f"sqlite+aiosqlite:///{path}")
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(engine, args.users, args.interactions, args.days)
+        print(f"seed: {time.perf_counter() - started:.1f}s")
+
+    rss_before = peak_rss_mb()
+    report_engine = ReportEngine(
+        async_sessionmaker(engine, expire_on_commit=False),
+        period=args.period,
+        chunk_size=args.chunk_size,
+    )
+    report = await report_engine.run()
+    await engine.dispose()
+
+    print({
+        "users": report.users,
+        "interactions": report.interactions,
+        "seconds": round(report.elapsed, 2),
+        "interactions_per_sec": round(report.interactions / report.elapsed),
+        "peak_rss_mb_before": round(rss_before, 1),
+        "peak_rss_mb_after": round(peak_rss_mb(), 1),
+    })
+    print(report.funnel.to_string(index=False))
+    print(report.retention.iloc[-4:, :6].round(3).to_string())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Polling vs webhook throughput against the in-memory Bot API
+
+    python -m benchmarks.webhook_vs_polling --updates 5000 --rtt 0.15
+
+`--rtt` is the simulated round-trip to Telegram: polling pays it per
+getUpdates batch, webhook deliveries pay half of it per request
+but Telegram keeps up to WEBHOOK_MAX_CONNECTIONS of them in flight.
+`--rate` replays a sustained arrival rate (updates/sec), 0 sends one burst
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, Router, F
+from aiogram.types import Message
+
+from benchmarks.fake_session import FakeTelegramSession, UpdateFactory
+from bot.runtime.webhook import WebhookServer
+
+
+class Recorder:
+    """Collects end-to-end latency per update"""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.sent_at: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.done = asyncio.Event()
+
+    def handled(self, user_id: int) -> None:
+        self.latencies.append(time.perf_counter() - self.sent_at[user_id])
+        if len(self.latencies) >= self.expected:
+            self.done.set()
+
+
+async def arrivals(updates: int, rate: float):
+    """Yield 1..updates, paced to `rate` per second (burst if 0)"""
+    started = time.perf_counter()
+    for user_id in range(1, updates + 1):
+        if rate:
+            delay = started + user_id / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield user_id
+
+
+def build_dispatcher(recorder: Recorder, handler_latency: float) -> Dispatcher:
+    router = Router()
+
+    @router.message(F.text)
+    async def echo(message: Message) -> None:
+        if handler_latency:
+            await asyncio.sleep(handler_latency)
+        await message.answer(message.text)
+        recorder.handled(message.from_user.id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def run_polling(updates: int, rate: float, rtt: float, handler_latency: float) -> Dict[str, float]:
+    recorder = Recorder(updates)
+    session = FakeTelegramSession(latency=rtt, poll_latency=rtt)
+    bot = Bot("42:benchmark", session=session)
+    dp = build_dispatcher(recorder, handler_latency)
+    factory = UpdateFactory()
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    started = time.perf_counter()
+    async for user_id in arrivals(updates, rate):
+        recorder.sent_at[user_id] = time.perf_counter()
+        session.push_update(factory.message(user_id, "hello"))
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - started
+
+    await dp.stop_polling()
+    await polling
+    return summarize("polling", recorder, elapsed)
+
+
+async def run_webhook(updates: int, rate: float, rtt: float, handler_latency: float, max_connections: int,
+                      max_in_flight: int, port: int) -> Dict[str, float]:
+    recorder = Recorder(updates)
+    bot = Bot("42:benchmark", session=FakeTelegramSession(latency=rtt))
+    dp = build_dispatcher(recorder, handler_latency)
+    factory = UpdateFactory()
+
+    server = WebhookServer(dp, [bot], path="/webhook", max_in_flight=max_in_flight, queue_size=updates)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    url = f"http://127.0.0.1:{port}/webhook"
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        async for user_id in arrivals(updates, rate):
+            recorder.sent_at[user_id] = time.perf_counter()
+            queue.put_nowait(user_id)
+        for _ in range(max_connections):
+            queue.put_nowait(None)
+
+    async def deliver(client: aiohttp.ClientSession) -> None:
+        # One Telegram connection: sends the next update after the previous one is acknowledged
+        while (user_id := await queue.get()) is not None:
+            if rtt:
+                await asyncio.sleep(rtt / 2)
+            async with client.post(url, json=factory.message(user_id, "hello")) as response:
+                response.raise_for_status()
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        await asyncio.gather(produce(), *(deliver(client) for _ in range(max_connections)))
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - started
+
+    await runner.cleanup()
+    return summarize("webhook", recorder, elapsed)
+
+
+def summarize(mode: str, recorder: Recorder, elapsed: float) -> Dict[str, float]:
+    latencies = sorted(recorder.latencies)
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "updates_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=0, help="Arrival rate, updates/sec (0 = burst)")
+    parser.add_argument("--rtt", type=float, default=0.15, help="Simulated round-trip to Telegram (seconds)")
+    parser.add_argument("--handler-latency", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int, default=40)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    for result in (
+        await run_polling(args.updates, args.rate, args.rtt, args.handler_latency),
+        await run_webhook(args.updates, args.rate, args.rtt, args.handler_latency, args.max_connections,
+                          args.max_in_flight, args.port),
+    ):
+        print(result)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
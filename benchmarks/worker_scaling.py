@@ -0,0 +1,92 @@
+"""
+Throughput of the multi-process worker pool on a CPU-bound handler
+
+    python -m benchmarks.worker_scaling --updates 4000 --work-ms 2 --processes 1 2 4
+
+Every update burns `--work-ms` of CPU in the handler, so a single
+event loop tops out at ~1000/work_ms updates/sec
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+
+from aiogram import Bot, Dispatcher, Router, F
+from aiogram.types import Message
+
+from benchmarks.fake_session import FakeTelegramSession, UpdateFactory
+from bot.runtime.workers import WorkerPool
+
+WORK_MS_ENV = "BENCH_WORK_MS"
+
+
+def create_bench_bot() -> Bot:
+    return Bot("42:benchmark", session=FakeTelegramSession())
+
+
+def create_cpu_dispatcher() -> Dispatcher:
+    work = float(os.environ.get(WORK_MS_ENV, "2")) / 1000
+    router = Router()
+
+    @router.message(F.text)
+    async def burn(message: Message) -> None:
+        deadline = time.perf_counter() + work
+        digest = message.text.encode()
+        while time.perf_counter() < deadline:
+            digest = hashlib.sha256(digest).digest()
+        await message.answer("ok")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def run(processes: int, updates: int, chats: int, startup_grace: float) -> float:
+    pool = WorkerPool(
+        processes=processes,
+        queue_size=1000,
+        bot_factory="benchmarks.worker_scaling:create_bench_bot",
+        dispatcher_factory="benchmarks.worker_scaling:create_cpu_dispatcher",
+    )
+    await pool.start()
+    # Let workers finish importing before the clock starts
+    await asyncio.sleep(startup_grace)
+
+    factory = UpdateFactory()
+    started = time.perf_counter()
+    for offset in range(0, updates, 100):
+        batch = [
+            factory.message(user_id % chats + 1, "hello")
+            for user_id in range(offset, min(offset + 100, updates))
+        ]
+        await pool.dispatch(batch)
+    await pool.stop(timeout=600)
+    return updates / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--work-ms", type=float, default=2.0)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--startup-grace", type=float, default=3.0)
+    args = parser.parse_args()
+
+    # Inherited by spawned workers
+    os.environ[WORK_MS_ENV] = str(args.work_ms)
+
+    baseline = None
+    for processes in args.processes:
+        rate = await run(processes, args.updates, args.chats, args.startup_grace)
+        baseline = baseline or rate / processes
+        print({
+            "processes": processes,
+            "updates_per_sec": round(rate, 1),
+            "scaling_efficiency": round(rate / (baseline * processes), 2),
+        })
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
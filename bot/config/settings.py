@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional, cast
 import os
 
 
@@ -10,9 +11,18 @@ class Settings(BaseSettings):
     # Bot Configuration
     BOT_TOKEN: str = Field(..., description="Telegram Bot Token")
     ADMIN_USER_ID: int = Field(..., description="Main Admin User ID")
+    TELEGRAM_API_URL: Optional[str] = Field(default=None, description="Bot API base URL, e.g. a local telegram-bot-api or benchmarks.mock_bot_api")
+    BOT_TOKENS: str = Field(default="", description="More bots hosted by this process, comma-separated tokens")
+
+    @property
+    def bot_tokens(self) -> List[str]:
+        """BOT_TOKEN first, then BOT_TOKENS without duplicates"""
+        tokens = [self.BOT_TOKEN] + [token.strip() for token in self.BOT_TOKENS.split(",")]
+        return list(dict.fromkeys(token for token in tokens if token))
 
     # Database
     USE_SQLITE: bool = Field(default=False, description="Use SQLite instead of PostgreSQL")
+    SQLITE_PATH: str = Field(default="./bot.db", description="SQLite database file")
     POSTGRES_USER: str = Field(default="botuser")
     POSTGRES_PASSWORD: str = Field(default="botpassword")
     POSTGRES_DB: str = Field(default="telegram_bot")
@@ -22,16 +32,144 @@ class Settings(BaseSettings):
     @property
     def DATABASE_URL(self) -> str:
         if self.USE_SQLITE:
-            return "sqlite+aiosqlite:///./bot.db"
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
         return (
             f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    # Database engine (profiles in bot/database/profiles.py)
+    DB_PROFILE: str = Field(default="default", description="'default', 'throughput', 'safe', 'pgbouncer' or 'legacy'")
+    DB_POOL_SIZE: Optional[int] = Field(default=None, description="Overrides the profile's pool size")
+    DB_MAX_OVERFLOW: Optional[int] = Field(default=None, description="Overrides the profile's extra connections above the pool size")
+    DB_POOL_RECYCLE: Optional[int] = Field(default=None, description="Overrides the profile's connection lifetime (seconds, -1 = forever)")
+    DB_POOL_PRE_PING: Optional[bool] = Field(default=None, description="Overrides the profile's ping on checkout")
+    DB_STATEMENT_CACHE_SIZE: Optional[int] = Field(default=None, description="Overrides the profile's prepared statement cache (PostgreSQL)")
+
+    # Read replica (PostgreSQL, optional)
+    REPLICA_HOST: Optional[str] = Field(default=None, description="Streaming replica for queries marked replica=True, same credentials as the primary")
+    REPLICA_PORT: int = Field(default=5432)
+    REPLICA_MAX_LAG: float = Field(default=10.0, description="Reads go to the primary while the replica is further behind (seconds)")
+    REPLICA_CHECK_INTERVAL: float = Field(default=5.0, description="Seconds between replica health checks")
+    REPLICA_READ_YOUR_WRITES: float = Field(default=15.0, description="A user's reads stay on the primary this long after their commit, keep above max lag + check interval")
+
+    @property
+    def REPLICA_DATABASE_URL(self) -> Optional[str]:
+        if self.USE_SQLITE or not self.REPLICA_HOST:
+            return None
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"@{self.REPLICA_HOST}:{self.REPLICA_PORT}/{self.POSTGRES_DB}"
+        )
+
     # Redis
     REDIS_HOST: str = Field(default="localhost")
     REDIS_PORT: int = Field(default=6379)
     REDIS_DB: int = Field(default=0)
+    REDIS_ENABLED: bool = Field(default=False, description="Use Redis as shared cache tier")
+    REDIS_SOCKET_TIMEOUT: float = Field(default=0.5, description="Redis socket timeout (seconds)")
+
+    # Subscription membership cache
+    MEMBERSHIP_CACHE_SIZE: int = Field(default=100_000, description="Max (user, channel) pairs kept in memory")
+    MEMBERSHIP_TTL_SUBSCRIBED: int = Field(default=600, description="Cache TTL for 'subscribed' (seconds)")
+    MEMBERSHIP_TTL_NOT_SUBSCRIBED: int = Field(default=30, description="Cache TTL for 'not subscribed' (seconds)")
+
+    # Membership tracking (chat_member updates, the bot must be a channel admin)
+    MEMBERSHIP_TRACKING: bool = Field(default=True, description="Keep user_subscriptions current from chat_member updates and answer from it")
+    MEMBERSHIP_BATCH_SIZE: int = Field(default=500, description="Upsert after this many membership changes")
+    MEMBERSHIP_FLUSH_INTERVAL: float = Field(default=1.0, description="Upsert at least every N seconds")
+    MEMBERSHIP_SWEEP_RATE: float = Field(default=1.0, description="Reconciliation getChatMember calls per second, 0 = off")
+    MEMBERSHIP_SWEEP_MIN_AGE: int = Field(default=86400, description="Re-check stored statuses older than this (seconds)")
+
+    # Subscription checks (getChatMember)
+    SUBSCRIPTION_CHECK_CONCURRENCY: int = Field(default=10, description="Max getChatMember calls in flight")
+    GET_CHAT_MEMBER_RATE: float = Field(default=20.0, description="getChatMember calls per second")
+    GET_CHAT_MEMBER_BURST: int = Field(default=30, description="getChatMember burst size")
+    FLOOD_WAIT_MAX_RETRY: int = Field(default=5, description="Interactive calls retry once if retry_after <= this (seconds)")
+    SUBSCRIPTION_FAIL_OPEN: bool = Field(default=False, description="Let users through on flood/network errors")
+
+    # "Check subscription" button
+    SUBSCRIPTION_RECHECK_COOLDOWN: float = Field(default=3.0, description="Min seconds between re-checks of one user")
+    SUBSCRIPTION_PROMPT_TTL: int = Field(default=900, description="Failed channels are remembered this long for the button (seconds)")
+
+    # Anti-flood throttling (per user and per (user, command), before any DB work)
+    THROTTLE_ENABLED: bool = Field(default=True, description="Drop updates from users who exceed the limits")
+    THROTTLE_USER_RATE: float = Field(default=1.0, description="Messages and button presses per second per user")
+    THROTTLE_USER_BURST: int = Field(default=5, description="Per-user burst size")
+    THROTTLE_COMMAND_RATE: float = Field(default=0.2, description="Same command per second per user")
+    THROTTLE_COMMAND_BURST: int = Field(default=3, description="Per-command burst size")
+    THROTTLE_WARNING_INTERVAL: int = Field(default=10, description="At most one 'slow down' reply per user per N seconds")
+    THROTTLE_MAX_USERS: int = Field(default=100_000, description="Max limiter buckets kept in memory")
+    THROTTLE_SHARED: bool = Field(default=False, description="Keep limiter state in Redis (REDIS_ENABLED) for several processes")
+
+    # Analytics writer
+    ANALYTICS_BATCH_SIZE: int = Field(default=500, description="Flush after this many events")
+    ANALYTICS_FLUSH_INTERVAL: float = Field(default=1.0, description="Flush at least every N seconds")
+    ANALYTICS_QUEUE_SIZE: int = Field(default=10_000, description="Max events waiting to be written")
+    ANALYTICS_OVERFLOW_POLICY: str = Field(default="drop", description="'drop' or 'block' when queue is full")
+
+    # Known-user filter (/start skips the DB for returning users)
+    KNOWN_USERS_CAPACITY: int = Field(default=5_000_000, description="Max users kept in memory (~12 bytes each)")
+    KNOWN_USERS_WARMUP: bool = Field(default=True, description="Load registered users on startup")
+
+    # Runtime
+    RUN_MODE: str = Field(default="polling", description="'polling', 'webhook' or 'workers'")
+
+    # Update execution (polling and each worker process; webhook uses WEBHOOK_MAX_IN_FLIGHT)
+    UPDATE_CONCURRENCY: int = Field(default=64, description="Updates processed at once, one at a time per chat")
+    UPDATE_QUEUE_SIZE: int = Field(default=1000, description="Accepted but unfinished updates, polling waits above it")
+
+    # Worker processes (RUN_MODE=workers)
+    WORKER_PROCESSES: int = Field(default=0, description="Worker processes, 0 = CPU count")
+    WORKER_QUEUE_SIZE: int = Field(default=100, description="Update batches buffered per worker")
+    WORKER_RESTART_DELAY: float = Field(default=1.0, description="Crash check / restart delay (seconds)")
+    WORKER_MAX_RESTARTS: int = Field(default=10, description="Give up after this many crashes of one worker")
+
+    # Webhook
+    WEBHOOK_URL: Optional[str] = Field(default=None, description="Public base URL, e.g. https://bot.example.com")
+    WEBHOOK_PATH: str = Field(default="/webhook")
+    WEBHOOK_SECRET: Optional[str] = Field(default=None, description="X-Telegram-Bot-Api-Secret-Token value")
+    WEBHOOK_HOST: str = Field(default="0.0.0.0")
+    WEBHOOK_PORT: int = Field(default=8080)
+    WEBHOOK_MAX_CONNECTIONS: int = Field(default=40, description="Telegram's max simultaneous webhook connections (1-100)")
+    WEBHOOK_MAX_IN_FLIGHT: int = Field(default=64, description="Updates processed concurrently")
+    WEBHOOK_QUEUE_SIZE: int = Field(default=1000, description="Accepted updates waiting for a worker")
+
+    # Prometheus metrics
+    METRICS_ENABLED: bool = Field(default=False, description="Expose /metrics and record latency histograms")
+    METRICS_HOST: str = Field(default="127.0.0.1", description="/metrics has no auth, 0.0.0.0 only on a private network")
+    METRICS_PORT: int = Field(default=8081, description="Workers listen on METRICS_PORT + 1 + worker index")
+
+    # Update profiling (opt-in)
+    PROFILING_ENABLED: bool = Field(default=False, description="Trace updates: middleware, service, query and Bot API spans")
+    PROFILING_SAMPLE_RATE: float = Field(default=0.01, description="Share of updates whose trace is written")
+    PROFILING_SLOW_THRESHOLD: float = Field(default=1.0, description="Traces of updates slower than this (seconds) are always written")
+    PROFILING_TRACE_FILE: str = Field(default="traces/updates.json", description="Chrome trace format, open in Perfetto or chrome://tracing")
+    PROFILING_TRACE_MAX_BYTES: int = Field(default=10 * 1024 * 1024, description="Trace file size before rotation")
+    PROFILING_TRACE_BACKUPS: int = Field(default=5, description="Rotated trace files kept")
+    PROFILING_STACK_SAMPLER: bool = Field(default=False, description="Sample the event loop stack for CPU hotspots")
+    PROFILING_STACK_INTERVAL: float = Field(default=0.005, description="Seconds between stack samples")
+    PROFILING_STACK_FILE: str = Field(default="traces/cpu.folded", description="Folded stacks for flamegraph.pl / speedscope")
+
+    # Outbound request scheduler
+    OUTBOUND_GLOBAL_RATE: float = Field(default=30.0, description="Messages per second across all chats of one bot")
+    OUTBOUND_GLOBAL_BURST: int = Field(default=30, description="Global message burst size")
+    OUTBOUND_PRIVATE_CHAT_RATE: float = Field(default=1.0, description="Messages per second to one private chat")
+    OUTBOUND_GROUP_CHAT_RATE: float = Field(default=20 / 60, description="Messages per second to one group or channel")
+    OUTBOUND_CHAT_BURST: int = Field(default=3, description="Per-chat burst size")
+    OUTBOUND_BULK_MAX_RETRIES: int = Field(default=5, description="Flood-wait retries for bulk sends")
+
+    # Interaction retention
+    INTERACTIONS_RETENTION_MONTHS: int = Field(default=6, description="Months of user_interactions kept in the DB")
+    INTERACTIONS_PARTITIONS_AHEAD: int = Field(default=3, description="Monthly partitions created in advance (PostgreSQL)")
+    INTERACTIONS_ARCHIVE_DIR: Optional[str] = Field(default="archive", description="Parquet archive directory, empty to drop without archiving")
+    PARTITION_JOB_INTERVAL: int = Field(default=6 * 3600, description="Seconds between partition maintenance runs")
+
+    # Broadcast
+    BROADCAST_RATE: float = Field(default=25.0, description="Broadcast messages per second and bot (Telegram allows ~30)")
+    BROADCAST_CONCURRENCY: int = Field(default=10, description="Broadcast sends in flight at once")
+    BROADCAST_PAGE_SIZE: int = Field(default=200, description="Recipients per page and checkpoint")
+    BROADCAST_LEASE_SECONDS: int = Field(default=120, description="How long a running broadcast stays locked without a checkpoint")
 
     # AI Integration
     OPENAI_API_KEY: Optional[str] = Field(default=None, description="OpenAI API Key (optional)")
@@ -48,16 +186,26 @@ class Settings(BaseSettings):
     )
 
 
-# Try to load settings
-try:
-    settings = Settings()
-    print(f"✅ Settings loaded successfully")
-    print(f"   Database: {'SQLite' if settings.USE_SQLITE else 'PostgreSQL'}")
-except Exception as e:
-    print(f"\n❌ Error loading settings from .env file!")
-    print(f"   Error: {e}\n")
-    print("💡 Please create .env file in the project root with:")
-    print("   BOT_TOKEN=your_bot_token_from_botfather")
-    print("   ADMIN_USER_ID=your_telegram_id")
-    print("   USE_SQLITE=True\n")
-    raise
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings from the environment and .env, read once on first use"""
+    try:
+        return Settings()
+    except Exception as e:
+        print(f"\n❌ Error loading settings from .env file!")
+        print(f"   Error: {e}\n")
+        print("💡 Please create .env file in the project root with:")
+        print("   BOT_TOKEN=your_bot_token_from_botfather")
+        print("   ADMIN_USER_ID=your_telegram_id")
+        print("   USE_SQLITE=True\n")
+        raise
+
+
+class LazySettings:
+    """Stands in for Settings until an attribute is read, importing a module does not read the environment"""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+settings = cast(Settings, LazySettings())
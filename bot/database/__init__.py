@@ -1,4 +1,4 @@
-from .models import Base, User, UserInteraction, UserSession, Channel, UserSubscription
+from .models import Base, User, UserInteraction, UserSession, Channel, UserSubscription, Broadcast, DailyStats, DailyInteractionCount
 from .session import get_session, init_db
 
 __all__ = [
@@ -8,6 +8,9 @@ __all__ = [
     "UserSession",
     "Channel",
     "UserSubscription",
+    "Broadcast",
+    "DailyStats",
+    "DailyInteractionCount",
     "get_session",
     "init_db",
 ]
\ No newline at end of file
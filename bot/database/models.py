@@ -1,7 +1,24 @@
 from datetime import datetime
-from sqlalchemy import Column, BigInteger, Integer, String, Boolean, Text, DateTime, ForeignKey, func
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, Text, Date, DateTime, ForeignKey, ForeignKeyConstraint, Index, JSON, LargeBinary, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, relationship
 from typing import Optional, List
+from bot.database.tenancy import current_bot_id
+
+
+# SQLite only autoincrements "INTEGER PRIMARY KEY", BIGINT keys would stay NULL
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
+# Binary JSONB on PostgreSQL (indexable, queryable with ->> and @>), JSON text elsewhere;
+# values are dicts, the engine serializes them (bot.utils.serialization)
+JSONDict = JSON().with_variant(JSONB(), "postgresql")
+
+
+def jsonb_gin_index(name: str, column: str) -> Index:
+    """GIN index for containment queries (metadata @> '{...}'), PostgreSQL only"""
+    return Index(
+        name, column, postgresql_using="gin", postgresql_ops={column: "jsonb_path_ops"}
+    ).ddl_if(dialect="postgresql")
 
 
 class Base(DeclarativeBase):
@@ -9,13 +26,23 @@ class Base(DeclarativeBase):
     pass
 
 
-class User(Base):
+class TenantMixin:
+    """Row belongs to one bot (the current one unless given), repositories filter on bot_id"""
+    bot_id = Column(BigInteger, nullable=False, default=current_bot_id)
+
+
+def user_fk(column: str = "user_id", **kwargs) -> ForeignKeyConstraint:
+    """(bot_id, column) -> users (bot_id, telegram_id)"""
+    return ForeignKeyConstraint(["bot_id", column], ["users.bot_id", "users.telegram_id"], **kwargs)
+
+
+class User(TenantMixin, Base):
     """User model"""
     __tablename__ = "users"
 
     # ✅ autoincrement=True qo'shildi
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    telegram_id = Column(BigInteger, nullable=False)
     username = Column(String(255))
     first_name = Column(String(255))
     last_name = Column(String(255))
@@ -36,79 +63,105 @@ class User(Base):
     total_sessions = Column(Integer, default=1, nullable=False)
 
     # ✅ metadata -> user_metadata (attribute name), lekin DB da "metadata"
-    user_metadata = Column("metadata", Text, default="{}")
+    user_metadata = Column("metadata", JSONDict, default=dict)
 
     # Relationships
     interactions = relationship("UserInteraction", back_populates="user", cascade="all, delete-orphan")
     sessions = relationship("UserSession", back_populates="user", cascade="all, delete-orphan")
     subscriptions = relationship("UserSubscription", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # One row per user and bot, target of the user foreign keys
+        Index("uq_users_bot_telegram", "bot_id", "telegram_id", unique=True),
+        # Broadcast pages of one bot's users (keyset on id)
+        Index("idx_users_bot_id", "bot_id", "id"),
+        jsonb_gin_index("idx_users_metadata_gin", "metadata"),
+    )
 
-class UserInteraction(Base):
+
+class UserInteraction(TenantMixin, Base):
     """User interaction tracking"""
     __tablename__ = "user_interactions"
 
     # ✅ autoincrement=True
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.telegram_id", ondelete="CASCADE"), index=True, nullable=False)
-    interaction_type = Column(String(50), index=True, nullable=False)
+    # On PostgreSQL the table is partitioned by month on created_at (PK is id + created_at)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    interaction_type = Column(String(50), nullable=False)
     content = Column(Text)
 
     # ✅ interaction_metadata
-    interaction_metadata = Column("metadata", Text, default="{}")
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True, nullable=False)
+    interaction_metadata = Column("metadata", JSONDict, default=dict)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="interactions")
 
+    __table_args__ = (
+        user_fk(ondelete="CASCADE"),
+        Index("idx_interactions_user_created", "user_id", "created_at"),
+        Index("idx_interactions_created_brin", "created_at", postgresql_using="brin").ddl_if(dialect="postgresql"),
+        jsonb_gin_index("idx_interactions_metadata_gin", "metadata"),
+    )
+
 
-class UserSession(Base):
+class UserSession(TenantMixin, Base):
     """User session tracking"""
     __tablename__ = "user_sessions"
 
     # ✅ autoincrement=True
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.telegram_id", ondelete="CASCADE"), index=True, nullable=False)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, index=True, nullable=False)
     started_at = Column(DateTime(timezone=True), server_default=func.now(), index=True, nullable=False)
     ended_at = Column(DateTime(timezone=True))
     duration_seconds = Column(Integer)
     actions_count = Column(Integer, default=0, nullable=False)
-    session_data = Column(Text, default="{}")
+    session_data = Column(JSONDict, default=dict)
 
     # Relationships
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (
+        user_fk(ondelete="CASCADE"),
+    )
 
-class Channel(Base):
+
+class Channel(TenantMixin, Base):
     """Channel model for forced subscription"""
     __tablename__ = "channels"
 
     # ✅ autoincrement=True
     id = Column(Integer, primary_key=True, autoincrement=True)
-    channel_id = Column(BigInteger, unique=True, nullable=False)
+    channel_id = Column(BigInteger, nullable=False)
     channel_username = Column(String(255))
     channel_title = Column(String(255))
     is_active = Column(Boolean, default=True, nullable=False)
     priority = Column(Integer, default=0, nullable=False)
-    added_by = Column(BigInteger, ForeignKey("users.telegram_id"))
+    added_by = Column(BigInteger)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     total_checks = Column(Integer, default=0, nullable=False)
 
     # ✅ channel_metadata
-    channel_metadata = Column("metadata", Text, default="{}")
+    channel_metadata = Column("metadata", JSONDict, default=dict)
 
     # Relationships
     subscriptions = relationship("UserSubscription", back_populates="channel", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Several bots may require the same channel
+        Index("uq_channels_bot_channel", "bot_id", "channel_id", unique=True),
+        user_fk("added_by"),
+    )
+
 
-class UserSubscription(Base):
+class UserSubscription(TenantMixin, Base):
     """User subscription tracking"""
     __tablename__ = "user_subscriptions"
 
     # ✅ autoincrement=True
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.telegram_id", ondelete="CASCADE"), index=True, nullable=False)
+    id = Column(BigIntPK, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
     channel_id = Column(Integer, ForeignKey("channels.id", ondelete="CASCADE"), index=True, nullable=False)
     is_subscribed = Column(Boolean, default=False, nullable=False)
     checked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -116,4 +169,60 @@ class UserSubscription(Base):
 
     # Relationships
     user = relationship("User", back_populates="subscriptions")
-    channel = relationship("Channel", back_populates="subscriptions")
\ No newline at end of file
+    channel = relationship("Channel", back_populates="subscriptions")
+
+    __table_args__ = (
+        user_fk(ondelete="CASCADE"),
+        # Upsert target, also serves lookups by user_id (channels.id already belongs to one bot)
+        Index("uq_user_subscriptions_user_channel", "user_id", "channel_id", unique=True),
+    )
+
+
+class Broadcast(TenantMixin, Base):
+    """Broadcast to all users, resumable from last_user_id checkpoint"""
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_by = Column(BigInteger, nullable=False)
+
+    # Message to copy to every recipient
+    from_chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(Integer, nullable=False)
+
+    # pending / running / completed / cancelled
+    status = Column(String(20), default="pending", index=True, nullable=False)
+
+    # Keyset checkpoint: every user with users.id <= last_user_id is done
+    last_user_id = Column(BigInteger, default=0, nullable=False)
+    total_sent = Column(Integer, default=0, nullable=False)
+    total_failed = Column(Integer, default=0, nullable=False)
+    total_blocked = Column(Integer, default=0, nullable=False)
+
+    # Lease so only one process sends a broadcast at a time
+    locked_until = Column(DateTime(timezone=True))
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+class DailyStats(Base):
+    """Per-day rollup kept up to date by the analytics writer"""
+    __tablename__ = "daily_stats"
+
+    bot_id = Column(BigInteger, primary_key=True)
+    day = Column(Date, primary_key=True)
+    new_users = Column(BigInteger, default=0, nullable=False)
+
+    # HyperLogLog registers of users active that day (see bot.utils.hll)
+    active_users_hll = Column(LargeBinary)
+
+
+class DailyInteractionCount(Base):
+    """Interactions per day and type"""
+    __tablename__ = "daily_interaction_counts"
+
+    bot_id = Column(BigInteger, primary_key=True)
+    day = Column(Date, primary_key=True)
+    interaction_type = Column(String(50), primary_key=True)
+    count = Column(BigInteger, default=0, nullable=False)
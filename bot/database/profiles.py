@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from bot.utils.serialization import json_dumps, json_loads
+
+# WAL lets readers run next to the writer; NORMAL only fsyncs at checkpoints,
+# a power loss can lose the last commits but never corrupts the file
+_SQLITE_WAL = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Pool settings for PostgreSQL, connection PRAGMAs for SQLite"""
+    pool_size: int = 10
+    max_overflow: int = 10
+    pool_timeout: float = 10.0
+    # Seconds before a connection is replaced, keep below server / proxy idle timeouts
+    pool_recycle: int = 1800
+    # A round-trip on every checkout; without it a dead connection fails one query and is replaced
+    pre_ping: bool = False
+    # Prepared statements per connection (asyncpg and SQLAlchemy caches), 0 behind pgbouncer
+    statement_cache_size: int = 100
+    sqlite_pragmas: Dict[str, Any] = field(default_factory=lambda: dict(_SQLITE_WAL))
+    # aiosqlite opens a new connection per session by default, PRAGMAs and mmap are per connection
+    sqlite_pooled: bool = True
+
+
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    # Polling or a moderate webhook load
+    "default": EngineProfile(),
+    # Webhook with many updates in flight, workers mode
+    "throughput": EngineProfile(
+        pool_size=20,
+        max_overflow=30,
+        pool_recycle=3600,
+        statement_cache_size=500,
+        sqlite_pragmas={**_SQLITE_WAL, "busy_timeout": 10000, "mmap_size": 1024 * 1024 * 1024, "cache_size": -65536},
+    ),
+    # Flaky network, failovers, proxies that drop idle connections
+    "safe": EngineProfile(
+        pool_size=5,
+        pool_recycle=300,
+        pre_ping=True,
+        sqlite_pragmas={**_SQLITE_WAL, "synchronous": "FULL", "mmap_size": 0},
+    ),
+    # pgbouncer in transaction mode: no prepared statements, it does the pooling
+    "pgbouncer": EngineProfile(pool_size=5, max_overflow=5, statement_cache_size=0),
+    # What the engine used before profiles: library defaults with pre-ping, rollback journal
+    "legacy": EngineProfile(
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30.0,
+        pool_recycle=-1,
+        pre_ping=True,
+        sqlite_pragmas={},
+        sqlite_pooled=False,
+    ),
+}
+
+
+def resolve_profile(settings) -> EngineProfile:
+    """DB_PROFILE with the DB_* overrides that are set"""
+    try:
+        profile = ENGINE_PROFILES[settings.DB_PROFILE]
+    except KeyError:
+        raise ValueError(
+            f"Unknown DB_PROFILE {settings.DB_PROFILE!r}, expected one of {', '.join(ENGINE_PROFILES)}"
+        ) from None
+
+    overrides = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    return replace(profile, **{key: value for key, value in overrides.items() if value is not None})
+
+
+def engine_options(profile: EngineProfile, sqlite: bool) -> Dict[str, Any]:
+    """create_async_engine() keyword arguments for a profile"""
+    # JSON / JSONB columns go through orjson in every profile
+    options: Dict[str, Any] = {"json_serializer": json_dumps, "json_deserializer": json_loads}
+    if sqlite and not profile.sqlite_pooled:
+        options["poolclass"] = NullPool
+        return options
+
+    options.update(
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pre_ping,
+    )
+    if not sqlite:
+        options["connect_args"] = {
+            "statement_cache_size": profile.statement_cache_size,
+            "prepared_statement_cache_size": profile.statement_cache_size,
+        }
+    return options
+
+
+def apply_sqlite_pragmas(engine: AsyncEngine, pragmas: Dict[str, Any]) -> None:
+    """Run the PRAGMAs on every new SQLite connection"""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
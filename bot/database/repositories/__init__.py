@@ -1,4 +1,13 @@
 from .user_repository import UserRepository
 from .channel_repository import ChannelRepository
+from .subscription_repository import SubscriptionRepository
+from .broadcast_repository import BroadcastRepository
+from .stats_repository import StatsRepository
 
-__all__ = ["UserRepository", "ChannelRepository"]
\ No newline at end of file
+__all__ = [
+    "UserRepository",
+    "ChannelRepository",
+    "SubscriptionRepository",
+    "BroadcastRepository",
+    "StatsRepository",
+]
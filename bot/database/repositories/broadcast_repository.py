@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from bot.database.models import Broadcast
+from bot.database.tenancy import current_bot_id
+from bot.utils.tracing import trace_methods
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+@trace_methods("repository")
+class BroadcastRepository:
+    """Repository for Broadcast operations, scoped to one bot (the current one by default)"""
+
+    def __init__(self, session: AsyncSession, bot_id: Optional[int] = None):
+        self.session = session
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
+
+    async def create(self, created_by: int, from_chat_id: int, message_id: int) -> Broadcast:
+        """Create pending broadcast (flushed, committed by the caller)"""
+        broadcast = Broadcast(
+            bot_id=self.bot_id, created_by=created_by, from_chat_id=from_chat_id, message_id=message_id,
+        )
+        self.session.add(broadcast)
+        await self.session.flush()
+        return broadcast
+
+    async def get(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Get broadcast by ID"""
+        broadcast = await self.session.get(Broadcast, broadcast_id)
+        return broadcast if broadcast is not None and broadcast.bot_id == self.bot_id else None
+
+    async def get_resumable_ids(self) -> List[int]:
+        """IDs of unfinished broadcasts nobody holds a lease on"""
+        now = datetime.now(timezone.utc)
+        result = await self.session.execute(
+            select(Broadcast.id)
+            .where(Broadcast.bot_id == self.bot_id)
+            .where(Broadcast.status.in_(ACTIVE_STATUSES))
+            .where(or_(Broadcast.locked_until.is_(None), Broadcast.locked_until < now))
+            .order_by(Broadcast.id)
+        )
+        return list(result.scalars().all())
+
+    async def claim(self, broadcast_id: int, lease_seconds: int) -> bool:
+        """Take the lease on an unfinished broadcast, False if someone else holds it"""
+        now = datetime.now(timezone.utc)
+        result = await self.session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.bot_id == self.bot_id)
+            .where(Broadcast.status.in_(ACTIVE_STATUSES))
+            .where(or_(Broadcast.locked_until.is_(None), Broadcast.locked_until < now))
+            .values(
+                status="running",
+                locked_until=now + timedelta(seconds=lease_seconds),
+            )
+        )
+        if result.rowcount:
+            await self.session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.bot_id == self.bot_id)
+                .where(Broadcast.started_at.is_(None))
+                .values(started_at=now)
+            )
+        return bool(result.rowcount)
+
+    async def save_progress(
+        self,
+        broadcast_id: int,
+        last_user_id: int,
+        sent: int,
+        failed: int,
+        blocked: int,
+        lease_seconds: int,
+    ) -> bool:
+        """
+        Move checkpoint forward, add counters and renew the lease
+        Returns False if the broadcast was cancelled meanwhile
+        """
+        result = await self.session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.bot_id == self.bot_id)
+            .where(Broadcast.status == "running")
+            .values(
+                last_user_id=last_user_id,
+                total_sent=Broadcast.total_sent + sent,
+                total_failed=Broadcast.total_failed + failed,
+                total_blocked=Broadcast.total_blocked + blocked,
+                locked_until=datetime.now(timezone.utc) + timedelta(seconds=lease_seconds),
+            )
+        )
+        return bool(result.rowcount)
+
+    async def finish(self, broadcast_id: int, status: str = "completed") -> None:
+        """Mark broadcast finished and release the lease"""
+        await self.session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.bot_id == self.bot_id)
+            .values(status=status, finished_at=datetime.now(timezone.utc), locked_until=None)
+        )
+
+    async def release(self, broadcast_id: int) -> None:
+        """Drop the lease so another process (or restart) can resume right away"""
+        await self.session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.bot_id == self.bot_id)
+            .where(Broadcast.status == "running")
+            .values(locked_until=None)
+        )
@@ -2,18 +2,23 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from bot.database.models import Channel
+from bot.database.tenancy import current_bot_id
+from bot.utils.tracing import trace_methods
 
 
+@trace_methods("repository")
 class ChannelRepository:
-    """Repository for Channel operations"""
+    """Repository for Channel operations, scoped to one bot (the current one by default)"""
     
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, bot_id: Optional[int] = None):
         self.session = session
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
     
     async def get_active_channels(self) -> List[Channel]:
         """Get all active channels ordered by priority"""
         result = await self.session.execute(
             select(Channel)
+            .where(Channel.bot_id == self.bot_id)
             .where(Channel.is_active == True)
             .order_by(Channel.priority.desc())
         )
@@ -22,14 +27,14 @@ class ChannelRepository:
     async def get_by_id(self, channel_id: int) -> Optional[Channel]:
         """Get channel by ID"""
         result = await self.session.execute(
-            select(Channel).where(Channel.channel_id == channel_id)
+            select(Channel).where(Channel.bot_id == self.bot_id, Channel.channel_id == channel_id)
         )
         return result.scalar_one_or_none()
     
     async def create(self, channel_id: int, **kwargs) -> Channel:
-        """Create new channel"""
-        channel = Channel(channel_id=channel_id, **kwargs)
+        """Create new channel (flushed, committed by the unit of work)"""
+        channel = Channel(bot_id=self.bot_id, channel_id=channel_id, **kwargs)
         self.session.add(channel)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(channel)
         return channel
\ No newline at end of file
@@ -0,0 +1,106 @@
+from datetime import date
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from bot.database.models import DailyStats, DailyInteractionCount
+from bot.database.tenancy import current_bot_id
+from bot.utils.hll import HyperLogLog
+from bot.utils.tracing import trace_methods
+
+
+@trace_methods("repository")
+class StatsRepository:
+    """
+    Repository for analytics rollups (nothing here scans users or interactions),
+    scoped to one bot (the current one by default)
+    """
+
+    def __init__(self, session: AsyncSession, bot_id: Optional[int] = None):
+        self.session = session
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
+
+    async def _insert(self):
+        connection = await self.session.connection()
+        return pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+
+    async def record_day(self, day: date, new_users: int = 0, active: Optional[HyperLogLog] = None) -> None:
+        """Add registrations and a sketch of active users to a day's rollup (not committed)"""
+        insert_fn = await self._insert()
+        await self.session.execute(
+            insert_fn(DailyStats).values(bot_id=self.bot_id, day=day, new_users=0)
+            .on_conflict_do_nothing(index_elements=[DailyStats.bot_id, DailyStats.day])
+        )
+
+        values = {}
+        if new_users:
+            values["new_users"] = DailyStats.new_users + new_users
+        if active is not None:
+            # Row lock: concurrent writers (worker processes) would lose each other's registers
+            stored = await self.session.scalar(
+                select(DailyStats.active_users_hll)
+                .where(DailyStats.bot_id == self.bot_id, DailyStats.day == day)
+                .with_for_update()
+            )
+            if stored:
+                active.update(HyperLogLog.from_bytes(stored))
+            values["active_users_hll"] = active.to_bytes()
+
+        if values:
+            await self.session.execute(
+                update(DailyStats).where(DailyStats.bot_id == self.bot_id, DailyStats.day == day).values(**values)
+            )
+
+    async def add_interaction_counts(self, counts: Dict[Tuple[date, str], int]) -> None:
+        """Increment per day/type interaction counters (not committed)"""
+        if not counts:
+            return
+        insert_fn = await self._insert()
+        stmt = insert_fn(DailyInteractionCount)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    DailyInteractionCount.bot_id, DailyInteractionCount.day, DailyInteractionCount.interaction_type,
+                ],
+                set_={"count": DailyInteractionCount.count + stmt.excluded["count"]},
+            ),
+            [
+                {"bot_id": self.bot_id, "day": day, "interaction_type": interaction_type, "count": count}
+                for (day, interaction_type), count in counts.items()
+            ],
+        )
+
+    async def get_days(self, first: date, last: date) -> List[DailyStats]:
+        """Rollup rows for first..last inclusive"""
+        result = await self.session.execute(
+            select(DailyStats)
+            .where(DailyStats.bot_id == self.bot_id, DailyStats.day.between(first, last))
+            .order_by(DailyStats.day)
+            .execution_options(replica=True)
+        )
+        return list(result.scalars().all())
+
+    async def get_interaction_counts(self, first: date, last: date) -> Dict[str, int]:
+        """Interactions per type for first..last inclusive"""
+        result = await self.session.execute(
+            select(DailyInteractionCount.interaction_type, func.sum(DailyInteractionCount.count))
+            .where(DailyInteractionCount.bot_id == self.bot_id)
+            .where(DailyInteractionCount.day.between(first, last))
+            .group_by(DailyInteractionCount.interaction_type)
+            .execution_options(replica=True)
+        )
+        return {interaction_type: int(count) for interaction_type, count in result.all()}
+
+    async def get_total_users(self) -> int:
+        """Registered users, summed from per-day counters"""
+        return int(await self.session.scalar(
+            select(func.coalesce(func.sum(DailyStats.new_users), 0))
+            .where(DailyStats.bot_id == self.bot_id)
+            .execution_options(replica=True)
+        ))
+
+    async def clear(self) -> None:
+        """Drop every rollup row of the bot (before a backfill, not committed)"""
+        await self.session.execute(delete(DailyInteractionCount).where(DailyInteractionCount.bot_id == self.bot_id))
+        await self.session.execute(delete(DailyStats).where(DailyStats.bot_id == self.bot_id))
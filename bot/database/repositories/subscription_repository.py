@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, case, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional, Tuple
+from bot.database.models import Channel, User, UserSubscription
+from bot.database.tenancy import current_bot_id
+from bot.utils.tracing import trace_methods
+
+
+@trace_methods("repository")
+class SubscriptionRepository:
+    """Repository for UserSubscription operations, scoped to one bot (the current one by default)"""
+
+    def __init__(self, session: AsyncSession, bot_id: Optional[int] = None):
+        self.session = session
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
+
+    async def get(self, user_id: int, channel_id: int) -> Optional[UserSubscription]:
+        """Get subscription row for user and channel (channels.id)"""
+        result = await self.session.execute(
+            select(UserSubscription)
+            .where(UserSubscription.bot_id == self.bot_id)
+            .where(UserSubscription.user_id == user_id)
+            .where(UserSubscription.channel_id == channel_id)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_statuses(self, user_id: int, channel_ids: List[int]) -> Dict[int, bool]:
+        """Stored is_subscribed per channel (channels.id), channels without a row are missing"""
+        result = await self.session.execute(
+            select(UserSubscription.channel_id, UserSubscription.is_subscribed)
+            .where(UserSubscription.bot_id == self.bot_id)
+            .where(UserSubscription.user_id == user_id)
+            .where(UserSubscription.channel_id.in_(channel_ids))
+        )
+        return dict(result.all())
+
+    async def upsert_statuses(self, rows: Iterable[Tuple[int, int, bool, datetime]]) -> int:
+        """
+        Insert or update (user_id, channel_id, is_subscribed, checked_at) rows
+        in one statement (not committed)
+
+        The latest row per pair wins, a stored row checked later than the
+        new one is kept. Users not in users table are skipped.
+        Returns number of rows sent
+        """
+        latest: Dict[Tuple[int, int], Tuple[bool, datetime]] = {}
+        for user_id, channel_id, is_subscribed, checked_at in rows:
+            current = latest.get((user_id, channel_id))
+            if current is None or current[1] <= checked_at:
+                latest[(user_id, channel_id)] = (is_subscribed, checked_at)
+        if not latest:
+            return 0
+
+        result = await self.session.execute(
+            select(User.telegram_id)
+            .where(User.bot_id == self.bot_id)
+            .where(User.telegram_id.in_({user_id for user_id, _ in latest}))
+        )
+        existing = set(result.scalars().all())
+        params = [
+            {
+                "bot_id": self.bot_id,
+                "user_id": user_id,
+                "channel_id": channel_id,
+                "is_subscribed": is_subscribed,
+                "checked_at": checked_at,
+                "subscribed_at": checked_at if is_subscribed else None,
+            }
+            for (user_id, channel_id), (is_subscribed, checked_at) in latest.items()
+            if user_id in existing
+        ]
+        if not params:
+            return 0
+
+        table = UserSubscription.__table__
+        connection = await self.session.connection()
+        insert_fn = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert_fn(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.channel_id],
+            set_={
+                "is_subscribed": stmt.excluded.is_subscribed,
+                "checked_at": stmt.excluded.checked_at,
+                # First time of the current subscription, cleared on leave
+                "subscribed_at": case(
+                    (stmt.excluded.is_subscribed, func.coalesce(table.c.subscribed_at, stmt.excluded.subscribed_at)),
+                    else_=None,
+                ),
+            },
+            where=or_(table.c.checked_at.is_(None), table.c.checked_at <= stmt.excluded.checked_at),
+        )
+        await self.session.execute(stmt, params)
+        return len(params)
+
+    async def claim_stale(self, min_age: float, limit: int) -> List[Tuple[int, int, int, bool]]:
+        """
+        Take up to `limit` pairs of active channels not checked for `min_age`
+        seconds, oldest first, and mark them checked now (not committed)
+
+        Concurrent callers get different pairs. Returns
+        (user_id, channels.id, channels.channel_id, is_subscribed) tuples
+        """
+        now = datetime.now(timezone.utc)
+        stale = (
+            select(UserSubscription.id)
+            .join(Channel, Channel.id == UserSubscription.channel_id)
+            .where(UserSubscription.bot_id == self.bot_id)
+            .where(Channel.is_active == True)
+            .where(UserSubscription.checked_at < now - timedelta(seconds=min_age))
+            .order_by(UserSubscription.checked_at)
+            .limit(limit)
+            .with_for_update(of=UserSubscription, skip_locked=True)
+        )
+        result = await self.session.execute(
+            update(UserSubscription)
+            .where(UserSubscription.id.in_(stale.scalar_subquery()))
+            .values(checked_at=now)
+            .returning(UserSubscription.user_id, UserSubscription.channel_id, UserSubscription.is_subscribed)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.all()
+        if not claimed:
+            return []
+
+        channels = await self.session.execute(
+            select(Channel.id, Channel.channel_id).where(Channel.id.in_({row.channel_id for row in claimed}))
+        )
+        telegram_ids = dict(channels.all())
+        return [
+            (row.user_id, row.channel_id, telegram_ids[row.channel_id], row.is_subscribed)
+            for row in claimed
+        ]
@@ -1,49 +1,135 @@
 from datetime import datetime, timedelta
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update, insert, func, values, column, literal_column, bindparam, BigInteger, Integer, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
-import json
+from typing import Optional, Dict, Iterable, Set, Tuple, AsyncIterator, List
 from bot.database.models import User, UserInteraction
+from bot.database.tenancy import current_bot_id
+from bot.utils.serialization import json_dumps
+from bot.utils.tracing import trace_methods
 
+INTERACTION_COPY_COLUMNS = ["bot_id", "user_id", "interaction_type", "content", "metadata", "created_at"]
+# Undoes mark_blocked
+REACHABLE = {"is_blocked": False, "is_active": True, "blocked_at": None}
 
+
+@trace_methods("repository")
 class UserRepository:
-    """Repository for User operations"""
+    """Repository for User operations, scoped to one bot (the current one by default)"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, bot_id: Optional[int] = None):
         self.session = session
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
 
     async def get_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Get user by telegram ID"""
         result = await self.session.execute(
-            select(User).where(User.telegram_id == telegram_id)
+            select(User).where(User.bot_id == self.bot_id, User.telegram_id == telegram_id)
         )
         return result.scalar_one_or_none()
 
+    async def exists(self, telegram_id: int) -> bool:
+        """Check if user is registered"""
+        result = await self.session.execute(
+            select(User.id).where(User.bot_id == self.bot_id, User.telegram_id == telegram_id)
+        )
+        return result.first() is not None
+
     async def create(self, telegram_id: int, **kwargs) -> User:
-        """Create new user"""
-        user = User(telegram_id=telegram_id, **kwargs)
+        """Create new user (flushed, committed by the unit of work)"""
+        user = User(bot_id=self.bot_id, telegram_id=telegram_id, **kwargs)
         self.session.add(user)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(user)
         return user
 
+    async def upsert(self, telegram_id: int, **profile) -> Tuple[User, bool]:
+        """
+        Insert user or refresh profile fields and clear the blocked flag
+        (INSERT ... ON CONFLICT DO UPDATE ... RETURNING), safe for concurrent
+        first updates. Returns (user, created)
+        """
+        connection = await self.session.connection()
+        postgres = connection.dialect.name == "postgresql"
+        insert_fn = pg_insert if postgres else sqlite_insert
+
+        if not postgres:
+            # SQLite has no xmax: try a plain insert first, fall through to the update
+            stmt = insert_fn(User).values(bot_id=self.bot_id, telegram_id=telegram_id, **profile)
+            stmt = stmt.on_conflict_do_nothing(index_elements=[User.bot_id, User.telegram_id]).returning(User)
+            result = await self.session.execute(stmt, execution_options={"populate_existing": True})
+            user = result.scalar_one_or_none()
+            if user is not None:
+                return user, True
+
+        stmt = insert_fn(User).values(bot_id=self.bot_id, telegram_id=telegram_id, **profile)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.bot_id, User.telegram_id],
+            # A user writing to the bot again has unblocked it
+            set_={**{name: stmt.excluded[name] for name in profile}, **REACHABLE},
+        )
+        if not postgres:
+            result = await self.session.execute(stmt.returning(User), execution_options={"populate_existing": True})
+            return result.scalar_one(), False
+
+        # xmax is 0 only for the row version this statement inserted
+        result = await self.session.execute(
+            stmt.returning(User, literal_column("xmax = 0").label("created")),
+            execution_options={"populate_existing": True},
+        )
+        user, created = result.one()
+        return user, bool(created)
+
+    async def iter_profiles(self, chunk_size: int = 50_000) -> AsyncIterator[List[Tuple]]:
+        """Stream (telegram_id, username, first_name, last_name, language_code) of reachable users in chunks"""
+        result = await self.session.stream(
+            select(User.telegram_id, User.username, User.first_name, User.last_name, User.language_code)
+            .where(User.bot_id == self.bot_id)
+            .where(User.is_blocked == False)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_recipients_page(self, after_id: int, limit: int) -> List[Tuple[int, int]]:
+        """Next (id, telegram_id) page of reachable users, keyset-paginated on users.id"""
+        result = await self.session.execute(
+            select(User.id, User.telegram_id)
+            .where(User.bot_id == self.bot_id)
+            .where(User.id > after_id)
+            .where(User.is_blocked == False)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def mark_blocked(self, telegram_ids: List[int]) -> None:
+        """Mark users who blocked the bot (not committed)"""
+        if not telegram_ids:
+            return
+        await self.session.execute(
+            update(User)
+            .where(User.bot_id == self.bot_id)
+            .where(User.telegram_id.in_(telegram_ids))
+            .values(is_blocked=True, is_active=False, blocked_at=datetime.utcnow())
+        )
+
     async def update_last_interaction(self, telegram_id: int) -> None:
         """Update user's last interaction time"""
         await self.session.execute(
             update(User)
-            .where(User.telegram_id == telegram_id)
+            .where(User.bot_id == self.bot_id, User.telegram_id == telegram_id)
             .values(last_interaction=datetime.utcnow())
         )
-        await self.session.commit()
 
     async def increment_messages(self, telegram_id: int) -> None:
         """Increment user's message count"""
         await self.session.execute(
             update(User)
-            .where(User.telegram_id == telegram_id)
+            .where(User.bot_id == self.bot_id, User.telegram_id == telegram_id)
             .values(total_messages=User.total_messages + 1)
         )
-        await self.session.commit()
 
     async def track_interaction(
             self,
@@ -53,21 +139,101 @@ class UserRepository:
             metadata: Optional[dict] = None
     ) -> None:
         """Track user interaction"""
-        # Convert dict to JSON string for SQLite
-        metadata_str = json.dumps(metadata or {})
-
         interaction = UserInteraction(
+            bot_id=self.bot_id,
             user_id=telegram_id,
             interaction_type=interaction_type,
             content=content,
-            extra_data=metadata_str
+            interaction_metadata=metadata or {}
         )
         self.session.add(interaction)
-        await self.session.commit()
+
+    async def bulk_touch_users(self, activity: Dict[int, Tuple[int, datetime]]) -> Set[int]:
+        """
+        Apply aggregated activity {telegram_id: (messages, last_interaction)}
+        in one statement (not committed)
+        Returns telegram IDs that exist in users table
+        """
+        if not activity:
+            return set()
+
+        users = User.__table__
+        connection = await self.session.connection()
+
+        if connection.dialect.name == "postgresql":
+            batch = values(
+                column("telegram_id", BigInteger),
+                column("messages", Integer),
+                column("last_at", DateTime(timezone=True)),
+                name="batch",
+            ).data([(tid, count, last_at) for tid, (count, last_at) in activity.items()])
+
+            result = await self.session.execute(
+                update(users)
+                .where(users.c.bot_id == self.bot_id)
+                .where(users.c.telegram_id == batch.c.telegram_id)
+                .values(
+                    total_messages=users.c.total_messages + batch.c.messages,
+                    last_interaction=batch.c.last_at,
+                )
+                .returning(users.c.telegram_id)
+            )
+            return set(result.scalars().all())
+
+        # SQLite has no VALUES-with-column-names in FROM, use executemany instead
+        result = await self.session.execute(
+            select(users.c.telegram_id)
+            .where(users.c.bot_id == self.bot_id)
+            .where(users.c.telegram_id.in_(list(activity)))
+        )
+        existing = set(result.scalars().all())
+        if existing:
+            await self.session.execute(
+                update(users)
+                .where(users.c.bot_id == self.bot_id)
+                .where(users.c.telegram_id == bindparam("b_telegram_id"))
+                .values(
+                    total_messages=users.c.total_messages + bindparam("b_messages"),
+                    last_interaction=bindparam("b_last_at"),
+                ),
+                [
+                    {"b_telegram_id": tid, "b_messages": count, "b_last_at": last_at}
+                    for tid, (count, last_at) in activity.items() if tid in existing
+                ],
+            )
+        return existing
+
+    async def bulk_track_interactions(self, rows: Iterable[Tuple[int, str, Optional[str], dict, datetime]]) -> None:
+        """
+        Insert interaction rows (user_id, type, content, metadata, created_at)
+        using COPY on asyncpg, multi-row INSERT elsewhere (not committed)
+        """
+        rows = list(rows)
+        if not rows:
+            return
+
+        connection = await self.session.connection()
+
+        if connection.dialect.driver == "asyncpg":
+            raw = await connection.get_raw_connection()
+            # COPY bypasses the column type, the jsonb codec takes JSON text
+            await raw.driver_connection.copy_records_to_table(
+                UserInteraction.__tablename__,
+                records=[(self.bot_id, *row[:3], json_dumps(row[3]), row[4]) for row in rows],
+                columns=INTERACTION_COPY_COLUMNS,
+            )
+            return
+
+        await connection.execute(
+            insert(UserInteraction.__table__),
+            [dict(zip(INTERACTION_COPY_COLUMNS, (self.bot_id, *row))) for row in rows],
+        )
 
     async def get_total_users(self) -> int:
         """Get total number of users"""
-        result = await self.session.execute(select(func.count(User.id)))
+        result = await self.session.execute(
+            select(func.count(User.id)).where(User.bot_id == self.bot_id).execution_options(replica=True)
+        )
         return result.scalar_one()
 
     async def get_active_users(self, days: int = 7) -> int:
@@ -75,6 +241,8 @@ class UserRepository:
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         result = await self.session.execute(
             select(func.count(User.id))
+            .where(User.bot_id == self.bot_id)
             .where(User.last_interaction >= cutoff_date)
+            .execution_options(replica=True)
         )
         return result.scalar_one()
\ No newline at end of file
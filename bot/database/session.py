@@ -1,22 +1,259 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from bot.config.settings import settings
 from bot.database.models import Base
+from bot.database.profiles import apply_sqlite_pragmas, engine_options, resolve_profile
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import instrument_engine, instrumented_pool
+from bot.utils.tracing import trace_engine
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-)
+logger = logging.getLogger(__name__)
 
-# Create session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
-)
+# 0 on the primary or a caught-up replica, otherwise seconds since the last replayed commit
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Decides whether a read-only query may go to the replica
+
+    A background check keeps the replica's health and lag current; while
+    it is unreachable or more than `max_lag` seconds behind, everything
+    goes to the primary. Users who committed a write in the last
+    `read_your_writes` seconds keep reading from the primary too.
+    A read already on its way when the replica dies fails once; the
+    disconnect marks the replica down for the next ones.
+    """
+
+    def __init__(
+        self,
+        replica: Optional[AsyncEngine],
+        max_lag: float = 10.0,
+        check_interval: float = 5.0,
+        read_your_writes: float = 15.0,
+    ):
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.routed = 0
+        self.fallbacks = 0
+        self._recent_writers = TTLCache(max_size=100_000)
+        self._task: Optional[asyncio.Task] = None
+
+        if replica is not None:
+            event.listen(replica.sync_engine, "handle_error", self._on_error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Router counters for monitoring"""
+        return {
+            "configured": self.replica is not None,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+        }
+
+    def use_replica(self, user_id: Optional[int]) -> bool:
+        """True if a read for this user (None: not user specific) may go to the replica"""
+        if not self.healthy:
+            if self.replica is not None:
+                self.fallbacks += 1
+            return False
+        if user_id is not None and self._recent_writers.get(user_id) is not None:
+            self.fallbacks += 1
+            return False
+        self.routed += 1
+        return True
+
+    def mark_write(self, user_id: int) -> None:
+        self._recent_writers.set(user_id, True, self.read_your_writes)
+
+    async def check(self) -> None:
+        try:
+            async with self.replica.connect() as conn:
+                lag = float(await conn.scalar(REPLICA_LAG_SQL))
+        except Exception as e:
+            if self.healthy or self.lag is None:
+                logger.warning("Replica unavailable, reading from the primary: %s", e)
+            self.healthy, self.lag = False, None
+            return
+
+        healthy = lag <= self.max_lag
+        if healthy != self.healthy:
+            logger.info("Replica %s (lag %.1fs)", "in use" if healthy else "lagging, reading from the primary", lag)
+        self.healthy, self.lag = healthy, lag
+
+    async def start(self) -> None:
+        """Dispatcher startup hook"""
+        if self.replica is None or self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run(), name="replica-health")
+
+    async def stop(self) -> None:
+        """Dispatcher shutdown hook"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.healthy = False
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    def _on_error(self, context) -> None:
+        # Do not wait for the next check to stop sending reads to a dead replica
+        if context.is_disconnect and self.healthy:
+            logger.warning("Replica connection lost, reading from the primary")
+            self.healthy = False
+
+
+class RoutingSession(Session):
+    """
+    Session that sends read-only queries to the replica
+
+    Repositories mark them with `.execution_options(replica=True)`, raw
+    connections with `session.connection(bind_arguments={"replica": True})`.
+    Everything else, and every read after this session wrote, goes to the
+    primary. session.info["user_id"] (set by DatabaseMiddleware) enables
+    read-your-writes across updates.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if kw.get("replica") or (clause is not None and clause.get_execution_options().get("replica")):
+            if not self.info.get("wrote") and _replica_router.use_replica(self.info.get("user_id")):
+                return _replica_engine.sync_engine
+        elif (clause is None and mapper is not None) or getattr(clause, "is_dml", False):
+            # ORM flush or INSERT/UPDATE/DELETE
+            self.info["wrote"] = True
+        return _engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session: Session) -> None:
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and user_id is not None:
+        _replica_router.mark_write(user_id)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+# Created on first use: importing this module reads no settings, and worker
+# processes build their own engines after they start
+_engine: Optional[AsyncEngine] = None
+_replica_engine: Optional[AsyncEngine] = None
+_replica_router: Optional[ReplicaRouter] = None
+_session_factory: Optional[async_sessionmaker] = None
+
+
+def _create_engine(
+    url: str, engine_kwargs: Dict[str, Any], sqlite_pragmas: Optional[Dict[str, Any]], name: str,
+) -> AsyncEngine:
+    if settings.METRICS_ENABLED and engine_kwargs["poolclass"] is not NullPool:
+        # Same queue pool, plus checkout wait timing under engine=name
+        engine_kwargs = dict(engine_kwargs, poolclass=instrumented_pool(name))
+    new_engine = create_async_engine(url, echo=settings.DEBUG, **engine_kwargs)
+    if sqlite_pragmas:
+        apply_sqlite_pragmas(new_engine, sqlite_pragmas)
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine, name)
+    if settings.PROFILING_ENABLED:
+        trace_engine(new_engine)
+    return new_engine
+
+
+def _create_engines() -> None:
+    global _engine, _replica_engine, _replica_router, _session_factory
+
+    profile = resolve_profile(settings)
+    engine_kwargs = engine_options(profile, sqlite=settings.USE_SQLITE)
+    engine = _create_engine(
+        settings.DATABASE_URL, engine_kwargs, profile.sqlite_pragmas if settings.USE_SQLITE else None, "primary",
+    )
+    # Streaming replica for read-only queries, None when not configured
+    replica_engine = None
+    if settings.REPLICA_DATABASE_URL:
+        replica_engine = _create_engine(settings.REPLICA_DATABASE_URL, engine_kwargs, None, "replica")
+
+    _replica_router = ReplicaRouter(
+        replica_engine,
+        max_lag=settings.REPLICA_MAX_LAG,
+        check_interval=settings.REPLICA_CHECK_INTERVAL,
+        read_your_writes=settings.REPLICA_READ_YOUR_WRITES,
+    )
+    _session_factory = async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        # Routing only costs something when there is a replica to route to
+        **({"sync_session_class": RoutingSession} if replica_engine is not None else {}),
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+    )
+    # Last, the getters check _engine
+    _replica_engine, _engine = replica_engine, engine
+
+
+def get_engine() -> AsyncEngine:
+    """Primary engine"""
+    if _engine is None:
+        _create_engines()
+    return _engine
+
+
+def get_replica_engine() -> Optional[AsyncEngine]:
+    """Replica engine, None without REPLICA_HOST"""
+    if _engine is None:
+        _create_engines()
+    return _replica_engine
+
+
+def get_replica_router() -> ReplicaRouter:
+    if _engine is None:
+        _create_engines()
+    return _replica_router
+
+
+async def start_replica_router() -> None:
+    """Dispatcher startup hook, creates the engines if nothing has yet"""
+    await get_replica_router().start()
+
+
+async def stop_replica_router() -> None:
+    """Dispatcher shutdown hook"""
+    if _replica_router is not None:
+        await _replica_router.stop()
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """New session (the session factory is created with the engines on first use)"""
+    if _engine is None:
+        _create_engines()
+    return _session_factory()
 
 
 async def get_session() -> AsyncSession:
@@ -30,7 +267,15 @@ async def get_session() -> AsyncSession:
 
 async def init_db():
     """Initialize database (create tables)"""
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         # Only for development - in production use Alembic migrations
         if settings.DEBUG:
-            await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+            await conn.run_sync(Base.metadata.create_all)
+
+
+async def close_db():
+    """Close pooled connections (open aiosqlite connections keep the process from exiting)"""
+    if _engine is not None:
+        await _engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
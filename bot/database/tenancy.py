@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+from bot.config.settings import settings
+
+# Set per update by TenantMiddleware and around background work done for one bot
+_bot_id: ContextVar[Optional[int]] = ContextVar("tenant_bot_id", default=None)
+
+
+def bot_id_from_token(token: str) -> int:
+    """Telegram bot id, the part of the token before ':'"""
+    return int(token.split(":", 1)[0])
+
+
+@lru_cache(maxsize=None)
+def default_bot_id() -> int:
+    """Tenant of BOT_TOKEN"""
+    return bot_id_from_token(settings.BOT_TOKEN)
+
+
+def current_bot_id() -> int:
+    """Bot whose rows are read and written: set by use_bot(), BOT_TOKEN's outside of it"""
+    bot_id = _bot_id.get()
+    return default_bot_id() if bot_id is None else bot_id
+
+
+@contextmanager
+def use_bot(bot_id: int) -> Iterator[None]:
+    """Scope repositories created inside the block (and tasks started there) to `bot_id`"""
+    token = _bot_id.set(bot_id)
+    try:
+        yield
+    finally:
+        _bot_id.reset(token)
@@ -0,0 +1,8 @@
+"""Admin handlers"""
+from aiogram.types import Message
+from bot.config.settings import settings
+
+
+def is_admin(message: Message) -> bool:
+    """Router filter, ADMIN_USER_ID is read per message (not when the handlers are imported)"""
+    return message.from_user is not None and message.from_user.id == settings.ADMIN_USER_ID
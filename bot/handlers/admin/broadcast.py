@@ -0,0 +1,66 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database.repositories.broadcast_repository import BroadcastRepository, ACTIVE_STATUSES
+from bot.handlers.admin import is_admin
+from bot.services.broadcast_service import get_broadcaster
+
+router = Router()
+router.message.filter(is_admin)
+
+
+def _parse_id(command: CommandObject) -> int:
+    return int(command.args) if command.args and command.args.strip().isdigit() else 0
+
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, session: AsyncSession):
+    """Broadcast the replied message to all users"""
+    if not message.reply_to_message:
+        await message.answer("Yubormoqchi bo'lgan xabarga /broadcast deb javob yozing.")
+        return
+
+    broadcast = await BroadcastRepository(session).create(
+        created_by=message.from_user.id,
+        from_chat_id=message.chat.id,
+        message_id=message.reply_to_message.message_id,
+    )
+    # Background task reads the row from its own session
+    await session.commit()
+    get_broadcaster().launch(broadcast.id)
+
+    await message.answer(
+        f"📣 Xabar yuborish #{broadcast.id} boshlandi.\n"
+        f"Holat: /broadcast_status {broadcast.id}\n"
+        f"Bekor qilish: /broadcast_cancel {broadcast.id}"
+    )
+
+
+@router.message(Command("broadcast_status"))
+async def cmd_broadcast_status(message: Message, command: CommandObject, session: AsyncSession):
+    """Show broadcast progress"""
+    broadcast = await BroadcastRepository(session).get(_parse_id(command))
+    if not broadcast:
+        await message.answer("Xabar yuborish topilmadi.")
+        return
+
+    await message.answer(
+        f"📊 #{broadcast.id}: {broadcast.status}\n"
+        f"✅ Yuborildi: {broadcast.total_sent}\n"
+        f"🚫 Bloklagan: {broadcast.total_blocked}\n"
+        f"⚠️ Xatolik: {broadcast.total_failed}"
+    )
+
+
+@router.message(Command("broadcast_cancel"))
+async def cmd_broadcast_cancel(message: Message, command: CommandObject, session: AsyncSession):
+    """Cancel broadcast (stops after the current page)"""
+    repo = BroadcastRepository(session)
+    broadcast = await repo.get(_parse_id(command))
+    if not broadcast or broadcast.status not in ACTIVE_STATUSES:
+        await message.answer("Faol xabar yuborish topilmadi.")
+        return
+
+    await repo.finish(broadcast.id, status="cancelled")
+    await message.answer(f"🛑 Xabar yuborish #{broadcast.id} bekor qilindi.")
@@ -0,0 +1,66 @@
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from bot.database.session import get_engine, get_replica_engine, get_replica_router
+from bot.handlers.admin import is_admin
+from bot.middlewares.outbound import get_outbound_scheduler
+
+router = Router()
+router.message.filter(is_admin)
+
+
+@router.message(Command("outbound_stats"))
+async def cmd_outbound_stats(message: Message):
+    """Show outbound scheduler queue depth and wait times"""
+    stats = get_outbound_scheduler().stats()
+    lines = [
+        f"<b>{lane}</b>: navbatda {data['queued']}, so'rovlar {data['requests']}, "
+        f"kutish avg {data['avg_wait_ms']}ms / p95 {data['p95_wait_ms']}ms / max {data['max_wait_ms']}ms"
+        for lane, data in stats["lanes"].items()
+    ]
+    lines.append(f"Flood wait: {stats['flood_waits']}, qayta urinish: {stats['retries']}")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("db_stats"))
+async def cmd_db_stats(message: Message):
+    """Show connection pools and read replica routing"""
+    replica_engine = get_replica_engine()
+    lines = [f"<b>primary</b>: {get_engine().pool.status()}"]
+    if replica_engine is None:
+        lines.append("Replica sozlanmagan")
+    else:
+        stats = get_replica_router().stats()
+        lag = "-" if stats["lag"] is None else f"{stats['lag']:.1f}s"
+        lines.append(f"<b>replica</b>: {replica_engine.pool.status()}")
+        lines.append(
+            f"Holati: {'ishlayapti' if stats['healthy'] else 'primary ishlatilmoqda'}, lag {lag}, "
+            f"replica'ga {stats['routed']}, primary'ga {stats['fallbacks']} so'rov"
+        )
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("membership_stats"))
+async def cmd_membership_stats(message: Message):
+    """Show chat_member write-behind and reconciliation sweep counters"""
+    from bot.services.membership_sync import get_membership_sweeper, get_membership_writer
+
+    writer, sweep = get_membership_writer().stats(), get_membership_sweeper().stats()
+    await message.answer(
+        f"<b>chat_member</b>: navbatda {writer['queued']}, yozildi {writer['written']}, "
+        f"o'tkazib yuborildi {writer['skipped']}, xato {writer['failed'] + writer['dropped']}\n"
+        f"<b>Tekshiruv</b>: {sweep['checked']} juftlik, {sweep['changed']} tasi o'zgargan"
+    )
+
+
+@router.message(Command("throttle_stats"))
+async def cmd_throttle_stats(message: Message):
+    """Show anti-flood limiter counters"""
+    from bot.services.throttler import get_throttler
+
+    stats = get_throttler().stats()
+    await message.answer(
+        f"<b>Anti-flood</b> ({'Redis' if stats['shared'] else 'xotira'}): o'tkazildi {stats['allowed']}, "
+        f"to'xtatildi {stats['throttled']}, ogohlantirish {stats['warnings']}\n"
+        f"Bucket'lar: {stats['buckets']}, Redis xatolari: {stats['redis_errors']}"
+    )
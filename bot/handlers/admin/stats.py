@@ -0,0 +1,56 @@
+import asyncio
+import os
+import tempfile
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database.session import AsyncSessionLocal
+from bot.handlers.admin import is_admin
+from bot.services.stats_service import StatsService
+
+router = Router()
+router.message.filter(is_admin)
+
+
+def _format_counts(counts: dict) -> str:
+    return ", ".join(f"{name}: {count}" for name, count in sorted(counts.items())) or "—"
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, session: AsyncSession):
+    """Show bot statistics from the daily rollups"""
+    stats = await StatsService(session).get_summary()
+
+    await message.answer(
+        f"📊 <b>Statistika</b>\n\n"
+        f"👥 Jami foydalanuvchilar: {stats['total_users']}\n"
+        f"🆕 Yangi: bugun {stats['new_users_today']}, 7 kunda {stats['new_users_week']}\n"
+        f"🔥 Faol: DAU {stats['dau']}, WAU {stats['wau']}, MAU {stats['mau']}\n\n"
+        f"💬 Bugun: {_format_counts(stats['interactions_today'])}\n"
+        f"💬 7 kunda: {_format_counts(stats['interactions_week'])}"
+    )
+
+
+@router.message(Command("report"))
+async def cmd_report(message: Message, command: CommandObject):
+    """Cohort retention, funnel and activity heatmap as PNG + HTML (/report day|week|month)"""
+    period = (command.args or "week").strip().lower()
+    if period not in ("day", "week", "month"):
+        await message.answer("Foydalanish: /report day|week|month")
+        return
+
+    await message.answer("⏳ Hisobot tayyorlanmoqda...")
+    # pandas (and pyarrow with it) loads on the first report, not at startup
+    from bot.services.report_service import ReportEngine, render_html, render_png
+
+    report = await ReportEngine(AsyncSessionLocal, period=period).run()
+
+    with tempfile.TemporaryDirectory() as directory:
+        png = await asyncio.to_thread(render_png, report, os.path.join(directory, "report.png"))
+        html = await asyncio.to_thread(render_html, report, os.path.join(directory, "report.html"))
+        await message.answer_photo(
+            FSInputFile(png),
+            caption=f"📈 {report.users} foydalanuvchi, {report.interactions} interaksiya ({report.elapsed:.1f}s)",
+        )
+        await message.answer_document(FSInputFile(html))
@@ -0,0 +1 @@
+"""Channel handlers"""
\ No newline at end of file
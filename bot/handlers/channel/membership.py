@@ -0,0 +1,38 @@
+from aiogram import Router
+from aiogram.types import ChatMemberUpdated
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database.repositories.channel_repository import ChannelRepository
+from bot.services.membership_cache import get_membership_cache
+from bot.services.membership_sync import MembershipChange, get_membership_writer
+from bot.services.subscription_service import NOT_MEMBER_STATUSES
+from bot.utils.cache import TTLCache
+
+router = Router()
+
+# (bot id, Telegram chat id) -> channels.id, 0 for chats that are not required channels of the bot
+_channel_ids = TTLCache(max_size=1_000)
+CHANNEL_ID_TTL = 60
+
+
+async def _required_channel_id(session: AsyncSession, chat_id: int) -> int:
+    repo = ChannelRepository(session)
+    channel_id = _channel_ids.get((repo.bot_id, chat_id))
+    if channel_id is None:
+        channel = await repo.get_by_id(chat_id)
+        channel_id = channel.id if channel is not None and channel.is_active else 0
+        _channel_ids.set((repo.bot_id, chat_id), channel_id, CHANNEL_ID_TTL)
+    return channel_id
+
+
+@router.chat_member()
+async def on_chat_member(event: ChatMemberUpdated, session: AsyncSession):
+    """Record a join or leave in a required channel"""
+    channel_id = await _required_channel_id(session, event.chat.id)
+    if not channel_id:
+        return
+
+    user_id = event.new_chat_member.user.id
+    is_member = event.new_chat_member.status not in NOT_MEMBER_STATUSES
+    # Checks see the change right away, the row is written with the next batch
+    await get_membership_cache().set(user_id, event.chat.id, is_member)
+    await get_membership_writer().submit(MembershipChange(user_id, channel_id, is_member, event.date))
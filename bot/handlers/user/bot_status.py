@@ -0,0 +1,28 @@
+from aiogram import Router, F
+from aiogram.enums import ChatType
+from aiogram.filters import ChatMemberUpdatedFilter, KICKED, MEMBER
+from aiogram.types import ChatMemberUpdated
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.services.user_service import UserService
+
+router = Router()
+router.my_chat_member.filter(F.chat.type == ChatType.PRIVATE)
+
+
+@router.my_chat_member(ChatMemberUpdatedFilter(KICKED))
+async def on_bot_blocked(event: ChatMemberUpdated, session: AsyncSession):
+    """User blocked the bot"""
+    await UserService(session).mark_blocked(event.from_user.id)
+
+
+@router.my_chat_member(ChatMemberUpdatedFilter(MEMBER))
+async def on_bot_unblocked(event: ChatMemberUpdated, session: AsyncSession):
+    """User unblocked (or started) the bot: back among broadcast recipients"""
+    user = event.from_user
+    await UserService(session).get_or_create_user(
+        telegram_id=user.id,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        language_code=user.language_code,
+    )
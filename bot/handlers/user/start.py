@@ -1,30 +1,29 @@
 from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.services.user_service import UserService
-from bot.database.session import AsyncSessionLocal
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, session: AsyncSession):
     """Handle /start command"""
-    async with AsyncSessionLocal() as session:
-        user_service = UserService(session)
-        
-        # Get or create user
-        user = await user_service.get_or_create_user(
-            telegram_id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-            language_code=message.from_user.language_code,
-        )
-        
-        welcome_text = (
-            f"👋 Assalomu alaykum, {message.from_user.first_name}!\n\n"
-            f"Botimizga xush kelibsiz!"
-        )
-        
-        await message.answer(welcome_text)
\ No newline at end of file
+    user_service = UserService(session)
+
+    # Register user (returning users with unchanged profile skip the DB)
+    await user_service.ensure_user(
+        telegram_id=message.from_user.id,
+        username=message.from_user.username,
+        first_name=message.from_user.first_name,
+        last_name=message.from_user.last_name,
+        language_code=message.from_user.language_code,
+    )
+
+    welcome_text = (
+        f"👋 Assalomu alaykum, {message.from_user.first_name}!\n\n"
+        f"Botimizga xush kelibsiz!"
+    )
+
+    await message.answer(welcome_text)
@@ -0,0 +1,54 @@
+from typing import Optional
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.config.settings import settings
+from bot.keyboards.inline import get_subscription_keyboard
+from bot.middlewares.subscription import SUBSCRIPTION_PROMPT
+from bot.services.subscription_service import SubscriptionService
+from bot.utils.cache import TTLCache
+
+router = Router()
+
+# (bot id, user id) of users who pressed the button within the cooldown
+_recent_checks = TTLCache(max_size=100_000)
+
+
+async def _edit_prompt(callback: CallbackQuery, text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> None:
+    """Replace the prompt in place, send a new message if it can no longer be edited"""
+    if isinstance(callback.message, Message):
+        try:
+            await callback.message.edit_text(text, reply_markup=reply_markup)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in e.message:
+                return
+    await callback.bot.send_message(callback.from_user.id, text, reply_markup=reply_markup)
+
+
+@router.callback_query(F.data == "check_subscription")
+async def check_subscription(callback: CallbackQuery, session: AsyncSession):
+    """Re-check the channels from the prompt and update it"""
+    user_id = callback.from_user.id
+    if _recent_checks.get((callback.bot.id, user_id)) is not None:
+        await callback.answer("⏳ Biroz kuting va qayta urinib ko'ring")
+        return
+    _recent_checks.set((callback.bot.id, user_id), True, settings.SUBSCRIPTION_RECHECK_COOLDOWN)
+
+    subscription_service = SubscriptionService(session, callback.bot)
+    previous = subscription_service.failed_channel_ids(user_id)
+    missing = await subscription_service.recheck_failed(user_id)
+
+    if not missing:
+        await _edit_prompt(callback, "✅ Rahmat! Endi botdan foydalanishingiz mumkin.", None)
+        await callback.answer()
+        return
+
+    if previous is not None and {channel.id for channel in missing} == previous:
+        # Nothing changed, keep the prompt as it is
+        await callback.answer("❗️ Hali barcha kanallarga obuna bo'lmadingiz", show_alert=True)
+        return
+
+    await _edit_prompt(callback, SUBSCRIPTION_PROMPT, get_subscription_keyboard(missing))
+    await callback.answer()
@@ -1,14 +1,17 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
+from typing import List, Optional, Sequence, Tuple
+from aiogram import BaseMiddleware, Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from bot.config.settings import settings
-from bot.database.session import init_db
-from bot.handlers.user import start, common
-from bot.middlewares.analytics import AnalyticsMiddleware
-from bot.middlewares.subscription import SubscriptionMiddleware
+
+# Everything else is imported by the factories below: importing this module
+# (workers do, to find the factories) reads no settings and opens nothing
 
 # Configure logging
 logging.basicConfig(
@@ -18,38 +21,209 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Main function to start the bot"""
-    
-    # Initialize database
-    logger.info("Initializing database...")
-    await init_db()
-    
-    # Initialize bot and dispatcher
-    bot = Bot(
-        token=settings.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+def create_bots(tokens: Sequence[str], session: Optional[BaseSession] = None) -> List[Bot]:
+    """
+    One Bot per token over one session (aiohttp by default, benchmarks pass a fake one):
+    the bots share its connector and request middlewares
+    """
+    from bot.middlewares.metrics import ApiMetricsMiddleware
+    from bot.middlewares.outbound import get_outbound_scheduler
+    from bot.middlewares.profiling import ApiTraceMiddleware
+
+    if session is None:
+        if settings.TELEGRAM_API_URL:
+            session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+        else:
+            session = AiohttpSession()
+    if settings.METRICS_ENABLED:
+        # Outermost, so the time includes scheduler waits and retries
+        session.middleware(ApiMetricsMiddleware())
+    if settings.PROFILING_ENABLED:
+        session.middleware(ApiTraceMiddleware())
+    # Every outbound API call is paced by the shared scheduler (limits are kept per bot)
+    session.middleware(get_outbound_scheduler())
+
+    default = DefaultBotProperties(parse_mode=ParseMode.HTML)
+    return [Bot(token=token, session=session, default=default) for token in tokens]
+
+
+def create_bot(session: Optional[BaseSession] = None) -> Bot:
+    """Create Bot instance of BOT_TOKEN"""
+    return create_bots([settings.BOT_TOKEN], session)[0]
+
+
+def instrumented(middleware: BaseMiddleware) -> BaseMiddleware:
+    """Wrap a middleware for metrics and tracing, whichever is enabled"""
+    from bot.middlewares.metrics import TimedMiddleware
+    from bot.middlewares.profiling import TracedMiddleware
+
+    name = type(middleware).__name__
+    if settings.PROFILING_ENABLED:
+        middleware = TracedMiddleware(middleware, name)
+    if settings.METRICS_ENABLED:
+        middleware = TimedMiddleware(middleware, name)
+    return middleware
+
+
+def create_dispatcher() -> Dispatcher:
+    """Create Dispatcher with middlewares and routers"""
+    from bot.database.session import AsyncSessionLocal, close_db, start_replica_router, stop_replica_router
+    from bot.handlers.admin import broadcast, monitoring, stats
+    from bot.handlers.channel import membership
+    from bot.handlers.user import bot_status, common, start, subscription
+    from bot.middlewares.analytics import AnalyticsMiddleware
+    from bot.middlewares.database import DatabaseMiddleware
+    from bot.middlewares.metrics import HandlerMetricsMiddleware, UpdateMetricsMiddleware
+    from bot.middlewares.profiling import HandlerTraceMiddleware, ProfilingMiddleware
+    from bot.middlewares.subscription import SubscriptionMiddleware
+    from bot.middlewares.tenant import TenantMiddleware
+    from bot.middlewares.throttling import ThrottlingMiddleware
+    from bot.runtime.metrics import get_metrics_server
+    from bot.services.analytics_writer import get_analytics_writer
+    from bot.services.broadcast_service import get_broadcaster
+    from bot.services.membership_sync import get_membership_sweeper, get_membership_writer
+    from bot.services.partition_manager import get_partition_manager
+    from bot.services.throttler import get_throttler
+    from bot.services.user_service import warm_up_known_users
+    from bot.utils.redis_client import close_redis
+    from bot.utils.stack_sampler import StackSampler
+    from bot.utils.tracing import TraceWriter
+
     dp = Dispatcher()
-    
+    analytics_writer = get_analytics_writer()
+    partition_manager = get_partition_manager()
+    broadcaster = get_broadcaster()
+
+    # Analytics writer runs for the whole dispatcher lifetime and drains on shutdown
+    dp.startup.register(analytics_writer.start)
+    dp.shutdown.register(analytics_writer.stop)
+    if settings.KNOWN_USERS_WARMUP:
+        dp.startup.register(warm_up_known_users)
+    # Creates upcoming user_interactions partitions and archives expired ones
+    dp.startup.register(partition_manager.start)
+    dp.shutdown.register(partition_manager.stop)
+    # Resumes unfinished broadcasts; stops them at a page checkpoint on shutdown
+    dp.startup.register(broadcaster.start)
+    dp.shutdown.register(broadcaster.stop)
+    if settings.MEMBERSHIP_TRACKING:
+        # Batched upserts of chat_member changes, slow re-check of old statuses
+        membership_writer, membership_sweeper = get_membership_writer(), get_membership_sweeper()
+        dp.startup.register(membership_writer.start)
+        dp.shutdown.register(membership_writer.stop)
+        dp.startup.register(membership_sweeper.start)
+        dp.shutdown.register(membership_sweeper.stop)
+    # Replica health and lag checks, no-op without REPLICA_HOST
+    dp.startup.register(start_replica_router)
+    dp.shutdown.register(stop_replica_router)
+
     # Register middlewares
-    dp.message.middleware(AnalyticsMiddleware())
-    dp.message.middleware(SubscriptionMiddleware())
-    
+    # First of all: the update, its queries and caches belong to the bot that received it
+    dp.update.outer_middleware(TenantMiddleware())
+    if settings.PROFILING_ENABLED:
+        dp.update.outer_middleware(ProfilingMiddleware(
+            TraceWriter(
+                settings.PROFILING_TRACE_FILE,
+                max_bytes=settings.PROFILING_TRACE_MAX_BYTES,
+                backup_count=settings.PROFILING_TRACE_BACKUPS,
+            ),
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            slow_threshold=settings.PROFILING_SLOW_THRESHOLD,
+        ))
+        if settings.PROFILING_STACK_SAMPLER:
+            sampler = StackSampler(settings.PROFILING_STACK_FILE, interval=settings.PROFILING_STACK_INTERVAL)
+            dp.startup.register(sampler.start)
+            dp.shutdown.register(sampler.stop)
+    if settings.METRICS_ENABLED:
+        metrics_server = get_metrics_server()
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+    if settings.THROTTLE_ENABLED:
+        # Floods are dropped here, before the session, analytics and subscription checks
+        dp.update.outer_middleware(instrumented(ThrottlingMiddleware(get_throttler())))
+    dp.update.outer_middleware(instrumented(DatabaseMiddleware(AsyncSessionLocal)))
+    dp.message.middleware(instrumented(AnalyticsMiddleware(analytics_writer)))
+    dp.message.middleware(instrumented(SubscriptionMiddleware()))
+    # Registered last, so they are the innermost and wrap only the handler
+    inner = []
+    if settings.METRICS_ENABLED:
+        inner.append(HandlerMetricsMiddleware())
+    if settings.PROFILING_ENABLED:
+        inner.append(HandlerTraceMiddleware())
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            for middleware in inner:
+                observer.middleware(middleware)
+
     # Register handlers
+    dp.include_router(broadcast.router)
+    dp.include_router(monitoring.router)
+    dp.include_router(stats.router)
     dp.include_router(start.router)
+    dp.include_router(bot_status.router)
+    dp.include_router(subscription.router)
     dp.include_router(common.router)
-    
+    if settings.MEMBERSHIP_TRACKING:
+        # Also adds chat_member to allowed_updates (Telegram does not send it by default)
+        dp.include_router(membership.router)
+
+    # Last shutdown hooks, after everything that still writes or checks limits
+    dp.shutdown.register(close_redis)
+    dp.shutdown.register(close_db)
+
+    return dp
+
+
+def create_app(session: Optional[BaseSession] = None) -> Tuple[Bot, Dispatcher]:
+    """Application factory: Bot and Dispatcher, engines are created on first use"""
+    return create_bot(session), create_dispatcher()
+
+
+async def main():
+    """Main function to start the bot"""
+    from bot.database.session import close_db, init_db
+    from bot.runtime.polling import run_polling
+    from bot.runtime.webhook import run_webhook
+    from bot.runtime.workers import run_workers
+    from bot.services.analytics_writer import get_analytics_writer
+
+    # Initialize database
+    logger.info("Initializing database (%s)...", "SQLite" if settings.USE_SQLITE else "PostgreSQL")
+    await init_db()
+
+    tokens = settings.bot_tokens
+    if settings.RUN_MODE == "workers" and len(tokens) > 1:
+        raise SystemExit("RUN_MODE=workers hosts a single bot, use polling or webhook for BOT_TOKENS")
+
+    # Initialize bots and dispatcher: one session, one DB pool and one dispatcher for all of them
+    bots = create_bots(tokens)
+    dp = create_dispatcher()
+
     # Start bot
-    logger.info("Bot started successfully!")
+    logger.info("Bot started successfully! Mode: %s, bots: %s", settings.RUN_MODE, len(bots))
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if settings.RUN_MODE == "webhook":
+            await run_webhook(bots, dp)
+        elif settings.RUN_MODE == "workers":
+            # This process only polls, every worker builds its own dispatcher
+            await bots[0].delete_webhook()
+            await run_workers(bots[0], dp.resolve_used_update_types())
+        else:
+            await run_polling(bots, dp)
     finally:
-        await bot.session.close()
+        await get_analytics_writer().stop()
+        await bots[0].session.close()
+        await close_db()
 
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
-    except (KeyboardInterrupt, SystemExit):
-        logger.info("Bot stopped!")
\ No newline at end of file
+    except KeyboardInterrupt:
+        logger.info("Bot stopped!")
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            # Configuration error: show it and exit non-zero
+            logger.error(e.code)
+            raise SystemExit(1)
+        logger.info("Bot stopped!")
@@ -0,0 +1,37 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+
+class DatabaseMiddleware(BaseMiddleware):
+    """
+    Unit of work per update: one session is shared by middlewares,
+    handlers and services through data["session"] and committed once
+
+    The session begins lazily, so updates that never query the DB
+    never check out a pooled connection
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Open session, call handler, commit if anything was done"""
+        async with self.session_factory() as session:
+            data["session"] = session
+            user = data.get("event_from_user")
+            if user is not None:
+                # Read-your-writes routing when a replica is configured
+                session.info["user_id"] = user.id
+            result = await handler(event, data)
+
+            if session.in_transaction():
+                await session.commit()
+
+            return result
@@ -0,0 +1,133 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from bot.utils.metrics import (
+    API_ERRORS,
+    API_SECONDS,
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    MIDDLEWARE_SECONDS,
+    UPDATE_SECONDS,
+    LabelCache,
+)
+
+
+def handler_name(handler: HandlerObject) -> str:
+    """module.function of a handler, e.g. start.cmd_start"""
+    callback = handler.callback
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'handler')}"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer update middleware: total processing time per update type"""
+
+    def __init__(self):
+        self._seconds = LabelCache(UPDATE_SECONDS)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self._seconds(event.event_type).observe(time.perf_counter() - started)
+
+
+class TimedMiddleware(BaseMiddleware):
+    """
+    Wraps another middleware and records its own time
+
+    Time spent further down the chain (inner middlewares, handler) is
+    subtracted, so a slow handler does not show up as a slow middleware
+    """
+
+    def __init__(self, middleware: BaseMiddleware, name: str = ""):
+        self.middleware = middleware
+        self._seconds = MIDDLEWARE_SECONDS.labels(name or type(middleware).__name__)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        downstream = 0.0
+
+        async def timed_handler(event: TelegramObject, data: Dict[str, Any]) -> Any:
+            nonlocal downstream
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            self._seconds.observe(time.perf_counter() - started - downstream)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Innermost middleware: handler time and errors, labelled module.function"""
+
+    def __init__(self):
+        self._seconds = LabelCache(HANDLER_SECONDS)
+        self._errors = LabelCache(HANDLER_ERRORS)
+        self._names: Dict[int, str] = {}
+
+    def _name(self, handler: HandlerObject) -> str:
+        name = self._names.get(id(handler))
+        if name is None:
+            name = self._names[id(handler)] = handler_name(handler)
+        return name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = self._name(data["handler"])
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self._errors(name, type(e).__name__).inc()
+            raise
+        finally:
+            self._seconds(name).observe(time.perf_counter() - started)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot API request middleware: call time and errors per method"""
+
+    def __init__(self):
+        self._seconds = LabelCache(API_SECONDS)
+        self._errors = LabelCache(API_ERRORS)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self._errors(name, type(e).__name__).inc()
+            raise
+        finally:
+            self._seconds(name).observe(time.perf_counter() - started)
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from bot.config.settings import settings
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import OUTBOUND_WAIT_SECONDS
+from bot.utils.rate_limit import PriorityTokenBucket, TokenBucket
+from bot.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Methods that deliver a message and count against Telegram's global and per-chat limits
+MESSAGE_METHODS = frozenset({
+    "copyMessage",
+    "copyMessages",
+    "forwardMessage",
+    "forwardMessages",
+})
+
+CHAT_BUCKET_IDLE_TTL = 120
+
+
+class Priority(IntEnum):
+    """Outbound lanes, lower goes first"""
+    INTERACTIVE = 0  # replies to the user who is waiting
+    BULK = 1  # broadcasts, background sweeps
+
+
+_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def use_priority(priority: Priority) -> Iterator[None]:
+    """Send requests made inside the block (and tasks started there) through `priority` lane"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _is_message_method(name: str) -> bool:
+    return name in MESSAGE_METHODS or (name.startswith("send") and name != "sendChatAction")
+
+
+class LaneStats:
+    """Request count and queueing delay for one priority lane"""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, wait: float) -> None:
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent.append(wait)
+
+    def as_dict(self) -> Dict[str, float]:
+        recent = sorted(self._recent)
+        return {
+            "requests": self.requests,
+            "avg_wait_ms": round(1000 * self.total_wait / self.requests, 2) if self.requests else 0.0,
+            "p95_wait_ms": round(1000 * recent[int(len(recent) * 0.95) - 1], 2) if recent else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 2),
+        }
+
+
+class BotLimits:
+    """Global and per-method buckets of one bot token"""
+
+    def __init__(self, global_rate: float, global_burst: int, method_limits: Dict[str, Tuple[float, int]]):
+        self.global_bucket = PriorityTokenBucket(global_rate, global_burst)
+        self.methods = {
+            name: PriorityTokenBucket(rate, burst)
+            for name, (rate, burst) in method_limits.items()
+        }
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Bot API request middleware that paces every outbound call
+
+    Telegram's limits are per token, so every bot gets its own buckets:
+    message sends share the bot's global bucket (served by priority lane)
+    and a per-chat bucket; methods listed in `method_limits` get a bucket of
+    their own. retry_after pauses the bucket that tripped and the call is retried:
+    always for the bulk lane, once and only for short waits for interactive
+    calls, so a user is never left hanging on a long flood wait.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        global_burst: int = 30,
+        private_chat_rate: float = 1.0,
+        group_chat_rate: float = 20 / 60,
+        chat_burst: int = 3,
+        method_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+        max_interactive_retry_after: float = 5.0,
+        max_bulk_retries: int = 5,
+    ):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.method_limits = method_limits or {}
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.chat_burst = chat_burst
+        self.max_interactive_retry_after = max_interactive_retry_after
+        self.max_bulk_retries = max_bulk_retries
+
+        self._bots: Dict[int, BotLimits] = {}
+        # (bot id, chat id) -> bucket
+        self._chats = TTLCache(max_size=100_000)
+
+        self._lanes = {priority: LaneStats() for priority in Priority}
+        self._wait_seconds = {priority: OUTBOUND_WAIT_SECONDS.labels(priority.name.lower()) for priority in Priority}
+        self.flood_waits = 0
+        self.retries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait times per lane, for tuning the limits"""
+        waiting: Dict[Priority, int] = {}
+        for limits in self._bots.values():
+            for bucket in (limits.global_bucket, *limits.methods.values()):
+                for priority, count in bucket.waiting().items():
+                    waiting[priority] = waiting.get(priority, 0) + count
+
+        return {
+            "lanes": {
+                priority.name.lower(): {"queued": waiting.get(priority, 0), **lane.as_dict()}
+                for priority, lane in self._lanes.items()
+            },
+            "bots": len(self._bots),
+            "chat_buckets": len(self._chats),
+            "flood_waits": self.flood_waits,
+            "retries": self.retries,
+        }
+
+    def _limits(self, bot: Bot) -> BotLimits:
+        limits = self._bots.get(bot.id)
+        if limits is None:
+            limits = self._bots[bot.id] = BotLimits(self.global_rate, self.global_burst, self.method_limits)
+        return limits
+
+    def _chat_bucket(self, bot: Bot, chat_id: Any) -> TokenBucket:
+        key = (bot.id, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(
+                rate=self.private_chat_rate if private else self.group_chat_rate,
+                capacity=self.chat_burst,
+            )
+        # Idle chats fall out, their bucket would be full again by then anyway
+        self._chats.set(key, bucket, CHAT_BUCKET_IDLE_TTL)
+        return bucket
+
+    async def _wait_turn(
+        self,
+        limits: BotLimits,
+        name: str,
+        chat_bucket: Optional[TokenBucket],
+        priority: Priority,
+    ) -> None:
+        started = time.monotonic()
+        with span("scheduler wait", "outbound", lane=priority.name.lower()):
+            if chat_bucket is not None:
+                await chat_bucket.acquire()
+                await limits.global_bucket.acquire(priority)
+            method_bucket = limits.methods.get(name)
+            if method_bucket is not None:
+                await method_bucket.acquire(priority)
+        wait = time.monotonic() - started
+        self._lanes[priority].observe(wait)
+        self._wait_seconds[priority].observe(wait)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        priority = _priority.get()
+        limits = self._limits(bot)
+        chat_bucket = None
+        if _is_message_method(name):
+            chat_id = getattr(method, "chat_id", None)
+            chat_bucket = self._chat_bucket(bot, chat_id) if chat_id is not None else None
+
+        attempt = 0
+        while True:
+            await self._wait_turn(limits, name, chat_bucket, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.flood_waits += 1
+                paused = self._pause(limits, name, chat_bucket, e.retry_after)
+
+                attempt += 1
+                if priority == Priority.BULK:
+                    if attempt > self.max_bulk_retries:
+                        raise
+                elif attempt > 1 or e.retry_after > self.max_interactive_retry_after:
+                    raise
+
+                logger.warning("%s flood wait %ss, retrying (%s lane)", name, e.retry_after, priority.name.lower())
+                self.retries += 1
+                if not paused:
+                    # Paused buckets hold the retry back themselves
+                    await asyncio.sleep(e.retry_after)
+
+    def _pause(self, limits: BotLimits, name: str, chat_bucket: Optional[TokenBucket], seconds: float) -> bool:
+        """Pause the buckets this call goes through, False if it goes through none"""
+        paused = False
+        if chat_bucket is not None:
+            chat_bucket.pause(seconds)
+            limits.global_bucket.pause(seconds)
+            paused = True
+        method_bucket = limits.methods.get(name)
+        if method_bucket is not None:
+            method_bucket.pause(seconds)
+            paused = True
+        return paused
+
+
+@lru_cache(maxsize=None)
+def get_outbound_scheduler() -> OutboundScheduler:
+    """Scheduler installed on the shared Bot API session"""
+    return OutboundScheduler(
+        global_rate=settings.OUTBOUND_GLOBAL_RATE,
+        global_burst=settings.OUTBOUND_GLOBAL_BURST,
+        private_chat_rate=settings.OUTBOUND_PRIVATE_CHAT_RATE,
+        group_chat_rate=settings.OUTBOUND_GROUP_CHAT_RATE,
+        chat_burst=settings.OUTBOUND_CHAT_BURST,
+        method_limits={
+            "getChatMember": (settings.GET_CHAT_MEMBER_RATE, settings.GET_CHAT_MEMBER_BURST),
+        },
+        max_interactive_retry_after=settings.FLOOD_WAIT_MAX_RETRY,
+        max_bulk_retries=settings.OUTBOUND_BULK_MAX_RETRIES,
+    )
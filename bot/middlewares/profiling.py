@@ -0,0 +1,99 @@
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from bot.middlewares.metrics import handler_name
+from bot.utils.tracing import TraceWriter, finish_trace, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Outermost update middleware: traces every update, keeps a sample
+
+    Every update gets a span tree (cheap, a few objects per span); it is
+    written out when the update was slower than `slow_threshold` seconds or
+    was picked by `sample_rate`, and dropped otherwise.
+    """
+
+    def __init__(self, writer: TraceWriter, sample_rate: float = 0.0, slow_threshold: float = 1.0):
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.slow = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        root, token = start_trace(f"update {event.update_id} ({event.event_type})", update_id=event.update_id)
+        try:
+            return await handler(event, data)
+        finally:
+            finish_trace(root, token)
+            elapsed = root.end - root.start
+            slow = elapsed >= self.slow_threshold
+            if slow or random.random() < self.sample_rate:
+                root.args["slow"] = slow
+                try:
+                    self.writer.write(root, tid=event.update_id)
+                except Exception:
+                    logger.exception("Failed to write trace of update %s", event.update_id)
+            if slow:
+                self.slow += 1
+                logger.warning("Slow update %s: %.0fms", event.update_id, elapsed * 1000)
+
+
+class TracedMiddleware(BaseMiddleware):
+    """Wraps another middleware in a span, everything below it nests inside"""
+
+    def __init__(self, middleware: BaseMiddleware, name: str = ""):
+        self.middleware = middleware
+        self.name = name or type(middleware).__name__
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with span(self.name, "middleware"):
+            return await self.middleware(handler, event, data)
+
+
+class HandlerTraceMiddleware(BaseMiddleware):
+    """Innermost middleware: the handler's own span"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with span(handler_name(data["handler"]), "handler"):
+            return await handler(event, data)
+
+
+class ApiTraceMiddleware(BaseRequestMiddleware):
+    """Bot API calls made inside a traced update become spans"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with span(method.__api_method__, "api") as api_span:
+            try:
+                return await make_request(bot, method)
+            except Exception as e:
+                if api_span is not None:
+                    api_span.args = {"error": type(e).__name__}
+                raise
@@ -0,0 +1,22 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from bot.database.tenancy import use_bot
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Outermost update middleware: everything done for the update (queries,
+    caches, background tasks started by handlers) belongs to the bot that
+    received it
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Call handler scoped to data["bot"]"""
+        with use_bot(data["bot"].id):
+            return await handler(event, data)
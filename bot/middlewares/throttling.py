@@ -0,0 +1,62 @@
+import logging
+import math
+from typing import Callable, Dict, Any, Awaitable, Optional
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+from bot.config.settings import settings
+from bot.services.throttler import ThrottleDecision, Throttler
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_WARNING = "⏳ Juda ko'p so'rov yubordingiz. {seconds} soniyadan keyin qayta urinib ko'ring."
+
+
+def command_name(text: Optional[str]) -> Optional[str]:
+    """'/start@bot arg' -> '/start', None for plain text"""
+    if not text or not text.startswith("/"):
+        return None
+    return text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: drops messages and button presses of users
+    over the limit before a DB session is opened, with an occasional
+    'slow down' reply
+    """
+
+    def __init__(self, throttler: Throttler):
+        self.throttler = throttler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Check the user's limits and call handler or drop the update"""
+        user = data.get("event_from_user")
+        # Channel posts, chat_member changes etc. are not user floods
+        if user is None or user.id == settings.ADMIN_USER_ID or (event.message is None and event.callback_query is None):
+            return await handler(event, data)
+
+        command = command_name(event.message.text) if event.message is not None else None
+        decision = await self.throttler.check(user.id, command)
+        if decision.allowed:
+            return await handler(event, data)
+
+        if decision.warn or event.callback_query is not None:
+            await self._refuse(event, decision)
+        return None
+
+    async def _refuse(self, event: Update, decision: ThrottleDecision) -> None:
+        """Warn the user if due; dropped button presses are always answered, or they keep loading"""
+        text = THROTTLE_WARNING.format(seconds=max(1, math.ceil(decision.retry_after))) if decision.warn else None
+        try:
+            if event.message is not None:
+                await event.message.answer(text)
+            else:
+                await event.callback_query.answer(text)
+        except TelegramAPIError as e:
+            logger.debug("Throttle answer not sent: %s", e)
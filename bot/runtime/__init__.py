@@ -0,0 +1 @@
+"""Runtime modules"""
\ No newline at end of file
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Set, Tuple
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from bot.utils.metrics import UPDATE_KEY_CONTENDED, UPDATE_WAIT_SECONDS, UPDATES_IN_FLIGHT, UPDATES_QUEUED
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry a chat (or at least a user) to partition by
+CHAT_UPDATE_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "my_chat_member", "chat_member", "chat_join_request",
+    "message_reaction", "message_reaction_count", "chat_boost", "removed_chat_boost",
+)
+USER_UPDATE_FIELDS = (
+    "inline_query", "chosen_inline_result", "shipping_query",
+    "pre_checkout_query", "poll_answer",
+)
+
+
+def extract_chat_id(update: Dict[str, Any]) -> int:
+    """Chat (or user) an update belongs to, update_id if there is none"""
+    for name in CHAT_UPDATE_FIELDS:
+        event = update.get(name)
+        if event and "chat" in event:
+            return event["chat"]["id"]
+
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        if message and "chat" in message:
+            return message["chat"]["id"]
+        return callback["from"]["id"]
+
+    for name in USER_UPDATE_FIELDS:
+        event = update.get(name)
+        if event:
+            user = event.get("from") or event.get("user")
+            if user:
+                return user["id"]
+
+    return update["update_id"]
+
+
+async def feed_update(dp: Dispatcher, bot: Bot, update: Dict[str, Any]) -> None:
+    """Run one raw update through the dispatcher, logging instead of raising"""
+    try:
+        result = await dp.feed_raw_update(bot, update)
+        if isinstance(result, TelegramMethod):
+            await dp.silent_call_request(bot=bot, result=result)
+    except Exception:
+        logger.exception("Failed to process update id=%s", update.get("update_id"))
+
+
+class KeyedExecutor:
+    """
+    Runs updates concurrently, one at a time per key (chat or user)
+
+    Every busy key has a FIFO of its accepted updates drained by one task,
+    so a chat's updates apply in order while a slow one never holds up
+    other chats. At most `concurrency` updates run at once and at most
+    `max_pending` are accepted but unfinished: submit() waits for room,
+    try_submit() refuses. A key is dropped as soon as its FIFO is empty,
+    so memory follows the chats that are busy right now, not every chat
+    ever seen.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        concurrency: int = 64,
+        max_pending: int = 1000,
+        metrics: bool = False,
+    ):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.metrics = metrics
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._room = asyncio.Event()
+        self._room.set()
+        self._keys: Dict[Hashable, Deque[Tuple[Any, float]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.pending = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.contended = 0
+        self.key_wait = 0.0
+        self.slot_wait = 0.0
+        self.max_wait = 0.0
+
+        self._wait_metrics = (UPDATE_WAIT_SECONDS.labels("key"), UPDATE_WAIT_SECONDS.labels("slot"))
+        if metrics:
+            UPDATES_IN_FLIGHT.set_function(lambda: self.in_flight)
+            UPDATES_QUEUED.set_function(lambda: self.pending - self.in_flight)
+
+    def stats(self) -> Dict[str, Any]:
+        """Executor counters for monitoring"""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.pending - self.in_flight,
+            "busy_keys": len(self._keys),
+            "processed": self.processed,
+            "contended": self.contended,
+            "avg_key_wait_ms": round(1000 * self.key_wait / self.processed, 2) if self.processed else 0.0,
+            "avg_slot_wait_ms": round(1000 * self.slot_wait / self.processed, 2) if self.processed else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 2),
+        }
+
+    async def submit(self, key: Hashable, item: Any) -> None:
+        """Accept item for key, waiting while max_pending items are unfinished"""
+        while self.pending >= self.max_pending:
+            await self._room.wait()
+        self._accept(key, item)
+
+    def try_submit(self, key: Hashable, item: Any) -> bool:
+        """Accept item for key, False if max_pending items are unfinished"""
+        if self.pending >= self.max_pending:
+            return False
+        self._accept(key, item)
+        return True
+
+    async def join(self) -> None:
+        """Wait until everything accepted so far has finished"""
+        await self._idle.wait()
+
+    def _accept(self, key: Hashable, item: Any) -> None:
+        self.pending += 1
+        self._idle.clear()
+        if self.pending >= self.max_pending:
+            self._room.clear()
+
+        queue = self._keys.get(key)
+        if queue is None:
+            queue = self._keys[key] = deque()
+            task = asyncio.create_task(self._drain(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            # An earlier update of this chat is queued or running
+            self.contended += 1
+            if self.metrics:
+                UPDATE_KEY_CONTENDED.inc()
+        queue.append((item, time.perf_counter()))
+
+    async def _drain(self, key: Hashable, queue: Deque[Tuple[Any, float]]) -> None:
+        try:
+            while queue:
+                item, accepted = queue.popleft()
+                ready = time.perf_counter()
+                try:
+                    async with self._slots:
+                        started = time.perf_counter()
+                        self._record_wait(ready - accepted, started - ready)
+                        self.in_flight += 1
+                        try:
+                            await self.handler(item)
+                        except Exception:
+                            logger.exception("Update handler failed (key %s)", key)
+                        finally:
+                            self.in_flight -= 1
+                finally:
+                    self._finish(1)
+        finally:
+            # Cancelled with items left: they are given up
+            self._finish(len(queue))
+            del self._keys[key]
+
+    def _record_wait(self, key_wait: float, slot_wait: float) -> None:
+        self.processed += 1
+        self.key_wait += key_wait
+        self.slot_wait += slot_wait
+        self.max_wait = max(self.max_wait, key_wait + slot_wait)
+        if self.metrics:
+            self._wait_metrics[0].observe(key_wait)
+            self._wait_metrics[1].observe(slot_wait)
+
+    def _finish(self, count: int) -> None:
+        self.pending -= count
+        if self.pending < self.max_pending:
+            self._room.set()
+        if self.pending == 0:
+            self._idle.set()
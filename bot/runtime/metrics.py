@@ -0,0 +1,56 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from bot.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """
+    Serves /metrics for Prometheus on its own port
+
+    Worker processes (RUN_MODE=workers) each listen on port + 1 + index,
+    the registry is per process
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        response = web.Response(body=generate_latest(self.registry))
+        response.content_type = CONTENT_TYPE_LATEST.split(";")[0]
+        return response
+
+    async def start(self, worker_index: int = -1) -> None:
+        """Dispatcher startup hook"""
+        if self._runner is not None:
+            return
+        port = self.port + 1 + worker_index if worker_index >= 0 else self.port
+
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=self.host, port=port).start()
+        logger.info("Metrics on http://%s:%s/metrics", self.host, port)
+
+    async def stop(self) -> None:
+        """Dispatcher shutdown hook"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+@lru_cache(maxsize=None)
+def get_metrics_server() -> MetricsServer:
+    """/metrics endpoint of this process"""
+    return MetricsServer(host=settings.METRICS_HOST, port=settings.METRICS_PORT)
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Sequence
+from aiogram import Bot, Dispatcher
+from bot.config.settings import settings
+from bot.runtime.executor import KeyedExecutor, extract_chat_id, feed_update
+from bot.runtime.workers import poll_raw_updates
+
+logger = logging.getLogger(__name__)
+
+
+async def run_polling(bots: Sequence[Bot], dp: Dispatcher) -> None:
+    """
+    Long polling of every bot through one KeyedExecutor: UPDATE_CONCURRENCY
+    updates at once, one at a time per (bot, chat); polling pauses while
+    UPDATE_QUEUE_SIZE are unfinished
+    """
+    # getUpdates does not work while a webhook is set
+    for bot in bots:
+        await bot.delete_webhook()
+    executor = KeyedExecutor(
+        lambda item: feed_update(dp, *item),
+        concurrency=settings.UPDATE_CONCURRENCY,
+        max_pending=settings.UPDATE_QUEUE_SIZE,
+        metrics=settings.METRICS_ENABLED,
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    allowed_updates = dp.resolve_used_update_types()
+
+    async def poll(bot: Bot) -> None:
+        async for updates in poll_raw_updates(bot, allowed_updates):
+            for update in updates:
+                await executor.submit((bot.id, extract_chat_id(update)), (bot, update))
+
+    await dp.emit_startup(bot=bots[0], bots=bots, dispatcher=dp)
+    pollers = [asyncio.create_task(poll(bot), name=f"poller-{bot.id}") for bot in bots]
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        done, _ = await asyncio.wait({*pollers, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for poller in pollers:
+            poller.cancel()
+        stopper.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        # Updates already taken from Telegram are not resent, finish them
+        await executor.join()
+        logger.info("Polling of %s bots stopped: %s", len(bots), executor.stats())
+        await dp.emit_shutdown(bot=bots[0], bots=bots, dispatcher=dp)
@@ -0,0 +1,141 @@
+import asyncio
+import hmac
+import logging
+import signal
+from contextlib import suppress
+from typing import Any, Dict, Optional, Sequence
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from bot.config.settings import settings
+from bot.runtime.executor import KeyedExecutor, extract_chat_id, feed_update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def webhook_path(path: str, bot: Bot, bots: Sequence[Bot]) -> str:
+    """The first bot is served at `path`, every other one at `path`/<bot id>"""
+    return path if bot is bots[0] else f"{path.rstrip('/')}/{bot.id}"
+
+
+class WebhookServer:
+    """
+    Webhook receiver that answers Telegram immediately and
+    processes updates in the background, `max_in_flight` at once
+    and one at a time per (bot, chat)
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bots: Sequence[Bot],
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        max_in_flight: int = 64,
+        queue_size: int = 1000,
+    ):
+        self.dispatcher = dispatcher
+        self.bots = list(bots)
+        self.path = path
+        self.secret_token = secret_token
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+
+        self._executor: Optional[KeyedExecutor] = None
+        self.rejected = 0
+
+    def create_app(self) -> web.Application:
+        """Build aiohttp application with webhook route and lifecycle hooks"""
+        app = web.Application()
+        for bot in self.bots:
+            app.router.add_post(webhook_path(self.path, bot, self.bots), self._handler(bot))
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    def stats(self) -> Dict[str, Any]:
+        """Executor counters for monitoring"""
+        stats = self._executor.stats() if self._executor else {}
+        return {**stats, "rejected": self.rejected}
+
+    def _handler(self, bot: Bot):
+        async def handle(request: web.Request) -> web.Response:
+            return await self.handle(bot, request)
+        return handle
+
+    async def handle(self, bot: Bot, request: web.Request) -> web.Response:
+        """Accept update for bot and return 200 before it is processed"""
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            return web.Response(status=401)
+
+        update = await request.json(loads=bot.session.json_loads)
+
+        if not self._executor.try_submit((bot.id, extract_chat_id(update)), (bot, update)):
+            # Non-2xx makes Telegram redeliver later instead of losing the update
+            self.rejected += 1
+            return web.Response(status=503)
+
+        return web.Response()
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._executor = KeyedExecutor(
+            lambda item: feed_update(self.dispatcher, *item),
+            concurrency=self.max_in_flight,
+            # queue_size is what may wait on top of the running ones
+            max_pending=self.max_in_flight + self.queue_size,
+            metrics=settings.METRICS_ENABLED,
+        )
+        await self.dispatcher.emit_startup(bot=self.bots[0], bots=self.bots, dispatcher=self.dispatcher)
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        # Finish updates Telegram already got 200 for
+        await self._executor.join()
+        await self.dispatcher.emit_shutdown(bot=self.bots[0], bots=self.bots, dispatcher=self.dispatcher)
+
+
+async def run_webhook(bots: Sequence[Bot], dp: Dispatcher) -> None:
+    """Register the webhook of every bot in Telegram and serve them until cancelled"""
+    if not settings.WEBHOOK_URL:
+        # Before the server starts: without a URL Telegram has nowhere to send updates
+        raise SystemExit("RUN_MODE=webhook needs WEBHOOK_URL, the public base URL Telegram posts updates to")
+
+    server = WebhookServer(
+        dp,
+        bots,
+        path=settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    )
+
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBHOOK_HOST, port=settings.WEBHOOK_PORT)
+    await site.start()
+
+    allowed_updates = dp.resolve_used_update_types()
+    for bot in bots:
+        await bot.set_webhook(
+            url=f"{settings.WEBHOOK_URL.rstrip('/')}{webhook_path(settings.WEBHOOK_PATH, bot, bots)}",
+            secret_token=settings.WEBHOOK_SECRET,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=allowed_updates,
+        )
+    logger.info(
+        "Webhook of %s bots listening on %s:%s%s",
+        len(bots), settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH,
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,255 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import signal
+import time
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from aiogram import Bot
+
+from bot.config.settings import settings
+from bot.runtime.executor import KeyedExecutor, extract_chat_id, feed_update
+
+logger = logging.getLogger(__name__)
+
+
+def _load(path: str) -> Callable[..., Any]:
+    """Import 'package.module:attribute'"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _worker_main(index: int, queue: multiprocessing.Queue, bot_factory: str, dispatcher_factory: str) -> None:
+    """Worker process entry point"""
+    # Ctrl+C hits the whole process group, the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(_worker_loop(index, queue, _load(bot_factory), _load(dispatcher_factory)))
+
+
+async def _worker_loop(index: int, queue: multiprocessing.Queue, bot_factory, dispatcher_factory) -> None:
+    bot = bot_factory()
+    dp = dispatcher_factory()
+    loop = asyncio.get_running_loop()
+
+    # Chats run concurrently, updates of one chat strictly in order; the next
+    # batch is taken while a slow chat of this one is still running
+    executor = KeyedExecutor(
+        lambda update: feed_update(dp, bot, update),
+        concurrency=settings.UPDATE_CONCURRENCY,
+        max_pending=settings.UPDATE_QUEUE_SIZE,
+        metrics=settings.METRICS_ENABLED,
+    )
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, worker_index=index)
+    logger.info("Worker %s ready", index)
+
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, queue.get)
+            if batch is None:
+                break
+            for update in batch:
+                await executor.submit(extract_chat_id(update), update)
+    finally:
+        await executor.join()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        logger.info("Worker %s stopped", index)
+
+
+class WorkerPool:
+    """
+    N worker processes, each with its own Dispatcher, engine and pool
+
+    Updates are partitioned by chat_id, so every chat is always
+    handled by the same worker and its order is preserved
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        queue_size: int = 100,
+        restart_delay: float = 1.0,
+        max_restarts: int = 10,
+        bot_factory: str = "bot.main:create_bot",
+        dispatcher_factory: str = "bot.main:create_dispatcher",
+    ):
+        self.processes = processes
+        self.queue_size = queue_size
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+        self.bot_factory = bot_factory
+        self.dispatcher_factory = dispatcher_factory
+
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = []
+        self._workers: List[Optional[multiprocessing.Process]] = []
+        self._restarts: List[int] = []
+        self.supervisor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._queues[index], self.bot_factory, self.dispatcher_factory),
+            name=f"bot-worker-{index}",
+            daemon=False,
+        )
+        process.start()
+        return process
+
+    async def start(self) -> None:
+        """Start worker processes and the crash supervisor"""
+        self._queues = [self._context.Queue(maxsize=self.queue_size) for _ in range(self.processes)]
+        self._restarts = [0] * self.processes
+        self._workers = [self._spawn(index) for index in range(self.processes)]
+        self.supervisor = asyncio.create_task(self._supervise(), name="worker-supervisor")
+        logger.info("Started %s worker processes", self.processes)
+
+    async def _supervise(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.restart_delay)
+            for index, process in enumerate(self._workers):
+                if self._stopping or process.is_alive():
+                    continue
+
+                self._restarts[index] += 1
+                if self._restarts[index] > self.max_restarts:
+                    raise RuntimeError(f"Worker {index} crashed {self.max_restarts} times, giving up")
+
+                logger.error(
+                    "Worker %s exited with code %s, restarting (%s/%s)",
+                    index, process.exitcode, self._restarts[index], self.max_restarts,
+                )
+                self._workers[index] = self._spawn(index)
+
+    async def dispatch(self, updates: List[Dict[str, Any]]) -> None:
+        """Send updates to their workers, waiting while a worker queue is full"""
+        partitions: Dict[int, List[Dict[str, Any]]] = {}
+        for update in updates:
+            partitions.setdefault(extract_chat_id(update) % self.processes, []).append(update)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(None, self._queues[index].put, batch)
+            for index, batch in partitions.items()
+        ))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth (in batches) and restarts per worker"""
+        depths = []
+        for queue in self._queues:
+            try:
+                depths.append(queue.qsize())
+            except NotImplementedError:  # macOS
+                depths.append(-1)
+        return {"queue_depth": depths, "restarts": list(self._restarts)}
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Let workers drain their queues, then stop them"""
+        self._stopping = True
+        if self.supervisor is not None:
+            self.supervisor.cancel()
+            with suppress(asyncio.CancelledError, RuntimeError):
+                await self.supervisor
+
+        loop = asyncio.get_running_loop()
+        for queue in self._queues:
+            await loop.run_in_executor(None, queue.put, None)
+
+        deadline = time.monotonic() + timeout
+        for process in self._workers:
+            await loop.run_in_executor(None, process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, terminating", process.name)
+                process.terminate()
+
+
+async def poll_raw_updates(bot: Bot, allowed_updates: Optional[List[str]], timeout: int = 30):
+    """
+    Long polling that yields raw update batches (lists of dicts)
+
+    The offset only moves forward when the caller asks for the next batch,
+    so a crash before hand-off makes Telegram resend the batch. Requests go
+    through the aiohttp session of `bot.session` (its connector, proxy and
+    JSON settings); every long poll holds one of its connections.
+    """
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    request_timeout = aiohttp.ClientTimeout(total=timeout + 10)
+    offset = None
+    backoff = 1.0
+
+    while True:
+        payload = {"timeout": timeout, "allowed_updates": allowed_updates}
+        if offset is not None:
+            payload["offset"] = offset
+
+        try:
+            # Asked every time: the session recreates it after a close or proxy change
+            client = await bot.session.create_session()
+            async with client.post(
+                url,
+                data=bot.session.json_dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=request_timeout,
+            ) as response:
+                data = await response.json(loads=bot.session.json_loads)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Failed to fetch updates: %s, retry in %ss", e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+            continue
+
+        if not data.get("ok"):
+            retry_after = data.get("parameters", {}).get("retry_after", backoff)
+            logger.error("getUpdates error: %s, retry in %ss", data.get("description"), retry_after)
+            await asyncio.sleep(retry_after)
+            continue
+
+        backoff = 1.0
+        updates = data["result"]
+        if updates:
+            yield updates
+            offset = updates[-1]["update_id"] + 1
+
+
+async def run_workers(bot: Bot, allowed_updates: Optional[List[str]]) -> None:
+    """Single poller forwarding updates to a pool of worker processes"""
+    pool = WorkerPool(
+        processes=settings.WORKER_PROCESSES or multiprocessing.cpu_count(),
+        queue_size=settings.WORKER_QUEUE_SIZE,
+        restart_delay=settings.WORKER_RESTART_DELAY,
+        max_restarts=settings.WORKER_MAX_RESTARTS,
+    )
+    await pool.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    async def forward() -> None:
+        async for updates in poll_raw_updates(bot, allowed_updates):
+            await pool.dispatch(updates)
+
+    poller = asyncio.create_task(forward(), name="poller")
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        done, _ = await asyncio.wait({poller, stopper, pool.supervisor}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # Poller or supervisor failure stops the whole process
+            task.result()
+    finally:
+        poller.cancel()
+        stopper.cancel()
+        with suppress(asyncio.CancelledError):
+            await poller
+        await pool.stop()
@@ -0,0 +1 @@
+"""Maintenance scripts"""
\ No newline at end of file
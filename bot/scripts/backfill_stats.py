@@ -0,0 +1,28 @@
+"""
+Rebuild analytics rollups (daily_stats, daily_interaction_counts) from raw tables
+
+    python -m bot.scripts.backfill_stats
+
+Run once after migration 004, or whenever the rollups are suspected to be off;
+rollups of every bot in BOT_TOKEN / BOT_TOKENS are rebuilt
+"""
+import asyncio
+import logging
+from bot.config.settings import settings
+from bot.database.session import AsyncSessionLocal, close_db
+from bot.database.tenancy import bot_id_from_token
+from bot.services.stats_service import backfill_rollups
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        # backfill_rollups logs each bot's summary
+        for token in settings.bot_tokens:
+            await backfill_rollups(AsyncSessionLocal, bot_id=bot_id_from_token(token))
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.config.settings import settings
+from bot.database.repositories.stats_repository import StatsRepository
+from bot.database.repositories.user_repository import UserRepository
+from bot.database.session import AsyncSessionLocal
+from bot.database.tenancy import current_bot_id
+from bot.utils.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass(slots=True)
+class InteractionEvent:
+    """Single user interaction waiting to be written"""
+    telegram_id: int
+    interaction_type: str
+    content: Optional[str] = None
+    metadata: dict = field(default_factory=dict)
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    bot_id: int = field(default_factory=current_bot_id)
+
+
+class AnalyticsWriter:
+    """
+    Write-behind analytics pipeline
+
+    Events are queued off the request path and flushed in batches
+    (on batch size or flush interval) with one transaction per batch.
+    The same transaction updates the daily rollups (active users,
+    registrations, interactions per type)
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        queue_size: int = 10_000,
+        overflow_policy: str = "drop",
+    ):
+        if overflow_policy not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Registrations per (bot, day) waiting for the next flush
+        self._new_users: Counter = Counter()
+
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed = 0
+        self._last_drop_log = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, int]:
+        """Writer counters for monitoring"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    async def start(self) -> None:
+        """Start background flush loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="analytics-writer")
+        logger.info("Analytics writer started (batch=%s, interval=%ss)", self.batch_size, self.flush_interval)
+
+    async def stop(self) -> None:
+        """Flush everything that is queued and stop"""
+        if not self.running:
+            return
+        # Blocks while the queue is full, the loop keeps draining meanwhile
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Analytics writer stopped: %s", self.stats())
+
+    async def submit(self, event: InteractionEvent) -> None:
+        """Queue event, applying overflow policy when the queue is full"""
+        if not self.running:
+            self._count_drop()
+            return
+
+        if self.overflow_policy == "block":
+            await self._queue.put(event)
+            return
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._count_drop()
+
+    def record_new_user(self, day: Optional[date] = None) -> None:
+        """Count a registration of the current bot in the next flush"""
+        self._new_users[(current_bot_id(), day or datetime.now(timezone.utc).date())] += 1
+
+    def _count_drop(self) -> None:
+        self.dropped += 1
+        now = time.monotonic()
+        if now - self._last_drop_log > 10:
+            self._last_drop_log = now
+            logger.warning("Analytics queue full or stopped, %s events dropped so far", self.dropped)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+        if self._new_users:
+            await self._flush([])
+
+    async def _collect(self) -> Tuple[List[InteractionEvent], bool]:
+        """Wait for the first event, then gather until batch is full or interval passes"""
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    async def _flush(self, batch: List[InteractionEvent]) -> None:
+        """Write batch: per bot one aggregated users UPDATE + one bulk interactions insert + rollups"""
+        by_bot: Dict[int, List[InteractionEvent]] = {}
+        for event in batch:
+            by_bot.setdefault(event.bot_id, []).append(event)
+
+        new_users, self._new_users = self._new_users, Counter()
+        registrations: Dict[int, Counter] = {}
+        for (bot_id, day), count in new_users.items():
+            registrations.setdefault(bot_id, Counter())[day] = count
+
+        try:
+            async with self.session_factory() as session:
+                for bot_id in sorted(by_bot.keys() | registrations.keys()):
+                    await self._write(session, bot_id, by_bot.get(bot_id, []), registrations.get(bot_id, Counter()))
+                await session.commit()
+        except Exception:
+            self.failed += len(batch)
+            self._new_users.update(new_users)
+            logger.exception("Analytics flush of %s events failed", len(batch))
+            return
+
+        self.flushes += 1
+        self.written += len(batch)
+
+    async def _write(self, session, bot_id: int, events: List[InteractionEvent], new_users: Counter) -> None:
+        activity: Dict[int, Tuple[int, datetime]] = {}
+        for event in events:
+            count, last_at = activity.get(event.telegram_id, (0, event.created_at))
+            activity[event.telegram_id] = (count + 1, max(last_at, event.created_at))
+
+        user_repo = UserRepository(session, bot_id)
+        existing = await user_repo.bulk_touch_users(activity)
+
+        # Interactions of unknown users would violate the FK to users
+        written = [event for event in events if event.telegram_id in existing]
+        await user_repo.bulk_track_interactions(
+            (
+                event.telegram_id,
+                event.interaction_type,
+                event.content,
+                event.metadata,
+                event.created_at,
+            )
+            for event in written
+        )
+        await self._update_rollups(StatsRepository(session, bot_id), written, new_users)
+
+    @staticmethod
+    async def _update_rollups(
+        stats_repo: StatsRepository,
+        events: List[InteractionEvent],
+        new_users: Counter,
+    ) -> None:
+        active: Dict[date, List[int]] = {}
+        counts: Counter = Counter()
+        for event in events:
+            day = event.created_at.astimezone(timezone.utc).date()
+            active.setdefault(day, []).append(event.telegram_id)
+            counts[(day, event.interaction_type)] += 1
+
+        for day in sorted(active.keys() | new_users.keys()):
+            sketch = None
+            if day in active:
+                sketch = HyperLogLog()
+                sketch.add_many(active[day])
+            await stats_repo.record_day(day, new_users=new_users.get(day, 0), active=sketch)
+        await stats_repo.add_interaction_counts(counts)
+
+
+@lru_cache(maxsize=None)
+def get_analytics_writer() -> AnalyticsWriter:
+    """Writer behind AnalyticsMiddleware and the user service"""
+    return AnalyticsWriter(
+        AsyncSessionLocal,
+        batch_size=settings.ANALYTICS_BATCH_SIZE,
+        flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+        queue_size=settings.ANALYTICS_QUEUE_SIZE,
+        overflow_policy=settings.ANALYTICS_OVERFLOW_POLICY,
+    )
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+from functools import lru_cache
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from typing import Dict, List, Optional, Sequence
+from bot.config.settings import settings
+from bot.database.repositories.broadcast_repository import BroadcastRepository
+from bot.database.repositories.user_repository import UserRepository
+from bot.database.session import AsyncSessionLocal
+from bot.database.tenancy import current_bot_id, use_bot
+from bot.middlewares.outbound import Priority, use_priority
+from bot.utils.known_users import get_known_users
+from bot.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 3
+
+
+class SendResult(str, Enum):
+    """Outcome of delivering a broadcast to one user"""
+    SENT = "sent"
+    BLOCKED = "blocked"  # user blocked the bot or deleted the account
+    FAILED = "failed"
+
+
+class Broadcaster:
+    """
+    Background broadcast engine
+
+    Recipients are streamed from `users` page by page (keyset on users.id),
+    so memory stays O(page_size). After every page the checkpoint, counters
+    and lease are committed, so a broadcast resumes where it stopped after
+    a restart. Sends go through the bulk lane of the outbound scheduler and
+    are additionally capped by `rate` per bot, leaving headroom for regular
+    replies.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        rate: float = 25.0,
+        concurrency: int = 10,
+        page_size: int = 200,
+        lease_seconds: int = 120,
+    ):
+        self.session_factory = session_factory
+        self.rate = rate
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.lease_seconds = lease_seconds
+
+        # Telegram limits are per token: every bot gets its own bucket and semaphore
+        self._bots: Dict[int, Bot] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._stopping = False
+
+    @property
+    def active(self) -> List[int]:
+        """IDs of broadcasts running in this process"""
+        return list(self._tasks)
+
+    async def start(self, bot: Bot, bots: Optional[Sequence[Bot]] = None) -> None:
+        """Resume unfinished broadcasts of every hosted bot left without a lease"""
+        self._stopping = False
+        for hosted in bots or [bot]:
+            self._bots[hosted.id] = hosted
+            self._buckets.setdefault(hosted.id, TokenBucket(rate=self.rate, capacity=self.rate))
+            self._semaphores.setdefault(hosted.id, asyncio.Semaphore(self.concurrency))
+
+        for bot_id in self._bots:
+            with use_bot(bot_id):
+                async with self.session_factory() as session:
+                    broadcast_ids = await BroadcastRepository(session).get_resumable_ids()
+                for broadcast_id in broadcast_ids:
+                    logger.info("Resuming broadcast %s of bot %s", broadcast_id, bot_id)
+                    self.launch(broadcast_id)
+
+    async def stop(self, timeout: float = 15.0) -> None:
+        """Let running pages checkpoint, then cancel what is left"""
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def launch(self, broadcast_id: int) -> bool:
+        """Run broadcast of the current bot in the background, False if it is already running here"""
+        bot = self._bots.get(current_bot_id())
+        if bot is None:
+            raise RuntimeError("Broadcaster is not started")
+        if broadcast_id in self._tasks:
+            return False
+
+        # The task copies the context, so every request it makes stays in the bulk lane (and with its bot)
+        with use_priority(Priority.BULK):
+            task = asyncio.create_task(self._run(bot, broadcast_id), name=f"broadcast-{broadcast_id}")
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+        return True
+
+    async def _run(self, bot: Bot, broadcast_id: int) -> None:
+        async with self.session_factory() as session:
+            repo = BroadcastRepository(session)
+            claimed = await repo.claim(broadcast_id, self.lease_seconds)
+            await session.commit()
+            if not claimed:
+                logger.info("Broadcast %s is finished or locked by another process", broadcast_id)
+                return
+            broadcast = await repo.get(broadcast_id)
+            from_chat_id = broadcast.from_chat_id
+            message_id = broadcast.message_id
+            after_id = broadcast.last_user_id
+
+        started = time.monotonic()
+        try:
+            while not self._stopping:
+                async with self.session_factory() as session:
+                    page = await UserRepository(session).get_recipients_page(after_id, self.page_size)
+
+                if not page:
+                    async with self.session_factory() as session:
+                        await BroadcastRepository(session).finish(broadcast_id)
+                        await session.commit()
+                    logger.info(
+                        "Broadcast %s completed in %.1fs", broadcast_id, time.monotonic() - started
+                    )
+                    return
+
+                results = await asyncio.gather(
+                    *(self._send(bot, telegram_id, from_chat_id, message_id) for _, telegram_id in page)
+                )
+                blocked = [
+                    telegram_id
+                    for (_, telegram_id), result in zip(page, results)
+                    if result == SendResult.BLOCKED
+                ]
+                after_id = page[-1][0]
+
+                async with self.session_factory() as session:
+                    await UserRepository(session).mark_blocked(blocked)
+                    still_running = await BroadcastRepository(session).save_progress(
+                        broadcast_id,
+                        last_user_id=after_id,
+                        sent=results.count(SendResult.SENT),
+                        failed=results.count(SendResult.FAILED),
+                        blocked=len(blocked),
+                        lease_seconds=self.lease_seconds,
+                    )
+                    await session.commit()
+                # Their next /start must reach the DB to clear the flag
+                known_users = get_known_users().for_bot(current_bot_id())
+                for telegram_id in blocked:
+                    known_users.discard(telegram_id)
+
+                if not still_running:
+                    logger.info("Broadcast %s was cancelled", broadcast_id)
+                    return
+
+            # Graceful shutdown between pages: hand the broadcast over right away
+            async with self.session_factory() as session:
+                await BroadcastRepository(session).release(broadcast_id)
+                await session.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Lease expires on its own and the broadcast is resumed from the checkpoint
+            logger.exception("Broadcast %s stopped at user id %s", broadcast_id, after_id)
+
+    async def _send(self, bot: Bot, chat_id: int, from_chat_id: int, message_id: int) -> SendResult:
+        bucket = self._buckets[bot.id]
+        async with self._semaphores[bot.id]:
+            for _ in range(MAX_SEND_ATTEMPTS):
+                await bucket.acquire()
+                try:
+                    await bot.copy_message(
+                        chat_id=chat_id,
+                        from_chat_id=from_chat_id,
+                        message_id=message_id,
+                    )
+                    return SendResult.SENT
+                except TelegramRetryAfter as e:
+                    # Scheduler retries ran out: slow the whole broadcast down, not just this send
+                    logger.warning("Broadcast flood wait %ss", e.retry_after)
+                    bucket.pause(e.retry_after)
+                    await asyncio.sleep(e.retry_after)
+                except TelegramForbiddenError:
+                    return SendResult.BLOCKED
+                except TelegramNetworkError:
+                    await asyncio.sleep(1)
+                except TelegramAPIError as e:
+                    logger.debug("Broadcast to %s failed: %s", chat_id, e)
+                    return SendResult.FAILED
+            return SendResult.FAILED
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster() -> Broadcaster:
+    """Broadcaster paced by the BROADCAST_* settings"""
+    return Broadcaster(
+        session_factory=AsyncSessionLocal,
+        rate=settings.BROADCAST_RATE,
+        concurrency=settings.BROADCAST_CONCURRENCY,
+        page_size=settings.BROADCAST_PAGE_SIZE,
+        lease_seconds=settings.BROADCAST_LEASE_SECONDS,
+    )
@@ -0,0 +1,98 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+from redis.exceptions import RedisError
+from bot.config.settings import settings
+from bot.utils.cache import TTLCache
+from bot.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipCache:
+    """
+    Two-tier (user, channel) membership cache:
+    in-process LRU first, then optional shared Redis tier
+    """
+
+    KEY_PREFIX = "membership"
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_subscribed: int,
+        ttl_not_subscribed: int,
+    ):
+        self.local = TTLCache(max_size=max_size)
+        self.ttl_subscribed = ttl_subscribed
+        self.ttl_not_subscribed = ttl_not_subscribed
+
+    def _ttl(self, is_subscribed: bool) -> int:
+        return self.ttl_subscribed if is_subscribed else self.ttl_not_subscribed
+
+    def _redis_key(self, user_id: int, channel_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{channel_id}:{user_id}"
+
+    async def get(self, user_id: int, channel_id: int) -> Optional[bool]:
+        """Get cached membership, None if unknown"""
+        value = self.local.get((user_id, channel_id))
+        if value is not None:
+            return value
+
+        redis = get_redis()
+        if redis is None:
+            return None
+
+        key = self._redis_key(user_id, channel_id)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                raw, ttl = await pipe.get(key).ttl(key).execute()
+        except RedisError as e:
+            logger.warning("Membership cache Redis read failed: %s", e)
+            return None
+
+        if raw is None:
+            return None
+
+        value = raw == b"1"
+        # Keep local copy no longer than Redis does
+        local_ttl = ttl if ttl and ttl > 0 else self._ttl(value)
+        self.local.set((user_id, channel_id), value, min(local_ttl, self._ttl(value)))
+        return value
+
+    async def set(self, user_id: int, channel_id: int, is_subscribed: bool) -> None:
+        """Store membership in both tiers"""
+        ttl = self._ttl(is_subscribed)
+        self.local.set((user_id, channel_id), is_subscribed, ttl)
+
+        redis = get_redis()
+        if redis is None:
+            return
+
+        try:
+            await redis.set(self._redis_key(user_id, channel_id), "1" if is_subscribed else "0", ex=ttl)
+        except RedisError as e:
+            logger.warning("Membership cache Redis write failed: %s", e)
+
+    async def invalidate(self, user_id: int, channel_id: int) -> None:
+        """Forget membership in both tiers"""
+        self.local.delete((user_id, channel_id))
+
+        redis = get_redis()
+        if redis is None:
+            return
+
+        try:
+            await redis.delete(self._redis_key(user_id, channel_id))
+        except RedisError as e:
+            logger.warning("Membership cache Redis delete failed: %s", e)
+
+
+@lru_cache(maxsize=None)
+def get_membership_cache() -> MembershipCache:
+    """Cache shared by subscription checks and chat_member updates"""
+    return MembershipCache(
+        max_size=settings.MEMBERSHIP_CACHE_SIZE,
+        ttl_subscribed=settings.MEMBERSHIP_TTL_SUBSCRIBED,
+        ttl_not_subscribed=settings.MEMBERSHIP_TTL_NOT_SUBSCRIBED,
+    )
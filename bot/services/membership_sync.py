@@ -0,0 +1,263 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.config.settings import settings
+from bot.database.repositories.subscription_repository import SubscriptionRepository
+from bot.database.session import AsyncSessionLocal
+from bot.database.tenancy import current_bot_id, use_bot
+from bot.middlewares.outbound import Priority, use_priority
+from bot.services.membership_cache import get_membership_cache
+from bot.services.subscription_service import CheckStatus, fetch_membership
+from bot.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass(slots=True)
+class MembershipChange:
+    """Join or leave seen in a chat_member update"""
+    user_id: int
+    channel_id: int  # channels.id
+    is_member: bool
+    at: datetime
+    bot_id: int = field(default_factory=current_bot_id)
+
+
+class MembershipWriter:
+    """
+    Write-behind for chat_member updates
+
+    The handler updates the membership cache right away and queues the
+    change here; changes are upserted into user_subscriptions in batches
+    (on batch size or flush interval), one statement per batch
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        queue_size: int = 10_000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.written = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, int]:
+        """Writer counters for monitoring"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    async def start(self) -> None:
+        """Start background flush loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="membership-writer")
+
+    async def stop(self) -> None:
+        """Flush everything that is queued and stop"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Membership writer stopped: %s", self.stats())
+
+    async def submit(self, change: MembershipChange) -> None:
+        """Queue change, waits while the queue is full (the sweep repairs what is lost when stopped)"""
+        if not self.running:
+            self.dropped += 1
+            return
+        await self._queue.put(change)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect(self) -> Tuple[List[MembershipChange], bool]:
+        """Wait for the first change, then gather until batch is full or interval passes"""
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush(self, batch: List[MembershipChange]) -> None:
+        by_bot: Dict[int, List[MembershipChange]] = {}
+        for change in batch:
+            by_bot.setdefault(change.bot_id, []).append(change)
+
+        written = 0
+        try:
+            async with self.session_factory() as session:
+                for bot_id, changes in by_bot.items():
+                    written += await SubscriptionRepository(session, bot_id).upsert_statuses(
+                        (change.user_id, change.channel_id, change.is_member, change.at) for change in changes
+                    )
+                await session.commit()
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Membership flush of %s changes failed", len(batch))
+            return
+
+        self.flushes += 1
+        self.written += written
+        self.skipped += len(batch) - written
+
+
+class MembershipSweeper:
+    """
+    Low-rate reconciliation of user_subscriptions with Telegram
+
+    chat_member updates can be missed (downtime longer than Telegram keeps
+    updates, the bot losing admin rights for a while), so pairs not checked
+    for `min_age` seconds are re-checked, oldest first, at most `rate`
+    getChatMember calls per second and bot in the background lane. Pairs
+    are claimed in the database, so several processes never check the same one.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        rate: float = 1.0,
+        min_age: float = 86400,
+        page_size: int = 100,
+        idle_interval: float = 300,
+    ):
+        self.session_factory = session_factory
+        self.rate = rate
+        self.min_age = min_age
+        self.page_size = page_size
+        self.idle_interval = idle_interval
+        self._bots: List[Bot] = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.checked = 0
+        self.changed = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Sweep counters for monitoring"""
+        return {"checked": self.checked, "changed": self.changed}
+
+    async def start(self, bot: Bot, bots: Optional[Sequence[Bot]] = None, worker_index: int = -1) -> None:
+        """Dispatcher startup hook, one sweep per process group (worker 0 in workers mode)"""
+        if self.rate <= 0 or worker_index > 0:
+            return
+        if self._task is None or self._task.done():
+            self._bots = list(bots or [bot])
+            self._task = asyncio.create_task(self._run(), name="membership-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        # getChatMember limits are per token, so is the sweep rate
+        buckets = {bot.id: TokenBucket(self.rate, 1) for bot in self._bots}
+        while True:
+            busy = False
+            for bot in self._bots:
+                try:
+                    with use_bot(bot.id):
+                        checked = await self.sweep_page(bot, buckets[bot.id])
+                except Exception:
+                    logger.exception("Membership sweep of bot %s failed", bot.id)
+                    checked = 0
+                busy = busy or checked >= self.page_size
+            if not busy:
+                await asyncio.sleep(self.idle_interval)
+
+    async def sweep_page(self, bot: Bot, bucket: TokenBucket) -> int:
+        """Re-check one page of the bot's stale pairs, returns how many were claimed"""
+        async with self.session_factory() as session:
+            pairs = await SubscriptionRepository(session, bot.id).claim_stale(self.min_age, self.page_size)
+            await session.commit()
+        if not pairs:
+            return 0
+
+        rows = []
+        with use_priority(Priority.BULK):
+            for user_id, channel_id, chat_id, was_member in pairs:
+                await bucket.acquire()
+                status = await fetch_membership(bot, user_id, chat_id)
+                if not status.is_definite:
+                    continue
+                is_member = status == CheckStatus.SUBSCRIBED
+                if is_member != was_member:
+                    # A missed chat_member update
+                    self.changed += 1
+                await get_membership_cache().set(user_id, chat_id, is_member)
+                rows.append((user_id, channel_id, is_member, datetime.now(timezone.utc)))
+
+        async with self.session_factory() as session:
+            await SubscriptionRepository(session, bot.id).upsert_statuses(rows)
+            await session.commit()
+        self.checked += len(pairs)
+        return len(pairs)
+
+
+@lru_cache(maxsize=None)
+def get_membership_writer() -> MembershipWriter:
+    """Writer fed by the chat_member handler"""
+    return MembershipWriter(
+        AsyncSessionLocal,
+        batch_size=settings.MEMBERSHIP_BATCH_SIZE,
+        flush_interval=settings.MEMBERSHIP_FLUSH_INTERVAL,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_membership_sweeper() -> MembershipSweeper:
+    """Reconciliation job paced by MEMBERSHIP_SWEEP_RATE"""
+    return MembershipSweeper(
+        AsyncSessionLocal,
+        rate=settings.MEMBERSHIP_SWEEP_RATE,
+        min_age=settings.MEMBERSHIP_SWEEP_MIN_AGE,
+    )
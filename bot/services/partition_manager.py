@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, time, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from bot.config.settings import settings
+from bot.database.models import UserInteraction
+from bot.database.session import get_engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = UserInteraction.__tablename__
+PARTITION_NAME = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+ARCHIVE_COLUMNS = ["id", "bot_id", "user_id", "interaction_type", "content", "metadata", "created_at"]
+# metadata is JSONB, archive it as the text it is stored as instead of decoding every row
+ARCHIVE_SELECT = ", ".join("metadata::text AS metadata" if name == "metadata" else name for name in ARCHIVE_COLUMNS)
+
+# Any constant works, it only has to be the same in every process
+ADVISORY_LOCK_KEY = 0x75695F70  # "ui_p"
+
+
+def add_months(month: date, count: int) -> date:
+    """First day of the month `count` months away"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+class InteractionPartitionManager:
+    """
+    Keeps user_interactions bounded
+
+    On PostgreSQL (table partitioned by month) it creates upcoming partitions
+    ahead of time, exports partitions older than the retention window to
+    Parquet and drops them, which is instant compared to DELETE + vacuum.
+    Elsewhere (SQLite, or a dev table made by create_all) it deletes expired
+    rows in small chunks so writers are never blocked for long.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[AsyncEngine] = None,
+        retention_months: int = 6,
+        partitions_ahead: int = 3,
+        archive_dir: Optional[str] = "archive",
+        interval: float = 6 * 3600,
+        chunk_size: int = 50_000,
+    ):
+        # None: the bot's engine, looked up when the job runs
+        self._engine = engine
+        self.retention_months = retention_months
+        self.partitions_ahead = partitions_ahead
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Run maintenance now and then every `interval` seconds"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="partition-manager")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Partition maintenance failed")
+            await asyncio.sleep(self.interval)
+
+    def cutoff_month(self) -> date:
+        """Data before this month is expired"""
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        return add_months(current, -self.retention_months)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine or get_engine()
+
+    async def run_once(self) -> None:
+        """Single maintenance pass"""
+        async with self.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                await self._delete_expired(conn)
+                return
+
+            # Workers and replicas all run the job, only one does the work
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            await conn.commit()
+            if not locked:
+                return
+            try:
+                if await self._is_partitioned(conn):
+                    await self._create_upcoming(conn)
+                    await self._archive_expired(conn)
+                else:
+                    await self._delete_expired(conn)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                await conn.commit()
+
+    async def _is_partitioned(self, conn: AsyncConnection) -> bool:
+        relkind = await conn.scalar(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"), {"table": TABLE}
+        )
+        return relkind == "p"
+
+    async def _partitions(self, conn: AsyncConnection) -> List[Tuple[str, date]]:
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:table)"
+        ), {"table": TABLE})
+
+        partitions = []
+        for (name,) in result:
+            match = PARTITION_NAME.match(name)
+            if match:
+                partitions.append((name, date(int(match[1]), int(match[2]), 1)))
+        return sorted(partitions, key=lambda item: item[1])
+
+    async def _create_upcoming(self, conn: AsyncConnection) -> None:
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        for offset in range(self.partitions_ahead + 1):
+            month = add_months(current, offset)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+                f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+            ))
+        await conn.commit()
+
+    async def _archive_expired(self, conn: AsyncConnection) -> None:
+        cutoff = self.cutoff_month()
+        for name, month in await self._partitions(conn):
+            if month >= cutoff:
+                break
+
+            if self.archive_dir:
+                exported = await self._export(conn, name)
+                expected = await conn.scalar(text(f"SELECT count(*) FROM {name}"))
+                await conn.commit()
+                if exported != expected:
+                    logger.error("Archive of %s has %s rows, table has %s; keeping it", name, exported, expected)
+                    continue
+
+            # Detached partition is a plain table, dropping it frees the space at once
+            await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            await conn.commit()
+            logger.info("Partition %s archived and dropped", name)
+
+    async def _export(self, conn: AsyncConnection, name: str) -> int:
+        """Stream partition into {archive_dir}/{name}.parquet, returns rows written"""
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("id", pa.int64()),
+            ("bot_id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("interaction_type", pa.string()),
+            ("content", pa.string()),
+            ("metadata", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ])
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{name}.parquet")
+        partial = f"{path}.partial"
+
+        written = 0
+        writer = pq.ParquetWriter(partial, schema, compression="zstd")
+        try:
+            result = await conn.stream(
+                text(f"SELECT {ARCHIVE_SELECT} FROM {name} ORDER BY id"),
+                execution_options={"yield_per": self.chunk_size},
+            )
+            async for rows in result.partitions(self.chunk_size):
+                frame = pd.DataFrame.from_records(rows, columns=ARCHIVE_COLUMNS)
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                await asyncio.to_thread(writer.write_table, table)
+                written += len(rows)
+        finally:
+            await asyncio.to_thread(writer.close)
+        await conn.commit()
+
+        os.replace(partial, path)
+        return written
+
+    async def _delete_expired(self, conn: AsyncConnection) -> None:
+        cutoff = datetime.combine(self.cutoff_month(), time(), tzinfo=timezone.utc)
+        # Ids grow with created_at, so the expired rows are the ids below the first kept
+        # one. Finding it walks the primary key over the expired rows only (SQLite has no
+        # created_at index), then chunks are id ranges. A row written out of order just
+        # before the cutoff, above that id, goes with the next month's run.
+        first_kept = await conn.scalar(
+            select(UserInteraction.id)
+            .where(UserInteraction.created_at >= cutoff)
+            .order_by(UserInteraction.id)
+            .limit(1)
+        )
+        # Separate queries: SQLite answers a lone min() or max() from the index
+        low = await conn.scalar(select(func.min(UserInteraction.id)))
+        high = await conn.scalar(select(func.max(UserInteraction.id)))
+        await conn.commit()
+        if low is None:
+            return
+        bound = first_kept if first_kept is not None else high + 1
+
+        deleted = 0
+        while low < bound:
+            chunk_end = min(low + self.chunk_size, bound)
+            result = await conn.execute(
+                delete(UserInteraction).where(
+                    UserInteraction.id >= low,
+                    UserInteraction.id < chunk_end,
+                    UserInteraction.created_at < cutoff,
+                )
+            )
+            await conn.commit()
+            deleted += result.rowcount
+            low = chunk_end
+            # Let request handlers at the database between chunks
+            await asyncio.sleep(0)
+
+        if deleted:
+            logger.info("Deleted %s interactions older than %s", deleted, cutoff.date())
+
+
+@lru_cache(maxsize=None)
+def get_partition_manager() -> InteractionPartitionManager:
+    """Retention job for user_interactions"""
+    return InteractionPartitionManager(
+        retention_months=settings.INTERACTIONS_RETENTION_MONTHS,
+        partitions_ahead=settings.INTERACTIONS_PARTITIONS_AHEAD,
+        archive_dir=settings.INTERACTIONS_ARCHIVE_DIR,
+        interval=settings.PARTITION_JOB_INTERVAL,
+    )
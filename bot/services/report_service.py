@@ -0,0 +1,330 @@
+import io
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Integer, and_, case, cast, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.database.models import User, UserInteraction
+from bot.database.tenancy import current_bot_id
+
+logger = logging.getLogger(__name__)
+
+US_PER_HOUR = 3_600_000_000
+WEEKDAYS = ["Du", "Se", "Ch", "Pa", "Ju", "Sh", "Ya"]
+# COPY output is parsed in pieces of about this size
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FunnelStep:
+    """Interaction that moves a user one step down the funnel"""
+    name: str
+    interaction_type: str
+    content_prefix: Optional[str] = None
+
+
+DEFAULT_FUNNEL = [
+    FunnelStep("/start", "command", "/start"),
+    FunnelStep("Xabar", "message"),
+    FunnelStep("Buyruq", "command"),
+]
+
+
+@dataclass
+class Report:
+    """Computed report tables"""
+    retention: pd.DataFrame  # cohort x period offset, share of the cohort active
+    cohort_sizes: pd.Series
+    funnel: pd.DataFrame  # step, users, conversion from previous step
+    heatmap: pd.DataFrame  # weekday x hour, interactions
+    users: int = 0
+    interactions: int = 0
+    elapsed: float = 0.0
+    period: str = "week"
+
+
+def _epoch_us(column, dialect: str):
+    """UTC microseconds since epoch, computed by the database"""
+    if dialect == "postgresql":
+        return cast(func.extract("epoch", column) * 1_000_000, BigInteger)
+    # SQLite stores UTC text, julianday() parses it
+    return cast((func.julianday(column) - 2440587.5) * 86_400_000_000, Integer)
+
+
+def _period_index(us: np.ndarray, period: str) -> np.ndarray:
+    """Period number of UTC microsecond timestamps (weeks start on Monday)"""
+    stamps = us.astype("datetime64[us]")
+    if period == "month":
+        return stamps.astype("datetime64[M]").astype(np.int64)
+    days = stamps.astype("datetime64[D]").astype(np.int64)
+    if period == "day":
+        return days
+    # 1970-01-01 was a Thursday
+    return (days + 3) // 7
+
+
+def _period_label(index: int, period: str) -> str:
+    if period == "month":
+        return str(np.datetime64(index, "M"))
+    if period == "day":
+        return str(np.datetime64(index, "D"))
+    return str(np.datetime64(index * 7 - 3, "D"))
+
+
+class ReportEngine:
+    """
+    Cohort retention, funnel and hourly heatmap in one streaming pass
+
+    users and user_interactions are streamed as chunks of integers only:
+    timestamps come back as epoch microseconds and funnel steps as 0/1
+    flags computed in SQL, so no datetime or ORM objects are built per row.
+    On PostgreSQL the rows arrive through COPY and are parsed by pandas' C
+    reader. Per-user state lives in flat numpy arrays (~23 bytes per user),
+    so memory depends on the number of users, not interactions.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        period: str = "week",
+        periods: int = 12,
+        funnel: Optional[List[FunnelStep]] = None,
+        chunk_size: int = 100_000,
+        bot_id: Optional[int] = None,
+    ):
+        if period not in ("day", "week", "month"):
+            raise ValueError(f"Unknown period: {period}")
+        if not 0 < periods <= 32:
+            raise ValueError("periods must be between 1 and 32")
+
+        self.session_factory = session_factory
+        self.period = period
+        self.periods = periods
+        self.funnel = funnel or DEFAULT_FUNNEL
+        self.chunk_size = chunk_size
+        self.bot_id = current_bot_id() if bot_id is None else bot_id
+
+    async def run(self) -> Report:
+        started = time.perf_counter()
+
+        async with self.session_factory() as session:
+            connection = await session.connection(bind_arguments={"replica": True})
+            dialect = connection.dialect.name
+
+            users: List[np.ndarray] = []
+            await self._stream(connection, select(
+                User.telegram_id, _epoch_us(User.created_at, dialect),
+            ).where(User.bot_id == self.bot_id), users.append)
+            self._load_users(np.concatenate(users) if users else np.empty((0, 2), dtype=np.int64))
+
+            await self._stream(connection, select(
+                UserInteraction.user_id,
+                _epoch_us(UserInteraction.created_at, dialect),
+                *[self._step_flag(step) for step in self.funnel],
+            # The funnel is ordered in time, on PostgreSQL partitions are sorted one at a time
+            ).where(UserInteraction.bot_id == self.bot_id).order_by(UserInteraction.created_at), self._consume)
+
+        report = self._build()
+        report.elapsed = time.perf_counter() - started
+        logger.info(
+            "Report over %s users / %s interactions in %.2fs",
+            report.users, report.interactions, report.elapsed,
+        )
+        return report
+
+    @staticmethod
+    def _step_flag(step: FunnelStep):
+        condition = UserInteraction.interaction_type == step.interaction_type
+        if step.content_prefix is not None:
+            condition = and_(condition, UserInteraction.content.startswith(step.content_prefix, autoescape=True))
+        return case((condition, 1), else_=0)
+
+    async def _stream(self, connection, stmt, consume: Callable[[np.ndarray], None]) -> None:
+        """Feed the statement's rows to consume() as int64 matrices"""
+        if connection.dialect.driver != "asyncpg":
+            result = await connection.stream(stmt.execution_options(yield_per=self.chunk_size))
+            columns = len(stmt.selected_columns)
+            async for rows in result.partitions():
+                # np.array() on Row objects probes each one for array attributes, flatten instead
+                flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * columns)
+                consume(flat.reshape(len(rows), columns))
+            return
+
+        sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        raw = await connection.get_raw_connection()
+        buffer = bytearray()
+
+        def parse(data: bytes) -> None:
+            if data:
+                consume(pd.read_csv(io.BytesIO(data), header=None, dtype=np.int64).to_numpy())
+
+        async def sink(data: bytes) -> None:
+            buffer.extend(data)
+            if len(buffer) >= COPY_CHUNK_BYTES:
+                # Output is integers only, every newline ends a row
+                cut = buffer.rfind(b"\n") + 1
+                parse(bytes(buffer[:cut]))
+                del buffer[:cut]
+
+        await raw.driver_connection.copy_from_query(sql, output=sink, format="csv")
+        parse(bytes(buffer))
+
+    def _load_users(self, users: np.ndarray) -> None:
+        order = np.argsort(users[:, 0])
+        self._ids = users[order, 0]
+        self._cohort = _period_index(users[order, 1], self.period)
+        # Bit k set: user was active k periods after their cohort period
+        self._active = np.zeros(len(self._ids), dtype=np.uint32)
+        # Funnel: last step reached and when
+        self._stage = np.zeros(len(self._ids), dtype=np.int8)
+        self._reached_at = np.full(len(self._ids), np.iinfo(np.int64).min, dtype=np.int64)
+        self._heatmap = np.zeros(7 * 24, dtype=np.int64)
+        self._interactions = 0
+
+    def _consume(self, chunk: np.ndarray) -> None:
+        """chunk columns: user_id, created_at (epoch us), one 0/1 flag per funnel step"""
+        self._interactions += len(chunk)
+        if not len(self._ids) or not len(chunk):
+            return
+
+        user_ids = chunk[:, 0]
+        stamps = chunk[:, 1]
+
+        position = np.searchsorted(self._ids, user_ids)
+        position[position == len(self._ids)] = 0
+        known = self._ids[position] == user_ids
+
+        # Hourly heatmap (UTC), Monday first
+        hours = stamps // US_PER_HOUR
+        weekday = (hours // 24 + 3) % 7
+        self._heatmap += np.bincount(weekday * 24 + hours % 24, minlength=7 * 24)
+
+        # Retention bits
+        offset = _period_index(stamps, self.period) - self._cohort[position]
+        in_window = known & (offset >= 0) & (offset < self.periods)
+        np.bitwise_or.at(
+            self._active, position[in_window], np.left_shift(np.uint32(1), offset[in_window].astype(np.uint32))
+        )
+
+        # Ordered funnel: a step counts only at or after the time the previous one was reached
+        for step_number in range(1, len(self.funnel) + 1):
+            rows = np.flatnonzero(known & (chunk[:, step_number + 1] == 1))
+            rows = rows[
+                (self._stage[position[rows]] == step_number - 1)
+                & (stamps[rows] >= self._reached_at[position[rows]])
+            ]
+            if not len(rows):
+                continue
+            rows = rows[np.argsort(stamps[rows], kind="stable")]
+            users, first = np.unique(position[rows], return_index=True)
+            self._stage[users] = step_number
+            self._reached_at[users] = stamps[rows[first]]
+
+    def _build(self) -> Report:
+        if len(self._ids):
+            last = int(self._cohort.max())
+            cohorts = np.arange(last - self.periods + 1, last + 1)
+        else:
+            cohorts = np.empty(0, dtype=np.int64)
+
+        in_range = self._cohort >= (cohorts[0] if len(cohorts) else 0)
+        cohort_index = (self._cohort[in_range] - (cohorts[0] if len(cohorts) else 0)).astype(np.int64)
+        active = self._active[in_range]
+        sizes = np.bincount(cohort_index, minlength=len(cohorts))
+
+        matrix = np.zeros((len(cohorts), self.periods), dtype=np.float64)
+        for k in range(self.periods):
+            retained = np.bincount(cohort_index[(active >> np.uint32(k)) & np.uint32(1) == 1], minlength=len(cohorts))
+            matrix[:, k] = np.divide(retained, sizes, out=np.zeros(len(cohorts)), where=sizes > 0)
+        # Periods a cohort has not lived through yet are unknown, not zero
+        for row, cohort in enumerate(cohorts):
+            matrix[row, int(cohorts[-1] - cohort) + 1:] = np.nan
+
+        labels = [_period_label(int(cohort), self.period) for cohort in cohorts]
+        reached = [len(self._ids)] + [int(np.count_nonzero(self._stage >= n)) for n in range(1, len(self.funnel) + 1)]
+        funnel = pd.DataFrame({
+            "step": ["Ro'yxatdan o'tgan"] + [step.name for step in self.funnel],
+            "users": reached,
+        })
+        previous = funnel["users"].shift(1).fillna(funnel["users"]).replace(0, np.nan)
+        funnel["conversion"] = (funnel["users"] / previous).fillna(0.0)
+
+        return Report(
+            retention=pd.DataFrame(matrix, index=labels, columns=range(self.periods)),
+            cohort_sizes=pd.Series(sizes, index=labels),
+            funnel=funnel,
+            heatmap=pd.DataFrame(self._heatmap.reshape(7, 24), index=WEEKDAYS, columns=range(24)),
+            users=len(self._ids),
+            interactions=self._interactions,
+            period=self.period,
+        )
+
+
+def render_png(report: Report, path: str) -> str:
+    """Retention, funnel and heatmap on one PNG (blocking, run in a thread)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure, (retention_ax, funnel_ax, heatmap_ax) = plt.subplots(
+        3, 1, figsize=(12, 16), gridspec_kw={"height_ratios": [3, 1.5, 2]}
+    )
+
+    image = retention_ax.imshow(report.retention.to_numpy(), cmap="Blues", vmin=0, vmax=1, aspect="auto")
+    retention_ax.set_title(f"Retention ({report.period}), {report.users} foydalanuvchi")
+    retention_ax.set_yticks(range(len(report.retention.index)))
+    retention_ax.set_yticklabels([f"{label} ({report.cohort_sizes[label]})" for label in report.retention.index])
+    retention_ax.set_xticks(range(len(report.retention.columns)))
+    for (row, column), value in np.ndenumerate(report.retention.to_numpy()):
+        if not np.isnan(value):
+            retention_ax.text(column, row, f"{value:.0%}", ha="center", va="center", fontsize=7)
+    figure.colorbar(image, ax=retention_ax)
+
+    bars = funnel_ax.barh(report.funnel["step"][::-1], report.funnel["users"][::-1], color="#4c72b0")
+    funnel_ax.bar_label(bars, labels=[
+        f"{users} ({conversion:.0%})"
+        for users, conversion in zip(report.funnel["users"][::-1], report.funnel["conversion"][::-1])
+    ])
+    funnel_ax.set_title("Funnel")
+
+    heatmap_ax.imshow(report.heatmap.to_numpy(), cmap="Oranges", aspect="auto")
+    heatmap_ax.set_yticks(range(7))
+    heatmap_ax.set_yticklabels(report.heatmap.index)
+    heatmap_ax.set_xticks(range(24))
+    heatmap_ax.set_title(f"Faollik soatlar bo'yicha (UTC), {report.interactions} interaksiya")
+
+    figure.tight_layout()
+    figure.savefig(path, dpi=110)
+    plt.close(figure)
+    return path
+
+
+def render_html(report: Report, path: str) -> str:
+    """Interactive version of the same charts (blocking, run in a thread)"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    figure = make_subplots(
+        rows=3, cols=1, row_heights=[0.45, 0.2, 0.35], vertical_spacing=0.08,
+        subplot_titles=(f"Retention ({report.period})", "Funnel", "Faollik soatlar bo'yicha (UTC)"),
+    )
+    figure.add_trace(go.Heatmap(
+        z=report.retention.to_numpy(),
+        x=list(report.retention.columns),
+        y=[f"{label} ({report.cohort_sizes[label]})" for label in report.retention.index],
+        colorscale="Blues", zmin=0, zmax=1, colorbar={"len": 0.4, "y": 0.8},
+    ), row=1, col=1)
+    figure.add_trace(go.Funnel(
+        y=report.funnel["step"], x=report.funnel["users"], textinfo="value+percent previous",
+    ), row=2, col=1)
+    figure.add_trace(go.Heatmap(
+        z=report.heatmap.to_numpy(), x=list(report.heatmap.columns), y=list(report.heatmap.index),
+        colorscale="Oranges", showscale=False,
+    ), row=3, col=1)
+    figure.update_layout(height=1400, title=f"{report.users} foydalanuvchi, {report.interactions} interaksiya")
+    figure.write_html(path, include_plotlyjs="cdn")
+    return path
@@ -0,0 +1,122 @@
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Any, Dict, Optional
+import numpy as np
+from bot.database.models import User, UserInteraction
+from bot.database.repositories.stats_repository import StatsRepository
+from bot.database.tenancy import current_bot_id
+from bot.utils.hll import HyperLogLog
+from bot.utils.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_day(value: datetime) -> date:
+    # SQLite hands back naive datetimes, they are stored in UTC
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(timezone.utc).date()
+
+
+@trace_methods("service")
+class StatsService:
+    """Bot statistics read from the daily rollups, cost does not grow with users or interactions"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repo = StatsRepository(session)
+
+    async def get_summary(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """DAU/WAU/MAU, registrations and interactions per type"""
+        today = today or datetime.now(timezone.utc).date()
+        week_start = today - timedelta(days=6)
+        month_start = today - timedelta(days=29)
+
+        daily = HyperLogLog()
+        weekly = HyperLogLog()
+        monthly = HyperLogLog()
+        new_today = new_week = 0
+
+        for row in await self.repo.get_days(month_start, today):
+            if row.day >= week_start:
+                new_week += row.new_users
+            if row.day == today:
+                new_today = row.new_users
+            if not row.active_users_hll:
+                continue
+
+            sketch = HyperLogLog.from_bytes(row.active_users_hll)
+            monthly.update(sketch)
+            if row.day >= week_start:
+                weekly.update(sketch)
+            if row.day == today:
+                daily = sketch
+
+        return {
+            "total_users": await self.repo.get_total_users(),
+            "dau": daily.count(),
+            "wau": weekly.count(),
+            "mau": monthly.count(),
+            "new_users_today": new_today,
+            "new_users_week": new_week,
+            "interactions_today": await self.repo.get_interaction_counts(today, today),
+            "interactions_week": await self.repo.get_interaction_counts(week_start, today),
+        }
+
+
+async def backfill_rollups(
+    session_factory: async_sessionmaker,
+    chunk_size: int = 50_000,
+    bot_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Rebuild every rollup of one bot (the current one by default) from users
+    and user_interactions in one transaction
+    Only what is still in the database counts, archived partitions are not read
+    """
+    bot_id = current_bot_id() if bot_id is None else bot_id
+    new_users: Counter = Counter()
+    counts: Counter = Counter()
+    sketches: Dict[date, HyperLogLog] = {}
+    scanned = 0
+
+    async with session_factory() as session:
+        users = await session.stream(
+            select(User.created_at).where(User.bot_id == bot_id).execution_options(yield_per=chunk_size)
+        )
+        async for rows in users.partitions():
+            new_users.update(_utc_day(created_at) for (created_at,) in rows)
+
+        interactions = await session.stream(
+            select(UserInteraction.user_id, UserInteraction.interaction_type, UserInteraction.created_at)
+            .where(UserInteraction.bot_id == bot_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in interactions.partitions():
+            by_day: Dict[date, list] = {}
+            for user_id, interaction_type, created_at in rows:
+                day = _utc_day(created_at)
+                by_day.setdefault(day, []).append(user_id)
+                counts[(day, interaction_type)] += 1
+
+            for day, user_ids in by_day.items():
+                if day not in sketches:
+                    sketches[day] = HyperLogLog()
+                sketches[day].add_many(np.array(user_ids, dtype=np.int64))
+            scanned += len(rows)
+
+        repo = StatsRepository(session, bot_id)
+        await repo.clear()
+        for day in sorted(new_users.keys() | sketches.keys()):
+            await repo.record_day(day, new_users=new_users.get(day, 0), active=sketches.get(day))
+        await repo.add_interaction_counts(counts)
+        await session.commit()
+
+    logger.info(
+        "Rollups of bot %s rebuilt: %s days from %s interactions",
+        bot_id, len(new_users.keys() | sketches.keys()), scanned,
+    )
+    return {"days": len(new_users.keys() | sketches.keys()), "users": sum(new_users.values()), "interactions": scanned}
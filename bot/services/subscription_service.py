@@ -1,38 +1,242 @@
+import asyncio
+import logging
+from enum import Enum
+from functools import lru_cache
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram import Bot
-from typing import List
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, List, Optional
+from bot.config.settings import settings
 from bot.database.models import Channel
 from bot.database.repositories.channel_repository import ChannelRepository
+from bot.database.repositories.subscription_repository import SubscriptionRepository
+from bot.services.membership_cache import get_membership_cache
+from bot.utils.cache import TTLCache
+from bot.utils.tracing import trace_methods
 
+logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=None)
+def _check_semaphore() -> asyncio.Semaphore:
+    """
+    Shared by all SubscriptionService instances in the process
+    (getChatMember rate limit and short flood-wait retries live in the outbound scheduler)
+    """
+    return asyncio.Semaphore(settings.SUBSCRIPTION_CHECK_CONCURRENCY)
+
+
+# (bot id, user_id) -> channels.id the user was last asked to join, re-checked by the
+# "check" button (callbacks are routed to the same worker as the user's messages)
+_failed_channels = TTLCache(max_size=100_000)
+
+# ChatMember statuses of users who are not in the channel ("restricted" still is)
+NOT_MEMBER_STATUSES = ("left", "kicked")
+
+
+class CheckStatus(str, Enum):
+    """Outcome of a single getChatMember check"""
+    SUBSCRIBED = "subscribed"
+    NOT_SUBSCRIBED = "not_subscribed"
+    CHANNEL_UNAVAILABLE = "channel_unavailable"  # chat not found / bot is not admin
+    FLOOD_WAIT = "flood_wait"
+    NETWORK_ERROR = "network_error"
+
+    @property
+    def is_definite(self) -> bool:
+        """Real answer from Telegram, safe to cache"""
+        return self in (CheckStatus.SUBSCRIBED, CheckStatus.NOT_SUBSCRIBED)
+
+    @property
+    def blocks_user(self) -> bool:
+        """Whether user must be asked to subscribe"""
+        if self == CheckStatus.NOT_SUBSCRIBED:
+            return True
+        if self in (CheckStatus.FLOOD_WAIT, CheckStatus.NETWORK_ERROR):
+            return not settings.SUBSCRIPTION_FAIL_OPEN
+        # Misconfigured channel must not lock every user out
+        return False
+
+
+@trace_methods("service")
 class SubscriptionService:
     """Service for subscription operations"""
-    
+
     def __init__(self, session: AsyncSession, bot: Bot):
         self.session = session
         self.bot = bot
         self.repo = ChannelRepository(session)
-    
-    async def check_user_subscriptions(self, user_id: int) -> List[Channel]:
+        self.subscription_repo = SubscriptionRepository(session)
+
+    async def check_user_subscriptions(self, user_id: int, short_circuit: bool = False) -> List[Channel]:
         """
         Check if user is subscribed to all required channels
         Returns list of channels user is NOT subscribed to
+
+        Answers come from the membership cache, then user_subscriptions
+        (kept current by chat_member updates), getChatMember is only
+        called for pairs neither knows
+
+        With short_circuit=True stops at the first failing channel,
+        so the result holds at most one channel
         """
         channels = await self.repo.get_active_channels()
-        not_subscribed = []
-        
+        statuses: Dict[int, CheckStatus] = {}
+        pending = []
+
         for channel in channels:
-            try:
-                member = await self.bot.get_chat_member(
-                    chat_id=channel.channel_id,
-                    user_id=user_id
-                )
-                
-                # Check if user is a member
-                if member.status in ["left", "kicked"]:
-                    not_subscribed.append(channel)
-            except Exception:
-                # If error, assume not subscribed
-                not_subscribed.append(channel)
-        
-        return not_subscribed
\ No newline at end of file
+            is_member = await get_membership_cache().get(user_id, channel.channel_id)
+            if is_member is None:
+                pending.append(channel)
+                continue
+
+            statuses[channel.id] = CheckStatus.SUBSCRIBED if is_member else CheckStatus.NOT_SUBSCRIBED
+            if short_circuit and not is_member:
+                return [channel]
+
+        if pending and settings.MEMBERSHIP_TRACKING:
+            stored = await self.subscription_repo.get_statuses(user_id, [ch.id for ch in pending])
+            unknown = []
+            for channel in pending:
+                is_member = stored.get(channel.id)
+                if is_member is None:
+                    unknown.append(channel)
+                    continue
+
+                await get_membership_cache().set(user_id, channel.channel_id, is_member)
+                statuses[channel.id] = CheckStatus.SUBSCRIBED if is_member else CheckStatus.NOT_SUBSCRIBED
+                if short_circuit and not is_member:
+                    return [channel]
+            pending = unknown
+
+        if pending:
+            fresh = await self._check_channels(user_id, pending, short_circuit)
+            statuses.update(fresh)
+            await self._save_statuses(user_id, [ch for ch in pending if ch.id in fresh], fresh)
+
+        not_subscribed = [
+            channel for channel in channels
+            if channel.id in statuses and statuses[channel.id].blocks_user
+        ]
+        return not_subscribed[:1] if short_circuit else not_subscribed
+
+    def remember_failed(self, user_id: int, channels: List[Channel]) -> None:
+        """Keep channels from the subscription prompt for the next re-check"""
+        _failed_channels.set((self.bot.id, user_id), frozenset(ch.id for ch in channels), settings.SUBSCRIPTION_PROMPT_TTL)
+
+    def failed_channel_ids(self, user_id: int) -> Optional[FrozenSet[int]]:
+        """channels.id from the last prompt, None if there is none"""
+        return _failed_channels.get((self.bot.id, user_id))
+
+    async def recheck_failed(self, user_id: int) -> List[Channel]:
+        """
+        Re-verify only the channels the user was last asked to join
+        Returns channels still missing
+
+        Channels not confirmed by the cache (a chat_member update may have
+        recorded the join already) are checked live, so API calls grow with
+        the missing channels, not with all of them. Without a remembered
+        prompt this is a regular check.
+        """
+        failed = self.failed_channel_ids(user_id)
+        if failed is None:
+            missing = await self.check_user_subscriptions(user_id)
+        else:
+            channels = [ch for ch in await self.repo.get_active_channels() if ch.id in failed]
+            live = [ch for ch in channels if not await get_membership_cache().get(user_id, ch.channel_id)]
+            missing = []
+            if live:
+                statuses = await self._check_channels(user_id, live, short_circuit=False)
+                await self._save_statuses(user_id, live, statuses)
+                missing = [ch for ch in live if statuses[ch.id].blocks_user]
+
+        if missing:
+            self.remember_failed(user_id, missing)
+        else:
+            _failed_channels.delete((self.bot.id, user_id))
+        return missing
+
+    async def is_user_subscribed(self, user_id: int) -> bool:
+        """Yes/no check that stops at the first failing channel"""
+        return not await self.check_user_subscriptions(user_id, short_circuit=True)
+
+    async def _check_channels(
+        self,
+        user_id: int,
+        channels: List[Channel],
+        short_circuit: bool,
+    ) -> Dict[int, CheckStatus]:
+        """Check channels concurrently, optionally cancelling the rest on first failure"""
+        tasks = {
+            asyncio.create_task(self._check_channel(user_id, channel)): channel
+            for channel in channels
+        }
+        statuses: Dict[int, CheckStatus] = {}
+        pending = set(tasks)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    status = task.result()
+                    statuses[tasks[task].id] = status
+                    if short_circuit and status.blocks_user:
+                        return statuses
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return statuses
+
+    async def _check_channel(self, user_id: int, channel: Channel) -> CheckStatus:
+        """Check one channel under the global concurrency limit"""
+        async with _check_semaphore():
+            status = await self._fetch_membership(user_id, channel)
+
+        if status.is_definite:
+            await get_membership_cache().set(user_id, channel.channel_id, status == CheckStatus.SUBSCRIBED)
+        return status
+
+    async def _fetch_membership(self, user_id: int, channel: Channel) -> CheckStatus:
+        """Ask Telegram whether user is a member of channel"""
+        return await fetch_membership(self.bot, user_id, channel.channel_id)
+
+    async def _save_statuses(self, user_id: int, channels: List[Channel], statuses: Dict[int, CheckStatus]) -> None:
+        """Write fresh check results through to user_subscriptions (committed with the update)"""
+        now = datetime.now(timezone.utc)
+        # Users who have not pressed /start yet are skipped by the upsert
+        await self.subscription_repo.upsert_statuses(
+            (user_id, channel.id, statuses[channel.id] == CheckStatus.SUBSCRIBED, now)
+            for channel in channels if statuses[channel.id].is_definite
+        )
+
+
+async def fetch_membership(bot: Bot, user_id: int, chat_id: int) -> CheckStatus:
+    """Ask Telegram whether user is a member of chat"""
+    try:
+        member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+    except TelegramRetryAfter as e:
+        logger.warning("getChatMember flood wait %ss (channel %s)", e.retry_after, chat_id)
+        return CheckStatus.FLOOD_WAIT
+    except TelegramBadRequest as e:
+        if "user not found" in e.message.lower() or "participant_id_invalid" in e.message.lower():
+            return CheckStatus.NOT_SUBSCRIBED
+        logger.error("Channel %s is unavailable: %s", chat_id, e.message)
+        return CheckStatus.CHANNEL_UNAVAILABLE
+    except TelegramForbiddenError as e:
+        logger.error("Bot has no access to channel %s: %s", chat_id, e.message)
+        return CheckStatus.CHANNEL_UNAVAILABLE
+    except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+        logger.warning("getChatMember failed for channel %s: %s", chat_id, e)
+        return CheckStatus.NETWORK_ERROR
+
+    if member.status in NOT_MEMBER_STATUSES:
+        return CheckStatus.NOT_SUBSCRIBED
+    return CheckStatus.SUBSCRIBED
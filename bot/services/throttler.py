@@ -0,0 +1,178 @@
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from bot.config.settings import settings
+from bot.database.tenancy import current_bot_id
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import UPDATES_THROTTLED
+from bot.utils.rate_limit import KeyedTokenBuckets
+from bot.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: bucket hashes..., warning key
+# ARGV: rate (tokens per ms) and burst per bucket..., warning interval (ms)
+# A token is taken from every bucket or from none; returns {allowed, retry_after_ms, warn}
+THROTTLE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local buckets = #KEYS - 1
+local tokens = {}
+local retry = 0
+
+for i = 1, buckets do
+    local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local left = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    left = math.min(burst, left + math.max(0, now - ts) * rate)
+    if left < 1 then
+        retry = math.max(retry, (1 - left) / rate)
+    end
+    tokens[i] = left
+end
+
+if retry > 0 then
+    local warn = redis.call('SET', KEYS[#KEYS], 1, 'NX', 'PX', ARGV[#ARGV])
+    return {0, math.ceil(retry), warn and 1 or 0}
+end
+
+for i = 1, buckets do
+    local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i] - 1), 'ts', now)
+    -- Gone once full again, a missing bucket is a full one
+    redis.call('PEXPIRE', KEYS[i], math.ceil((burst - tokens[i] + 1) / rate))
+end
+return {1, 0, 0}
+"""
+
+
+@dataclass(slots=True)
+class ThrottleDecision:
+    """Outcome of one throttle check"""
+    allowed: bool
+    retry_after: float = 0.0
+    # First refusal within the warning interval, tell the user once
+    warn: bool = False
+
+
+class Throttler:
+    """
+    Per-user and per-(user, command) token buckets of the current bot
+
+    State is in process memory, or in Redis when `shared` (one Lua call
+    per check, atomic across processes); Redis errors fall back to memory
+    """
+
+    KEY_PREFIX = "throttle"
+
+    def __init__(
+        self,
+        user_rate: float,
+        user_burst: int,
+        command_rate: float,
+        command_burst: int,
+        warning_interval: int,
+        max_size: int = 100_000,
+        shared: bool = False,
+    ):
+        self.users = KeyedTokenBuckets(user_rate, user_burst, max_size)
+        self.commands = KeyedTokenBuckets(command_rate, command_burst, max_size)
+        self.warning_interval = warning_interval
+        self.shared = shared
+        self._warned = TTLCache(max_size=max_size)
+        self._script = None
+
+        self.allowed = 0
+        self.throttled = 0
+        self.warnings = 0
+        self.redis_errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Throttle counters for monitoring"""
+        return {
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "warnings": self.warnings,
+            "redis_errors": self.redis_errors,
+            "buckets": len(self.users) + len(self.commands),
+            "shared": self.shared and get_redis() is not None,
+        }
+
+    async def check(self, user_id: int, command: Optional[str] = None) -> ThrottleDecision:
+        """Take a token for the user (and the command), or refuse without taking any"""
+        bot_id = current_bot_id()
+        decision = None
+        if self.shared:
+            decision = await self._check_redis(bot_id, user_id, command)
+        if decision is None:
+            decision = self._check_local(bot_id, user_id, command)
+
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.throttled += 1
+            UPDATES_THROTTLED.inc()
+            if decision.warn:
+                self.warnings += 1
+        return decision
+
+    def _check_local(self, bot_id: int, user_id: int, command: Optional[str]) -> ThrottleDecision:
+        now = time.monotonic()
+        user_key = (bot_id, user_id)
+        buckets: List[Tuple[KeyedTokenBuckets, Any]] = [(self.users, user_key)]
+        if command is not None:
+            buckets.append((self.commands, (bot_id, user_id, command)))
+
+        retry_after = max(store.retry_after(key, now) for store, key in buckets)
+        if retry_after > 0:
+            warn = self._warned.get(user_key) is None
+            if warn:
+                self._warned.set(user_key, True, self.warning_interval)
+            return ThrottleDecision(False, retry_after, warn)
+
+        for store, key in buckets:
+            store.consume(key, now)
+        return ThrottleDecision(True)
+
+    async def _check_redis(self, bot_id: int, user_id: int, command: Optional[str]) -> Optional[ThrottleDecision]:
+        redis = get_redis()
+        if redis is None:
+            return None
+        if self._script is None or self._script.registered_client is not redis:
+            self._script = redis.register_script(THROTTLE_SCRIPT)
+
+        # Same hash tag: every key of a user lives on one cluster slot
+        prefix = f"{self.KEY_PREFIX}:{bot_id}:{{{user_id}}}"
+        keys = [prefix]
+        args: List[Any] = [self.users.rate / 1000, self.users.capacity]
+        if command is not None:
+            keys.append(f"{prefix}:{command}")
+            args += [self.commands.rate / 1000, self.commands.capacity]
+        keys.append(f"{prefix}:warned")
+        args.append(self.warning_interval * 1000)
+
+        try:
+            allowed, retry_ms, warn = await self._script(keys=keys, args=args)
+        except RedisError as e:
+            self.redis_errors += 1
+            logger.warning("Throttle Redis check failed, using local limits: %s", e)
+            return None
+        return ThrottleDecision(bool(allowed), retry_ms / 1000, bool(warn))
+
+
+@lru_cache(maxsize=None)
+def get_throttler() -> Throttler:
+    """Limiter behind ThrottlingMiddleware and /throttle_stats"""
+    return Throttler(
+        user_rate=settings.THROTTLE_USER_RATE,
+        user_burst=settings.THROTTLE_USER_BURST,
+        command_rate=settings.THROTTLE_COMMAND_RATE,
+        command_burst=settings.THROTTLE_COMMAND_BURST,
+        warning_interval=settings.THROTTLE_WARNING_INTERVAL,
+        max_size=settings.THROTTLE_MAX_USERS,
+        shared=settings.THROTTLE_SHARED,
+    )
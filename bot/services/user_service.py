@@ -1,16 +1,28 @@
+import logging
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Optional, Sequence
+from aiogram import Bot
 from bot.database.models import User
 from bot.database.repositories.user_repository import UserRepository
+from bot.database.session import AsyncSessionLocal
+from bot.database.tenancy import current_bot_id
+from bot.services.analytics_writer import get_analytics_writer
+from bot.utils.known_users import get_known_users, profile_fingerprint
+from bot.utils.tracing import trace_methods
 
+logger = logging.getLogger(__name__)
 
+
+@trace_methods("service")
 class UserService:
     """Service for user operations"""
-    
+
     def __init__(self, session: AsyncSession):
         self.session = session
         self.repo = UserRepository(session)
-    
+        self.known_users = get_known_users().for_bot(self.repo.bot_id)
+
     async def get_or_create_user(
         self,
         telegram_id: int,
@@ -19,16 +31,68 @@ class UserService:
         last_name: Optional[str] = None,
         language_code: Optional[str] = None,
     ) -> User:
-        """Get existing user or create new one"""
-        user = await self.repo.get_by_telegram_id(telegram_id)
-        
-        if not user:
-            user = await self.repo.create(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                language_code=language_code,
-            )
-        
-        return user
\ No newline at end of file
+        """Get existing user (refreshing profile) or create new one, in one round-trip"""
+        user, created = await self.repo.upsert(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            language_code=language_code,
+        )
+
+        fingerprint = profile_fingerprint(username, first_name, last_name, language_code)
+
+        def on_commit(_) -> None:
+            self.known_users.add(telegram_id, fingerprint)
+            if created:
+                get_analytics_writer().record_new_user()
+
+        # Remember the user (and count a registration) only once the row is really committed
+        event.listen(self.session.sync_session, "after_commit", on_commit, once=True)
+        return user
+
+    async def ensure_user(
+        self,
+        telegram_id: int,
+        username: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        language_code: Optional[str] = None,
+    ) -> bool:
+        """
+        Make sure user exists with an up to date profile
+        Known users with unchanged profile skip the DB entirely
+        Returns True if the DB was touched
+        """
+        fingerprint = profile_fingerprint(username, first_name, last_name, language_code)
+        if self.known_users.get(telegram_id) == fingerprint:
+            return False
+
+        await self.get_or_create_user(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            language_code=language_code,
+        )
+        return True
+
+    async def mark_blocked(self, telegram_id: int) -> None:
+        """User blocked the bot: no broadcasts until they write again (not committed)"""
+        await self.repo.mark_blocked([telegram_id])
+        # Their next /start must reach upsert, which clears the flag
+        self.known_users.discard(telegram_id)
+
+
+async def warm_up_known_users(bots: Optional[Sequence[Bot]] = None) -> None:
+    """Load registered users of every hosted bot into their known-user sets (blocked ones stay out)"""
+    bot_ids = [bot.id for bot in bots] if bots else [current_bot_id()]
+    known_users = get_known_users()
+    async with AsyncSessionLocal() as session:
+        for bot_id in bot_ids:
+            users = known_users.for_bot(bot_id)
+            async for rows in UserRepository(session, bot_id).iter_profiles():
+                users.extend(
+                    (row[0], profile_fingerprint(*row[1:])) for row in rows
+                )
+    logger.info("Known-user sets warmed up with %s users of %s bots", len(known_users), len(bot_ids))
@@ -0,0 +1,77 @@
+import math
+from typing import Iterable, Optional
+import numpy as np
+
+_MASK_32 = np.uint64(0xFFFFFFFF)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, spreads sequential IDs over all 64 bits"""
+    with np.errstate(over="ignore"):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # frexp is exact on 32-bit halves, float64 would round full 64-bit values
+    high = np.frexp((values >> np.uint64(32)).astype(np.float64))[1]
+    low = np.frexp((values & _MASK_32).astype(np.float64))[1]
+    return np.where(high > 0, high + 32, low)
+
+
+class HyperLogLog:
+    """
+    Distinct counter in 2^precision bytes (16 KB at the default precision, ~0.8% error)
+
+    Sketches of different days merge with `update`, so WAU/MAU come from
+    merging daily sketches instead of scanning interactions
+    """
+
+    def __init__(self, precision: int = 14, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.size, dtype=np.uint8)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(precision=int(math.log2(len(registers))), registers=registers)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    def add_many(self, ids: Iterable[int]) -> None:
+        """Add integer IDs (e.g. telegram IDs)"""
+        ids = np.fromiter(ids, dtype=np.int64) if not isinstance(ids, np.ndarray) else ids
+        if not len(ids):
+            return
+
+        hashed = _mix64(ids)
+        shift = np.uint64(64 - self.precision)
+        index = (hashed >> shift).astype(np.int64)
+        rest = hashed & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, value: int) -> None:
+        self.add_many(np.array([value], dtype=np.int64))
+
+    def update(self, other: "HyperLogLog") -> None:
+        """Merge other sketch into this one (union of both sets)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """Estimated number of distinct IDs added"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
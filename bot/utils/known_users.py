@@ -0,0 +1,121 @@
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from bot.config.settings import settings
+
+
+def profile_fingerprint(*fields: Optional[str]) -> int:
+    """32-bit fingerprint of profile fields (never 0)"""
+    value = zlib.crc32("\x1f".join(field or "" for field in fields).encode())
+    return value or 1
+
+
+class KnownUserSet:
+    """
+    Compact telegram_id -> profile fingerprint map
+
+    Sorted numpy arrays (12 bytes per user) plus a small dict buffer
+    that is merged in batches, so millions of IDs stay cheap in memory
+    """
+
+    def __init__(self, capacity: int = 5_000_000, merge_threshold: int = 10_000):
+        self.capacity = capacity
+        self.merge_threshold = merge_threshold
+        self._ids = np.empty(0, dtype=np.int64)
+        self._fingerprints = np.empty(0, dtype=np.uint32)
+        self._buffer: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._buffer)
+
+    def _index(self, telegram_id: int) -> int:
+        index = int(np.searchsorted(self._ids, telegram_id))
+        if index < len(self._ids) and self._ids[index] == telegram_id:
+            return index
+        return -1
+
+    def get(self, telegram_id: int) -> Optional[int]:
+        """Fingerprint stored for user, None if unknown"""
+        fingerprint = self._buffer.get(telegram_id)
+        if fingerprint is not None:
+            return fingerprint
+
+        index = self._index(telegram_id)
+        return int(self._fingerprints[index]) if index >= 0 else None
+
+    def add(self, telegram_id: int, fingerprint: int) -> None:
+        """Remember user (or their new fingerprint)"""
+        index = self._index(telegram_id)
+        if index >= 0:
+            self._fingerprints[index] = fingerprint
+            return
+
+        if telegram_id not in self._buffer and len(self) >= self.capacity:
+            # Full: unknown users just take the DB path
+            return
+
+        self._buffer[telegram_id] = fingerprint
+        if len(self._buffer) >= self.merge_threshold:
+            self._merge()
+
+    def discard(self, telegram_id: int) -> None:
+        """Forget user's fingerprint, their next update takes the DB path"""
+        self._buffer.pop(telegram_id, None)
+        index = self._index(telegram_id)
+        if index >= 0:
+            # Fingerprints are never 0, so this matches no profile
+            self._fingerprints[index] = 0
+
+    def extend(self, items: Iterable[Tuple[int, int]]) -> None:
+        """Bulk add (telegram_id, fingerprint) pairs, e.g. on warm-up"""
+        for telegram_id, fingerprint in items:
+            self._buffer[telegram_id] = fingerprint
+        self._merge()
+
+    def _merge(self) -> None:
+        if not self._buffer:
+            return
+
+        ids = np.fromiter(self._buffer.keys(), dtype=np.int64, count=len(self._buffer))
+        fingerprints = np.fromiter(self._buffer.values(), dtype=np.uint32, count=len(self._buffer))
+        self._buffer = {}
+
+        order = np.argsort(ids)
+        ids, fingerprints = ids[order], fingerprints[order]
+
+        # Existing IDs get their fingerprint replaced, new ones are inserted in order
+        positions = np.searchsorted(self._ids, ids)
+        in_range = positions < len(self._ids)
+        existing = np.zeros(len(ids), dtype=bool)
+        existing[in_range] = self._ids[positions[in_range]] == ids[in_range]
+        self._fingerprints[positions[existing]] = fingerprints[existing]
+
+        room = max(0, self.capacity - len(self._ids))
+        new = np.flatnonzero(~existing)[:room]
+        self._ids = np.insert(self._ids, positions[new], ids[new])
+        self._fingerprints = np.insert(self._fingerprints, positions[new], fingerprints[new])
+
+
+class KnownUsersByBot:
+    """One KnownUserSet per bot, created on first use"""
+
+    def __init__(self, capacity: int = 5_000_000):
+        self.capacity = capacity
+        self._sets: Dict[int, KnownUserSet] = {}
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._sets.values())
+
+    def for_bot(self, bot_id: int) -> KnownUserSet:
+        """Known users of one bot (capacity applies per bot)"""
+        users = self._sets.get(bot_id)
+        if users is None:
+            users = self._sets[bot_id] = KnownUserSet(capacity=self.capacity)
+        return users
+
+
+@lru_cache(maxsize=None)
+def get_known_users() -> KnownUsersByBot:
+    """Known users of every bot hosted by this process"""
+    return KnownUsersByBot(capacity=settings.KNOWN_USERS_CAPACITY)
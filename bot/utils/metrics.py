@@ -0,0 +1,123 @@
+import time
+from typing import Dict
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.metrics import MetricWrapperBase
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Sub-millisecond steps: most middleware and queries finish well under 10ms
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+UPDATE_SECONDS = Histogram(
+    "bot_update_seconds", "Update processing time, all middlewares and handler", ["update_type"],
+)
+MIDDLEWARE_SECONDS = Histogram(
+    "bot_middleware_seconds", "Time spent in a middleware itself, handler excluded", ["middleware"],
+    buckets=FAST_BUCKETS,
+)
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler time", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised", ["handler", "error"])
+
+DB_QUERY_SECONDS = Histogram(
+    "bot_db_query_seconds", "SQL statement time (cursor execute)", ["operation"], buckets=FAST_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter("bot_db_query_errors_total", "Failed SQL statements", ["operation"])
+# engine: "primary" or "replica", each has its own pool
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "bot_db_pool_checkout_seconds", "Wait for a pooled connection", ["engine"], buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge("bot_db_pool_checked_out", "Connections currently checked out", ["engine"])
+
+UPDATE_WAIT_SECONDS = Histogram(
+    "bot_update_wait_seconds",
+    "Time an accepted update waited: 'key' behind earlier updates of its chat, 'slot' for a free slot",
+    ["stage"],
+    buckets=FAST_BUCKETS + (10.0, 30.0),
+)
+UPDATE_KEY_CONTENDED = Counter("bot_update_key_contended_total", "Updates that arrived while their chat was busy")
+UPDATES_IN_FLIGHT = Gauge("bot_updates_in_flight", "Updates being processed")
+UPDATES_QUEUED = Gauge("bot_updates_queued", "Accepted updates waiting to run")
+UPDATES_THROTTLED = Counter("bot_updates_throttled_total", "Updates dropped by the anti-flood limiter")
+
+API_SECONDS = Histogram(
+    "bot_api_request_seconds", "Bot API call time including scheduler wait and retries", ["method"],
+)
+API_ERRORS = Counter("bot_api_errors_total", "Failed Bot API calls", ["method", "error"])
+OUTBOUND_WAIT_SECONDS = Histogram(
+    "bot_outbound_wait_seconds", "Time a call waited in the outbound scheduler", ["lane"],
+    buckets=FAST_BUCKETS + (10.0, 30.0),
+)
+
+
+class LabelCache:
+    """
+    Bound children of a labelled metric, looked up without the metric's lock
+
+    Only use with labels from a small fixed set (handler, method, operation)
+    """
+
+    def __init__(self, metric: MetricWrapperBase):
+        self.metric = metric
+        self._children: Dict = {}
+
+    def __call__(self, *labels: str):
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = self.metric.labels(*labels)
+        return child
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited, use instrumented_pool() for the class of an engine"""
+
+    checkout_seconds = DB_POOL_CHECKOUT_SECONDS.labels("primary")
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_seconds.observe(time.perf_counter() - started)
+
+
+def instrumented_pool(engine_label: str) -> type:
+    """Pool class recording under engine=`engine_label`; a class, so dispose() keeps it"""
+    return type(
+        f"InstrumentedAsyncPool[{engine_label}]",
+        (InstrumentedAsyncPool,),
+        {"checkout_seconds": DB_POOL_CHECKOUT_SECONDS.labels(engine_label)},
+    )
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def instrument_engine(engine: AsyncEngine, engine_label: str = "primary") -> None:
+    """Record every statement's time and the pool's checked out connections (engine=`engine_label`)"""
+    sync_engine = engine.sync_engine
+    query_seconds = LabelCache(DB_QUERY_SECONDS)
+    query_errors = LabelCache(DB_QUERY_ERRORS)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        query_seconds(_operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        query_errors(_operation(context.statement or "")).inc()
+
+    # The pool is replaced on dispose(), read whichever is current
+    DB_POOL_CHECKED_OUT.labels(engine_label).set_function(
+        lambda: sync_engine.pool.checkedout() if hasattr(sync_engine.pool, "checkedout") else 0
+    )
@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens without waiting, False if not enough"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until tokens are available and take them (FIFO for waiters)"""
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (e.g. after Telegram's retry_after)"""
+        self._refill()
+        # The next token becomes available right when the pause ends
+        self._tokens = min(self._tokens, 1) - seconds * self.rate
+
+
+class KeyedTokenBuckets:
+    """
+    Token bucket per key (user, command) for synchronous checks
+
+    A bucket that has refilled is the same as a new one, so buckets are
+    dropped once idle long enough to be full again; memory follows the
+    keys that were active recently, capped at `max_size`
+    """
+
+    def __init__(self, rate: float, capacity: float, max_size: int = 100_000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        # key -> [tokens, updated], least recently used first
+        self._buckets: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        return min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def retry_after(self, key: Hashable, now: float) -> float:
+        """Seconds until key has a token, 0 if it has one now (nothing is taken)"""
+        tokens = self._tokens(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def consume(self, key: Hashable, now: float) -> None:
+        """Take a token from key"""
+        self._buckets[key] = [self._tokens(key, now) - 1, now]
+        self._buckets.move_to_end(key)
+
+        # Oldest first, stop at the first one that is still refilling
+        while self._buckets:
+            tokens, updated = next(iter(self._buckets.values()))
+            if len(self._buckets) <= self.max_size and tokens + (now - updated) * self.rate < self.capacity:
+                break
+            self._buckets.popitem(last=False)
+
+
+class PriorityTokenBucket:
+    """
+    Token bucket whose waiters are served by priority (lower first), FIFO within a priority
+
+    Callers only queue up when the bucket is empty, so an idle bucket costs
+    one `try_acquire` per call
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.bucket = TokenBucket(rate, capacity)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def waiting(self) -> Dict[int, int]:
+        """Number of queued callers per priority"""
+        return dict(Counter(priority for priority, _, future in self._waiters if not future.done()))
+
+    def pause(self, seconds: float) -> None:
+        """Hold the bucket empty for `seconds`"""
+        self.bucket.pause(seconds)
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for a token behind every caller with the same or a higher priority"""
+        if not self._waiters and self.bucket.try_acquire():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        while self._waiters:
+            await self.bucket.acquire()
+            # Pick the best waiter only once a token is in hand, late high-priority callers win
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
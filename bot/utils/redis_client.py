@@ -0,0 +1,37 @@
+import logging
+from typing import Optional
+from redis.asyncio import Redis
+from bot.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Optional[Redis]:
+    """Get shared Redis client, None if Redis is disabled"""
+    global _redis
+
+    if not settings.REDIS_ENABLED:
+        return None
+
+    if _redis is None:
+        _redis = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        logger.info("Redis client created for %s:%s/%s", settings.REDIS_HOST, settings.REDIS_PORT, settings.REDIS_DB)
+
+    return _redis
+
+
+async def close_redis() -> None:
+    """Close shared Redis client"""
+    global _redis
+
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -0,0 +1,15 @@
+from typing import Any
+import orjson
+
+# json.dumps accepts int keys (turning them into strings), keep that working
+_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def json_dumps(value: Any) -> str:
+    """JSON text for a JSON / JSONB column (orjson, also handles datetime and UUID)"""
+    return orjson.dumps(value, option=_DUMPS_OPTIONS).decode()
+
+
+def json_loads(value: Any) -> Any:
+    """Parse a JSON / JSONB column value"""
+    return orjson.loads(value)
@@ -0,0 +1,87 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from bot.utils.tracing import per_process_path
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """
+    Samples the event loop thread's Python stack from a background thread
+
+    Output is the folded format ("frame;frame;frame count" per line) that
+    flamegraph.pl and speedscope read. Unlike cProfile it costs nothing on
+    the loop itself and is not confused by coroutines switching mid-call.
+    """
+
+    def __init__(self, path: str, interval: float = 0.005, flush_interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self.flush_interval = flush_interval
+
+        self.samples: Counter = Counter()
+        self.idle = 0
+        self._target: Optional[int] = None
+        self._output = path
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def start(self) -> None:
+        """Dispatcher startup hook, samples the thread it is called from"""
+        if self._thread is not None:
+            return
+        self._target = threading.get_ident()
+        self._output = per_process_path(self.path)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        logger.info("Stack sampler every %sms -> %s", self.interval * 1000, self._output)
+
+    async def stop(self) -> None:
+        """Dispatcher shutdown hook"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        flushed = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.monotonic() - flushed >= self.flush_interval:
+                self.flush()
+                flushed = time.monotonic()
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self._target)
+        if frame is None:
+            return
+        # Waiting in select() is the loop being idle, not a hotspot
+        if frame.f_code.co_name in ("select", "poll") and "selectors" in frame.f_code.co_filename:
+            self.idle += 1
+            return
+
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def flush(self) -> None:
+        """Rewrite the folded stacks file with everything sampled so far"""
+        if not self.samples:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self._output)), exist_ok=True)
+        temporary = f"{self._output}.tmp"
+        with open(temporary, "w", encoding="utf-8") as stream:
+            for stack, count in self.samples.most_common():
+                stream.write(f"{stack} {count}\n")
+        os.replace(temporary, self._output)
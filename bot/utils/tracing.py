@@ -0,0 +1,199 @@
+import functools
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """Timed section of an update, children nest inside it"""
+    name: str
+    category: str
+    start: float
+    end: float = 0.0
+    args: Optional[Dict[str, Any]] = None
+    children: List["Span"] = field(default_factory=list)
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def tracing() -> bool:
+    """True inside a traced update"""
+    return _current.get() is not None
+
+
+def start_trace(name: str, category: str = "update", **args: Any) -> Tuple[Span, Token]:
+    """Open a root span, spans opened below it (same task or tasks it starts) become its children"""
+    root = Span(name, category, time.perf_counter(), args=args or None)
+    return root, _current.set(root)
+
+
+def finish_trace(root: Span, token: Token) -> None:
+    root.end = time.perf_counter()
+    _current.reset(token)
+
+
+@contextmanager
+def span(name: str, category: str = "", **args: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one, no-op outside a traced update"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, category, time.perf_counter(), args=args or None)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current.reset(token)
+
+
+def traced(category: str, name: Optional[str] = None):
+    """Decorator: run an async function inside a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await func(*args, **kwargs)
+            with span(span_name, category):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(category: str):
+    """Class decorator: trace every public async method"""
+    def decorator(cls):
+        for attribute, value in list(vars(cls).items()):
+            if not attribute.startswith("_") and inspect.iscoroutinefunction(value):
+                setattr(cls, attribute, traced(category)(value))
+        return cls
+
+    return decorator
+
+
+def trace_engine(engine: AsyncEngine, statement_length: int = 200) -> None:
+    """Every SQL statement run inside a traced update becomes a span"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current.get()
+        if parent is None:
+            return
+        child = Span(
+            statement.lstrip()[:16].split(None, 1)[0].upper() if statement.strip() else "SQL",
+            "query",
+            time.perf_counter(),
+            args={"statement": statement[:statement_length], "executemany": executemany},
+        )
+        parent.children.append(child)
+        conn.info.setdefault("trace_spans", []).append(child)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end = time.perf_counter()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            failed = spans.pop()
+            failed.end = time.perf_counter()
+            failed.args["error"] = type(context.original_exception).__name__
+
+
+def per_process_path(path: str) -> str:
+    """Worker processes get their own file, pid added before the extension"""
+    if multiprocessing.parent_process() is None:
+        return path
+    base, extension = os.path.splitext(path)
+    return f"{base}.{os.getpid()}{extension}"
+
+
+def to_chrome_events(root: Span, pid: int, tid: int) -> List[Dict[str, Any]]:
+    """Complete ("X") events of the Chrome trace event format, one thread per update"""
+    wall_start = time.time() - (time.perf_counter() - root.start)
+    events: List[Dict[str, Any]] = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": root.name}},
+    ]
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        end = current.end or root.end
+        item = {
+            "name": current.name,
+            "cat": current.category,
+            "ph": "X",
+            "ts": round((wall_start + current.start - root.start) * 1e6, 1),
+            "dur": round((end - current.start) * 1e6, 1),
+            "pid": pid,
+            "tid": tid,
+        }
+        if current.args:
+            item["args"] = current.args
+        events.append(item)
+        stack.extend(current.children)
+    return events
+
+
+class TraceFileHandler(RotatingFileHandler):
+    """Rotating file in Chrome's JSON array trace format, the closing bracket is optional there"""
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+
+class TraceWriter:
+    """Appends traces to a rotating file that opens as-is in Perfetto / chrome://tracing"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written = 0
+        self._logger: Optional[logging.Logger] = None
+
+    def _open(self) -> logging.Logger:
+        path = per_process_path(self.path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        handler = TraceFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger = logging.getLogger(f"{__name__}.file.{path}")
+        trace_logger.propagate = False
+        trace_logger.setLevel(logging.INFO)
+        trace_logger.handlers = [handler]
+        return trace_logger
+
+    def write(self, root: Span, tid: int) -> None:
+        if self._logger is None:
+            self._logger = self._open()
+        events = to_chrome_events(root, os.getpid(), tid)
+        self._logger.info(",\n".join(json.dumps(item, default=str) for item in events) + ",")
+        self.written += 1
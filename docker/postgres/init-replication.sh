@@ -0,0 +1,11 @@
+#!/bin/sh
+# Runs once on a fresh primary volume: replication role, slot and pg_hba entry
+# for the postgres-replica service (docker compose --profile replica up)
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE ${POSTGRES_REPLICATION_USER:-replicator} WITH REPLICATION LOGIN PASSWORD '${POSTGRES_REPLICATION_PASSWORD:-replicator}';
+    SELECT pg_create_physical_replication_slot('bot_replica');
+EOSQL
+
+echo "host replication ${POSTGRES_REPLICATION_USER:-replicator} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,76 @@
+"""
+Shared test setup: settings for a throwaway environment, `async def` tests
+run with asyncio.run, and an empty schema per test (in-memory SQLite, plus
+PostgreSQL when TEST_POSTGRES_URL is set)
+"""
+import asyncio
+import inspect
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+# Before anything imports bot.config.settings
+os.environ.setdefault("BOT_TOKEN", "1000:test")
+os.environ.setdefault("ADMIN_USER_ID", "1")
+os.environ.setdefault("USE_SQLITE", "True")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="bot-tests-"), "bot.db"))
+os.environ.setdefault("REDIS_ENABLED", "False")
+os.environ.setdefault("METRICS_ENABLED", "False")
+os.environ.setdefault("KNOWN_USERS_WARMUP", "False")
+os.environ.setdefault("DEBUG", "False")
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from bot.database.models import Base
+from bot.utils.serialization import json_dumps, json_loads
+
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run `async def` tests in a fresh event loop"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    names = pyfuncitem._fixtureinfo.argnames
+    asyncio.run(pyfuncitem.obj(**{name: pyfuncitem.funcargs[name] for name in names}))
+    return True
+
+
+@asynccontextmanager
+async def _schema(url: str):
+    if url.startswith("sqlite"):
+        # One connection, so every session sees the same in-memory database
+        engine = create_async_engine(
+            url, poolclass=StaticPool, connect_args={"check_same_thread": False},
+            json_serializer=json_dumps, json_deserializer=json_loads,
+        )
+    else:
+        engine = create_async_engine(url, json_serializer=json_dumps, json_deserializer=json_loads)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    finally:
+        if not url.startswith("sqlite"):
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+@pytest.fixture
+def database():
+    """`async with database() as session_factory`: empty in-memory SQLite schema"""
+    return lambda: _schema("sqlite+aiosqlite://")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def any_database(request):
+    """Like `database`, once per dialect (PostgreSQL only with TEST_POSTGRES_URL)"""
+    if request.param == "sqlite":
+        return lambda: _schema("sqlite+aiosqlite://")
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    return lambda: _schema(TEST_POSTGRES_URL)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from sqlalchemy import func, select
+from bot.database.models import DailyStats, User, UserInteraction
+from bot.database.tenancy import current_bot_id
+from bot.services.analytics_writer import AnalyticsWriter, InteractionEvent
+
+
+async def _add_users(session_factory, *telegram_ids):
+    async with session_factory() as session:
+        session.add_all(User(bot_id=current_bot_id(), telegram_id=telegram_id) for telegram_id in telegram_ids)
+        await session.commit()
+
+
+async def _count(session_factory, model) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        AnalyticsWriter(None, overflow_policy="spill")
+
+
+async def test_submit_while_stopped_is_dropped(database):
+    async with database() as session_factory:
+        writer = AnalyticsWriter(session_factory)
+        await writer.submit(InteractionEvent(1, "message"))
+        assert writer.stats()["dropped"] == 1
+        assert writer.stats()["written"] == 0
+
+
+async def test_drop_policy_drops_overflow(database):
+    async with database() as session_factory:
+        await _add_users(session_factory, 1)
+        writer = AnalyticsWriter(session_factory, flush_interval=0.01, queue_size=2, overflow_policy="drop")
+        await writer.start()
+        # submit never yields under "drop", so the flush loop cannot drain the queue in between
+        for _ in range(5):
+            await writer.submit(InteractionEvent(1, "message"))
+        await writer.stop()
+
+        assert writer.stats()["dropped"] == 3
+        assert writer.stats()["written"] == 2
+        assert await _count(session_factory, UserInteraction) == 2
+
+
+async def test_block_policy_waits_for_room(database):
+    async with database() as session_factory:
+        await _add_users(session_factory, 1)
+        writer = AnalyticsWriter(
+            session_factory, batch_size=2, flush_interval=0.01, queue_size=2, overflow_policy="block",
+        )
+        await writer.start()
+        await asyncio.wait_for(
+            asyncio.gather(*(writer.submit(InteractionEvent(1, "message")) for _ in range(10))), timeout=5,
+        )
+        await writer.stop()
+
+        assert writer.stats()["dropped"] == 0
+        assert writer.stats()["written"] == 10
+        assert await _count(session_factory, UserInteraction) == 10
+
+
+async def test_flush_skips_unknown_users_and_counts_registrations(database):
+    async with database() as session_factory:
+        await _add_users(session_factory, 1)
+        writer = AnalyticsWriter(session_factory, flush_interval=0.01)
+        await writer.start()
+        writer.record_new_user()
+        await writer.submit(InteractionEvent(1, "message"))
+        await writer.submit(InteractionEvent(2, "message"))
+        await writer.stop()
+
+        assert await _count(session_factory, UserInteraction) == 1
+        async with session_factory() as session:
+            assert await session.scalar(select(func.sum(DailyStats.new_users))) == 1
@@ -0,0 +1,70 @@
+from datetime import date
+import numpy as np
+import pytest
+from bot.database.repositories.stats_repository import StatsRepository
+from bot.utils.hll import HyperLogLog
+
+
+@pytest.mark.parametrize("n", [0, 1, 1_000, 50_000, 1_000_000])
+def test_count_is_close(n):
+    sketch = HyperLogLog()
+    sketch.add_many(np.arange(1, n + 1, dtype=np.int64))
+    assert abs(sketch.count() - n) <= max(1, 0.03 * n)
+
+
+def test_sequential_telegram_ids_are_spread():
+    # Real IDs are large and dense, the hash must not map them to few registers
+    sketch = HyperLogLog()
+    sketch.add_many(np.arange(6_000_000_000, 6_000_100_000, dtype=np.int64))
+    assert abs(sketch.count() - 100_000) <= 3_000
+
+
+def test_duplicates_do_not_count():
+    sketch = HyperLogLog()
+    sketch.add_many(range(10_000))
+    before = sketch.count()
+    sketch.add_many(range(10_000))
+    for value in range(100):
+        sketch.add(value)
+    assert sketch.count() == before
+
+
+def test_merge_is_union():
+    monday, tuesday, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    monday.add_many(range(0, 60_000))
+    tuesday.add_many(range(40_000, 100_000))
+    both.add_many(range(0, 100_000))
+
+    monday.update(tuesday)
+    assert monday.count() == both.count()
+    assert abs(monday.count() - 100_000) <= 3_000
+
+
+def test_merge_needs_same_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=14).update(HyperLogLog(precision=12))
+
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(precision=12)
+    sketch.add_many(range(5_000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert len(sketch.to_bytes()) == 1 << 12
+    assert restored.precision == 12
+    assert restored.count() == sketch.count()
+
+
+async def test_record_day_merges_stored_sketch(any_database):
+    day = date(2024, 1, 1)
+    async with any_database() as session_factory:
+        for first, last in ((0, 600), (400, 1_000)):
+            sketch = HyperLogLog()
+            sketch.add_many(range(first, last))
+            async with session_factory() as session:
+                await StatsRepository(session, 1).record_day(day, new_users=1, active=sketch)
+                await session.commit()
+
+        async with session_factory() as session:
+            (stats,) = await StatsRepository(session, 1).get_days(day, day)
+        assert stats.new_users == 2
+        assert abs(HyperLogLog.from_bytes(stats.active_users_hll).count() - 1_000) <= 30
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+import pytest
+from benchmarks.import_time import LAZY_MODULES, ROOT, TARGETS
+
+CHECKS = {
+    # Settings are read on first use, not by any import
+    "modules": "from bot.config.settings import get_settings\nassert get_settings.cache_info().currsize == 0",
+    "import": f"import sys\nassert not [m for m in {LAZY_MODULES!r} if m in sys.modules], sorted(sys.modules)",
+}
+
+
+@pytest.mark.parametrize("target", ["import", "modules"])
+def test_imports_need_no_settings(target, tmp_path):
+    # Outside the project (no .env) and without the required settings
+    env = {name: value for name, value in os.environ.items() if name not in ("BOT_TOKEN", "ADMIN_USER_ID")}
+    env["PYTHONPATH"] = ROOT
+    process = subprocess.run(
+        [sys.executable, "-c", TARGETS[target] + "\n" + CHECKS[target]],
+        env=env, cwd=tmp_path, capture_output=True, text=True,
+    )
+    assert process.returncode == 0, process.stderr[-2000:]
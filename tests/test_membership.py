@@ -0,0 +1,166 @@
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from aiogram import Bot
+from aiogram.types import ChatMemberUpdated
+from sqlalchemy import select, update
+from benchmarks.fake_session import FakeTelegramSession
+from bot.database.models import Channel, User, UserSubscription
+from bot.database.tenancy import use_bot
+from bot.handlers.channel import membership
+from bot.services.membership_cache import MembershipCache
+from bot.services.membership_sync import MembershipSweeper, MembershipWriter
+from bot.utils.rate_limit import TokenBucket
+
+BOT_ID = 1000
+CHANNEL = -1001
+OTHER_CHAT = -1002
+
+_update_dates = itertools.count(int(time.time()))
+
+
+def chat_member_updated(user_id: int, chat_id: int, status: str) -> ChatMemberUpdated:
+    user = {"id": user_id, "is_bot": False, "first_name": "User"}
+    new_member = {"status": status, "user": user}
+    if status == "kicked":
+        new_member["until_date"] = 0
+    elif status == "creator":
+        new_member["is_anonymous"] = False
+    return ChatMemberUpdated.model_validate({
+        "chat": {"id": chat_id, "type": "channel", "title": "Channel"},
+        "from": user,
+        "date": next(_update_dates),
+        "old_chat_member": {"status": "left" if status != "left" else "member", "user": user},
+        "new_chat_member": new_member,
+    })
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = MembershipCache(max_size=1_000, ttl_subscribed=600, ttl_not_subscribed=30)
+    monkeypatch.setattr(membership, "get_membership_cache", lambda: cache)
+    monkeypatch.setattr("bot.services.membership_sync.get_membership_cache", lambda: cache)
+    monkeypatch.setattr(membership, "_channel_ids", type(membership._channel_ids)(max_size=1_000))
+    return cache
+
+
+async def _setup(session_factory, user_ids=(10, 11, 12)) -> int:
+    async with session_factory() as session:
+        session.add_all(User(bot_id=BOT_ID, telegram_id=user_id) for user_id in user_ids)
+        channel = Channel(bot_id=BOT_ID, channel_id=CHANNEL, channel_title="Channel", is_active=True)
+        session.add_all([channel, Channel(bot_id=BOT_ID, channel_id=OTHER_CHAT, channel_title="Off", is_active=False)])
+        await session.commit()
+        return channel.id
+
+
+async def _statuses(session_factory):
+    async with session_factory() as session:
+        result = await session.execute(
+            select(UserSubscription.user_id, UserSubscription.is_subscribed).where(UserSubscription.bot_id == BOT_ID)
+        )
+        return dict(result.all())
+
+
+async def _feed(session_factory, monkeypatch, *events):
+    writer = MembershipWriter(session_factory, flush_interval=0.01)
+    monkeypatch.setattr(membership, "get_membership_writer", lambda: writer)
+    await writer.start()
+    with use_bot(BOT_ID):
+        async with session_factory() as session:
+            for event in events:
+                await membership.on_chat_member(event, session)
+    await writer.stop()
+    return writer
+
+
+async def test_join_and_leave_are_recorded(database, cache, monkeypatch):
+    async with database() as session_factory:
+        await _setup(session_factory)
+        await _feed(
+            session_factory, monkeypatch,
+            chat_member_updated(10, CHANNEL, "member"),
+            chat_member_updated(11, CHANNEL, "creator"),
+            chat_member_updated(12, CHANNEL, "member"),
+            chat_member_updated(12, CHANNEL, "left"),
+        )
+
+        assert await _statuses(session_factory) == {10: True, 11: True, 12: False}
+        assert await cache.get(10, CHANNEL) is True
+        assert await cache.get(12, CHANNEL) is False
+
+
+@pytest.mark.parametrize("status", ["left", "kicked"])
+async def test_not_member_statuses(database, cache, monkeypatch, status):
+    async with database() as session_factory:
+        await _setup(session_factory)
+        await _feed(session_factory, monkeypatch, chat_member_updated(10, CHANNEL, status))
+        assert await _statuses(session_factory) == {10: False}
+        assert await cache.get(10, CHANNEL) is False
+
+
+async def test_other_chats_are_ignored(database, cache, monkeypatch):
+    async with database() as session_factory:
+        await _setup(session_factory)
+        writer = await _feed(
+            session_factory, monkeypatch,
+            # Inactive required channel, then a chat the bot does not track
+            chat_member_updated(10, OTHER_CHAT, "member"),
+            chat_member_updated(10, -1003, "member"),
+        )
+        assert await _statuses(session_factory) == {}
+        assert await cache.get(10, OTHER_CHAT) is None
+        assert writer.stats()["written"] == 0
+
+
+async def test_unknown_users_are_skipped(database, cache, monkeypatch):
+    async with database() as session_factory:
+        await _setup(session_factory)
+        writer = await _feed(session_factory, monkeypatch, chat_member_updated(99, CHANNEL, "member"))
+        assert await _statuses(session_factory) == {}
+        assert writer.stats()["skipped"] == 1
+        # The cache still answers the next check
+        assert await cache.get(99, CHANNEL) is True
+
+
+async def test_older_change_does_not_overwrite(database, cache):
+    async with database() as session_factory:
+        channel_id = await _setup(session_factory)
+        now = datetime.now(timezone.utc)
+        writer = MembershipWriter(session_factory, flush_interval=0.01)
+        await writer.start()
+        with use_bot(BOT_ID):
+            for change in (
+                membership.MembershipChange(10, channel_id, False, now),
+                membership.MembershipChange(10, channel_id, True, now - timedelta(seconds=5)),
+            ):
+                await writer.submit(change)
+        await writer.stop()
+        assert await _statuses(session_factory) == {10: False}
+
+
+async def test_sweep_repairs_missed_updates(database, cache, monkeypatch):
+    async with database() as session_factory:
+        await _setup(session_factory)
+        await _feed(
+            session_factory, monkeypatch,
+            chat_member_updated(10, CHANNEL, "member"),
+            chat_member_updated(11, CHANNEL, "member"),
+        )
+        async with session_factory() as session:
+            await session.execute(update(UserSubscription).values(checked_at=datetime.now(timezone.utc) - timedelta(days=2)))
+            await session.commit()
+
+        # Both left while the bot was not getting updates
+        telegram = FakeTelegramSession(member_status="left")
+        bot = Bot(f"{BOT_ID}:test", session=telegram)
+        sweeper = MembershipSweeper(session_factory, min_age=86400)
+        with use_bot(BOT_ID):
+            assert await sweeper.sweep_page(bot, TokenBucket(1000, 1000)) == 2
+            # Freshly checked pairs are not claimed again
+            assert await sweeper.sweep_page(bot, TokenBucket(1000, 1000)) == 0
+
+        assert telegram.calls["GetChatMember"] == 2
+        assert sweeper.stats() == {"checked": 2, "changed": 2}
+        assert await _statuses(session_factory) == {10: False, 11: False}
+        assert await cache.get(10, CHANNEL) is False
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import text
+from bot.services.partition_manager import ARCHIVE_COLUMNS, InteractionPartitionManager, partition_name
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+async def test_archive_keeps_bot_id(any_database, tmp_path):
+    async with any_database() as session_factory:
+        engine = session_factory.kw["bind"]
+        if engine.dialect.name != "postgresql":
+            pytest.skip("Partitions are archived on PostgreSQL only")
+
+        name = partition_name(datetime(2020, 1, 1).date())
+        async with engine.connect() as conn:
+            # Stands in for a detached monthly partition
+            await conn.execute(text(f"CREATE TABLE {name} (LIKE user_interactions INCLUDING DEFAULTS)"))
+            try:
+                await conn.execute(
+                    text(
+                        f"INSERT INTO {name} (bot_id, user_id, interaction_type, metadata, created_at) "
+                        "VALUES (:bot_id, :user_id, 'message', '{\"a\": 1}', :created_at)"
+                    ),
+                    [
+                        {"bot_id": bot_id, "user_id": 10, "created_at": datetime(2020, 1, 5, tzinfo=timezone.utc)}
+                        for bot_id in (1, 2, 2)
+                    ],
+                )
+                await conn.commit()
+
+                manager = InteractionPartitionManager(engine, archive_dir=str(tmp_path), chunk_size=2)
+                assert await manager._export(conn, name) == 3
+            finally:
+                await conn.execute(text(f"DROP TABLE {name}"))
+                await conn.commit()
+
+        archive = pq.read_table(tmp_path / f"{name}.parquet")
+        assert archive.column_names == ARCHIVE_COLUMNS
+        assert "bot_id" in archive.column_names
+        assert sorted(archive.column("bot_id").to_pylist()) == [1, 2, 2]
+        assert archive.column("metadata").to_pylist() == ['{"a": 1}'] * 3
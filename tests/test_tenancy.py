@@ -0,0 +1,132 @@
+import asyncio
+from datetime import date
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from benchmarks.fake_session import FakeTelegramSession, UpdateFactory
+from bot.database.repositories.channel_repository import ChannelRepository
+from bot.database.repositories.stats_repository import StatsRepository
+from bot.database.repositories.subscription_repository import SubscriptionRepository
+from bot.database.repositories.user_repository import UserRepository
+from bot.database.tenancy import bot_id_from_token, current_bot_id, default_bot_id, use_bot
+from bot.middlewares.tenant import TenantMiddleware
+from bot.utils.known_users import KnownUsersByBot
+
+
+def test_bot_id_from_token():
+    assert bot_id_from_token("123456:AAE-secret") == 123456
+    assert default_bot_id() == 1000
+
+
+async def test_use_bot_scopes_context_and_tasks():
+    assert current_bot_id() == 1000
+    with use_bot(2000):
+        assert current_bot_id() == 2000
+        # Tasks copy the context they were started in
+        assert await asyncio.create_task(asyncio.sleep(0, current_bot_id())) == 2000
+        with use_bot(3000):
+            assert current_bot_id() == 3000
+        assert current_bot_id() == 2000
+    assert current_bot_id() == 1000
+
+
+async def test_repositories_default_to_current_bot(database):
+    async with database() as session_factory:
+        async with session_factory() as session:
+            with use_bot(2000):
+                repo = UserRepository(session)
+            assert repo.bot_id == 2000
+            assert UserRepository(session).bot_id == 1000
+            assert ChannelRepository(session, 3000).bot_id == 3000
+
+
+async def test_users_are_scoped_per_bot(database):
+    async with database() as session_factory:
+        async with session_factory() as session:
+            first, second = UserRepository(session, 1), UserRepository(session, 2)
+            for telegram_id in (10, 11):
+                await first.upsert(telegram_id, first_name="A")
+            await second.upsert(10, first_name="B")
+            await session.commit()
+
+            assert await first.get_total_users() == 2
+            assert await second.get_total_users() == 1
+            assert (await second.get_by_telegram_id(10)).first_name == "B"
+            assert await second.get_by_telegram_id(11) is None
+            assert [telegram_id for _, telegram_id in await second.get_recipients_page(0, 10)] == [10]
+
+            await first.mark_blocked([10])
+            await session.commit()
+            assert [telegram_id for _, telegram_id in await first.get_recipients_page(0, 10)] == [11]
+            assert not (await second.get_by_telegram_id(10)).is_blocked
+
+
+async def test_channels_and_subscriptions_are_scoped_per_bot(database):
+    async with database() as session_factory:
+        async with session_factory() as session:
+            # Both bots require the same Telegram channel
+            first, second = ChannelRepository(session, 1), ChannelRepository(session, 2)
+            channel = await first.create(-100, channel_title="Shared")
+            other = await second.create(-100, channel_title="Shared")
+            await first.create(-200, channel_title="Only first")
+            for bot_id in (1, 2):
+                await UserRepository(session, bot_id).upsert(10)
+            await SubscriptionRepository(session, 1).upsert_statuses([(10, channel.id, True, channel.created_at)])
+            await session.commit()
+
+            assert {c.channel_id for c in await first.get_active_channels()} == {-100, -200}
+            assert [c.channel_id for c in await second.get_active_channels()] == [-100]
+            assert (await second.get_by_id(-100)).id == other.id
+            assert await second.get_by_id(-200) is None
+            assert await SubscriptionRepository(session, 1).get_statuses(10, [channel.id]) == {channel.id: True}
+            assert await SubscriptionRepository(session, 2).get_statuses(10, [other.id]) == {}
+
+
+async def test_stats_are_scoped_per_bot(database):
+    day = date(2024, 1, 1)
+    async with database() as session_factory:
+        async with session_factory() as session:
+            first, second = StatsRepository(session, 1), StatsRepository(session, 2)
+            await first.record_day(day, new_users=3)
+            await first.add_interaction_counts({(day, "message"): 5})
+            await second.record_day(day, new_users=1)
+            await session.commit()
+
+            assert await first.get_total_users() == 3
+            assert await second.get_total_users() == 1
+            assert await second.get_interaction_counts(day, day) == {}
+
+            await first.clear()
+            await session.commit()
+            assert await first.get_total_users() == 0
+            assert await second.get_total_users() == 1
+
+
+def test_known_users_per_bot():
+    known_users = KnownUsersByBot(capacity=10)
+    known_users.for_bot(1).add(10, 111)
+    known_users.for_bot(2).add(10, 222)
+    known_users.for_bot(2).add(11, 333)
+
+    assert known_users.for_bot(1).get(10) == 111
+    assert known_users.for_bot(2).get(10) == 222
+    assert known_users.for_bot(1).get(11) is None
+    assert known_users.for_bot(1) is known_users.for_bot(1)
+    assert len(known_users) == 3
+
+
+async def test_updates_run_as_the_receiving_bot():
+    session = FakeTelegramSession()
+    bots = [Bot(f"{bot_id}:test", session=session) for bot_id in (1000, 2000)]
+    dispatcher = Dispatcher()
+    dispatcher.update.outer_middleware(TenantMiddleware())
+    seen = []
+
+    @dispatcher.message()
+    async def record(message: Message):
+        seen.append((message.from_user.id, current_bot_id()))
+
+    updates = UpdateFactory()
+    for bot in bots:
+        await dispatcher.feed_raw_update(bot, updates.message(10, "hi"))
+    assert seen == [(10, 1000), (10, 2000)]
+    assert current_bot_id() == 1000
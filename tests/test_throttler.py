@@ -0,0 +1,129 @@
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery
+from redis.exceptions import ConnectionError as RedisConnectionError
+from benchmarks.fake_session import FakeTelegramSession, UpdateFactory
+from bot.database.tenancy import use_bot
+from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.services import throttler as throttler_module
+from bot.services.throttler import Throttler
+
+# Command bucket runs out on the third /start, the user bucket on the fifth update
+CALLS = ["/start", "/start", "/start", None, None, "/help"]
+EXPECTED = [(True, False), (True, False), (False, True), (True, False), (False, False), (False, False)]
+
+
+def make_throttler(shared: bool) -> Throttler:
+    return Throttler(
+        user_rate=0.5, user_burst=3, command_rate=0.1, command_burst=2, warning_interval=10, shared=shared,
+    )
+
+
+@pytest.fixture(params=["local", "redis"])
+def throttler(request, monkeypatch):
+    """Same limits, checked in memory or by the Lua script on a fake Redis"""
+    if request.param == "local":
+        monkeypatch.setattr(throttler_module, "get_redis", lambda: None)
+        return make_throttler(shared=False)
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(throttler_module, "get_redis", lambda: redis)
+    return make_throttler(shared=True)
+
+
+async def _run(throttler: Throttler, calls):
+    return [await throttler.check(7, command) for command in calls]
+
+
+async def test_decisions(throttler):
+    decisions = await _run(throttler, CALLS)
+    assert [(decision.allowed, decision.warn) for decision in decisions] == EXPECTED
+    assert throttler.stats()["allowed"] == 3
+    assert throttler.stats()["throttled"] == 3
+    assert throttler.stats()["warnings"] == 1
+    assert throttler.stats()["redis_errors"] == 0
+
+
+async def test_retry_after(throttler):
+    decisions = await _run(throttler, CALLS)
+    # Command bucket: 1 token at 0.1/s; user bucket: 1 token at 0.5/s
+    assert decisions[2].retry_after == pytest.approx(10, abs=0.1)
+    assert decisions[4].retry_after == pytest.approx(2, abs=0.1)
+    assert all(decision.retry_after == 0 for decision in decisions if decision.allowed)
+
+
+async def test_users_and_bots_are_separate(throttler):
+    await _run(throttler, CALLS)
+    assert (await throttler.check(8, "/start")).allowed
+    with use_bot(2000):
+        assert [(d.allowed, d.warn) for d in await _run(throttler, CALLS)] == EXPECTED
+
+
+async def test_lua_script_matches_local_limits(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(throttler_module, "get_redis", lambda: redis)
+    shared, local = make_throttler(shared=True), make_throttler(shared=False)
+
+    calls = ["/start", None, "/start", "/report", None, "/start", None, "/report", None]
+    for user_id in (1, 2):
+        for command in calls:
+            remote_decision = await shared.check(user_id, command)
+            local_decision = local._check_local(1000, user_id, command)
+            assert (remote_decision.allowed, remote_decision.warn) == (local_decision.allowed, local_decision.warn)
+            assert remote_decision.retry_after == pytest.approx(local_decision.retry_after, abs=0.1)
+    assert await redis.exists("throttle:1000:{1}", "throttle:1000:{1}:/start") == 2
+
+
+class _FailingRedis:
+    def register_script(self, script):
+        async def call(keys, args):
+            raise RedisConnectionError("down")
+        call.registered_client = self
+        return call
+
+
+async def test_redis_errors_fall_back_to_local(monkeypatch):
+    redis = _FailingRedis()
+    monkeypatch.setattr(throttler_module, "get_redis", lambda: redis)
+    throttler = make_throttler(shared=True)
+    decisions = await _run(throttler, CALLS)
+    assert [(decision.allowed, decision.warn) for decision in decisions] == EXPECTED
+    assert throttler.stats()["redis_errors"] == len(CALLS)
+
+
+class _RecordingSession(FakeTelegramSession):
+    def __init__(self):
+        super().__init__()
+        self.methods = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.methods.append(method)
+        return await super().make_request(bot, method, timeout)
+
+
+async def test_throttled_callback_queries_are_answered(monkeypatch):
+    monkeypatch.setattr(throttler_module, "get_redis", lambda: None)
+    throttler = Throttler(user_rate=0.001, user_burst=1, command_rate=1, command_burst=1, warning_interval=10)
+    dispatcher = Dispatcher()
+    dispatcher.update.outer_middleware(ThrottlingMiddleware(throttler))
+
+    @dispatcher.callback_query()
+    async def on_button(callback: CallbackQuery):
+        await callback.answer("ok")
+
+    session = _RecordingSession()
+    bot = Bot("1000:test", session=session)
+    updates = UpdateFactory()
+    for _ in range(3):
+        await dispatcher.feed_raw_update(bot, updates.callback_query(7, "button"))
+
+    answers = [method.text for method in session.methods if isinstance(method, AnswerCallbackQuery)]
+    # Handled, refused with the warning, refused silently (no spinner left either way)
+    assert len(answers) == 3
+    assert answers[0] == "ok"
+    assert answers[1].startswith("⏳")
+    assert answers[2] is None
@@ -0,0 +1,132 @@
+from aiogram import Bot, Dispatcher
+from benchmarks.fake_session import FakeTelegramSession
+from bot.database.repositories.user_repository import UserRepository
+from bot.database.tenancy import use_bot
+from bot.handlers.user import bot_status
+from bot.middlewares.database import DatabaseMiddleware
+from bot.middlewares.tenant import TenantMiddleware
+from bot.services.user_service import UserService
+from bot.utils.known_users import KnownUserSet
+
+
+async def test_upsert_reports_created_once(any_database):
+    async with any_database() as session_factory:
+        async with session_factory() as session:
+            user, created = await UserRepository(session, 1).upsert(10, first_name="Ali", username="ali")
+            await session.commit()
+        assert created
+        assert (user.telegram_id, user.first_name) == (10, "Ali")
+
+        async with session_factory() as session:
+            user, created = await UserRepository(session, 1).upsert(10, first_name="Vali")
+            await session.commit()
+        assert not created
+        # Fields not passed keep their stored value
+        assert (user.first_name, user.username) == ("Vali", "ali")
+
+
+async def test_upsert_without_profile_fields(any_database):
+    async with any_database() as session_factory:
+        async with session_factory() as session:
+            repo = UserRepository(session, 1)
+            assert (await repo.upsert(10))[1]
+            user, created = await repo.upsert(10)
+            await session.commit()
+        assert not created
+        assert user.telegram_id == 10
+
+
+async def test_upsert_same_telegram_id_in_other_bot_is_new(any_database):
+    async with any_database() as session_factory:
+        async with session_factory() as session:
+            assert (await UserRepository(session, 1).upsert(10, first_name="Ali"))[1]
+            user, created = await UserRepository(session, 2).upsert(10, first_name="Ali")
+            await session.commit()
+        assert created
+        assert user.bot_id == 2
+
+
+async def test_upsert_clears_blocked_flag(any_database):
+    async with any_database() as session_factory:
+        async with session_factory() as session:
+            repo = UserRepository(session, 1)
+            for telegram_id in (10, 11):
+                await repo.upsert(telegram_id, first_name="Ali")
+            await repo.mark_blocked([10])
+            await session.commit()
+            assert [telegram_id for _, telegram_id in await repo.get_recipients_page(0, 10)] == [11]
+
+            # Unblocked the bot and sent /start
+            user, created = await repo.upsert(10, first_name="Ali")
+            await session.commit()
+        assert not created
+        assert (user.is_blocked, user.is_active, user.blocked_at) == (False, True, None)
+        async with session_factory() as session:
+            assert [telegram_id for _, telegram_id in await UserRepository(session, 1).get_recipients_page(0, 10)] == [10, 11]
+
+
+async def test_blocked_user_skips_known_user_fast_path(database):
+    async with database() as session_factory:
+        async with session_factory() as session:
+            with use_bot(5000):
+                service = UserService(session)
+            await service.ensure_user(10, first_name="Ali")
+            await session.commit()
+            assert not await service.ensure_user(10, first_name="Ali")
+
+            await service.mark_blocked(10)
+            await session.commit()
+            # Same profile, yet the DB is touched and the flag cleared
+            assert await service.ensure_user(10, first_name="Ali")
+            await session.commit()
+            user = await service.repo.get_by_telegram_id(10)
+        assert not user.is_blocked
+
+
+def test_known_user_discard():
+    users = KnownUserSet(merge_threshold=2)
+    users.extend([(10, 111), (11, 222)])
+    users.add(12, 333)
+    users.discard(10)
+    users.discard(12)
+    users.discard(99)
+    assert (users.get(10), users.get(11), users.get(12)) == (0, 222, None)
+    users.add(10, 444)
+    assert users.get(10) == 444
+
+
+def my_chat_member(update_id: int, user_id: int, status: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Ali"}
+    bot_user = {"id": 1000, "is_bot": True, "first_name": "Bot"}
+    old = {"status": "member" if status == "kicked" else "kicked", "user": bot_user}
+    new = {"status": status, "user": bot_user}
+    for member in (old, new):
+        if member["status"] == "kicked":
+            member["until_date"] = 0
+    return {
+        "update_id": update_id,
+        "my_chat_member": {
+            "chat": {"id": user_id, "type": "private", "first_name": "Ali"},
+            "from": user, "date": 0, "old_chat_member": old, "new_chat_member": new,
+        },
+    }
+
+
+async def test_block_and_unblock_updates(database):
+    async with database() as session_factory:
+        dispatcher = Dispatcher()
+        dispatcher.update.outer_middleware(TenantMiddleware())
+        dispatcher.update.outer_middleware(DatabaseMiddleware(session_factory))
+        dispatcher.include_router(bot_status.router)
+        bot = Bot("1000:test", session=FakeTelegramSession())
+
+        async def recipients():
+            async with session_factory() as session:
+                return [telegram_id for _, telegram_id in await UserRepository(session, 1000).get_recipients_page(0, 10)]
+
+        await dispatcher.feed_raw_update(bot, my_chat_member(1, 10, "member"))
+        assert await recipients() == [10]
+        await dispatcher.feed_raw_update(bot, my_chat_member(2, 10, "kicked"))
+        assert await recipients() == []
+        await dispatcher.feed_raw_update(bot, my_chat_member(3, 10, "member"))
+        assert await recipients() == [10]